@@ -0,0 +1,91 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .counters import increment_or_create
+from .models import LowStockAlert
+from .sinks import load_sinks
+
+# Low-stock events are queued in LowStockAlert inside the request and delivered by the
+# process_alerts worker, so requests never wait on email or webhook I/O. Events for the same
+# product within one window of ALERT_WINDOW coalesce into a single alert.
+ALERT_WINDOW = datetime.timedelta(seconds=getattr(settings, 'INVENTORY_ALERT_WINDOW', 3600))
+DEFAULT_SINKS = [{'BACKEND': 'inventory.sinks.LogSink'}]
+MAX_ATTEMPTS = 5  # Deliveries tried before an alert is marked FAILED
+RETRY_DELAY = datetime.timedelta(seconds=30)  # Doubled after every failed attempt
+SEND_LEASE = datetime.timedelta(minutes=5)  # How long a worker may hold alerts it is sending
+
+
+# Start of the fixed coalescing window containing moment
+def window_start(moment):
+    width = ALERT_WINDOW.total_seconds()
+    seconds = moment.timestamp()
+    return datetime.datetime.fromtimestamp(seconds - seconds % width, tz=datetime.timezone.utc)
+
+
+# Queue (or coalesce) a low-stock alert for product with its current quantity
+def enqueue_low_stock_alert(product):
+    now = timezone.now()
+    increment_or_create(
+        LowStockAlert,
+        {'product_id': product.pk, 'window_start': window_start(now)},
+        {'occurrences': 1},
+        extra={'quantity': product.quantity, 'reorder_level': product.reorder_level},
+        defaults={'user_id': product.user_id, 'available_at': now},
+    )
+
+
+# Event handed to the sinks for an alert (loaded with product__store and user)
+def alert_event(alert):
+    product = alert.product
+    return {
+        'type': 'low_stock',
+        'data': {
+            'alert': alert.pk, 'product': product.pk, 'name': product.name, 'store': product.store.name,
+            'quantity': alert.quantity, 'reorder_level': alert.reorder_level, 'occurrences': alert.occurrences,
+        },
+        'subject': f"Low stock: {product.name}",
+        'message': f"Low stock alert for {product.name} at {product.store.name}. Current quantity: {alert.quantity}",
+        'recipients': [alert.user.email] if alert.user.email else [],
+    }
+
+
+# Deliver up to batch_size due alerts to every sink; returns how many were processed. Alerts are
+# claimed with SKIP LOCKED (where supported) in a short transaction that marks them SENDING for
+# SEND_LEASE, and the sinks run after it commits, so request-path updates of the same rows
+# never wait on notification I/O. Delivery is at least once: a failing sink puts the batch
+# back with exponential backoff, and alerts of a worker that died are reclaimed after the lease.
+def deliver_alerts(sinks=None, batch_size=100):
+    if sinks is None:
+        sinks = load_sinks('INVENTORY_ALERT_SINKS', DEFAULT_SINKS)
+    now = timezone.now()
+    with transaction.atomic():
+        # Lock only the alert rows; product rows must stay free for stock updates
+        due = LowStockAlert.objects.select_for_update(skip_locked=True).filter(
+            status__in=[LowStockAlert.PENDING, LowStockAlert.SENDING], available_at__lte=now,
+        )
+        ids = list(due.order_by('available_at', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        LowStockAlert.objects.filter(pk__in=ids).update(status=LowStockAlert.SENDING, available_at=now + SEND_LEASE)
+    alerts = list(LowStockAlert.objects.select_related('product__store', 'user').filter(pk__in=ids).order_by('id'))
+
+    try:
+        events = [alert_event(alert) for alert in alerts]
+        for sink in sinks:
+            sink.send(events)
+    except Exception as exc:
+        for alert in alerts:
+            attempts = alert.attempts + 1
+            LowStockAlert.objects.filter(pk=alert.pk).update(
+                attempts=attempts,
+                last_error=repr(exc),
+                status=LowStockAlert.FAILED if attempts >= MAX_ATTEMPTS else LowStockAlert.PENDING,
+                available_at=now + RETRY_DELAY * 2 ** alert.attempts,
+            )
+    else:
+        LowStockAlert.objects.filter(pk__in=ids).update(status=LowStockAlert.SENT, sent_at=now, attempts=F('attempts') + 1, last_error='')
+    return len(ids)
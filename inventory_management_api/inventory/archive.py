@@ -0,0 +1,156 @@
+import datetime
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchivedChangeSegment, ChangeArchive, InventoryChange, StockSnapshot
+
+# Cold months of the InventoryChange ledger are moved to gzip files under INVENTORY_ARCHIVE_DIR
+# by archive_changes. The rows stay reachable: change_history and change lists whose date range
+# reaches into archived months read back just the segments they need. Rollups and summaries are
+# left alone, so reports don't depend on the archived rows, and each archived month leaves a
+# snapshot of every product it touched, so as_of answers with at most month precision there.
+ARCHIVE_DIR = getattr(settings, 'INVENTORY_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+ARCHIVE_FIELDS = ('id', 'product_id', 'user_id', 'quantity', 'quantity_change', 'reason', 'timestamp', 'transfer_id')
+
+
+# First day (UTC) of the month containing moment
+def month_start(moment):
+    return moment.astimezone(datetime.timezone.utc).date().replace(day=1)
+
+
+# [start, end) of a month as aware datetimes
+def month_bounds(month):
+    start = datetime.datetime(month.year, month.month, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+    return start, end
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+# Partitions of the change table (MySQL only, see partition_changes)
+def table_partitions():
+    if connection.vendor != 'mysql':
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL',
+            [InventoryChange._meta.db_table],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+# Archive the changes of a month and remove them from the table; returns the ChangeArchive.
+# The rows are read under lock, so they can't change between the file and the purge. A month
+# with its own partition is dropped in one statement after the archive is recorded; otherwise
+# the rows are deleted in the archive's transaction.
+def archive_month(month):
+    archive = ChangeArchive.objects.filter(month=month).first()
+    if archive is not None and archive.purged:
+        return archive
+
+    start, end = month_bounds(month)
+    drop_partition = partition_name(month) in table_partitions()
+    with transaction.atomic():
+        if archive is None:
+            rows = InventoryChange.objects.select_for_update().filter(timestamp__gte=start, timestamp__lt=end)
+            archive = write_archive(month, rows.order_by('product_id', 'user_id', 'timestamp', 'id').values_list(*ARCHIVE_FIELDS))
+        if not drop_partition:
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                # Raw DELETE: archiving isn't a stock change, so the delete signals must not touch the rollups
+                cursor.execute(
+                    f"DELETE FROM {quote(InventoryChange._meta.db_table)} WHERE {quote('timestamp')} >= %s AND {quote('timestamp')} < %s",
+                    [connection.ops.adapt_datetimefield_value(start), connection.ops.adapt_datetimefield_value(end)],
+                )
+            archive.purged = True
+            archive.save(update_fields=['purged'])
+
+    if drop_partition:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {connection.ops.quote_name(InventoryChange._meta.db_table)} DROP PARTITION {partition_name(month)}")
+        ChangeArchive.objects.filter(pk=archive.pk).update(purged=True)
+        archive.purged = True
+    return archive
+
+
+# Write rows (tuples of ARCHIVE_FIELDS ordered by product and user) to the month's file, one
+# gzip member per (product, user) segment, and record the archive, its segments and the
+# products' month-end snapshots
+def write_archive(month, rows):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"changes-{month:%Y-%m}.ndjson.gz")
+    digest = hashlib.sha256()
+    segments, last_changes = [], {}
+    offset = total = 0
+    with tempfile.NamedTemporaryFile('wb', dir=ARCHIVE_DIR, delete=False) as handle:
+        for (product_id, user_id), group in itertools.groupby(rows.iterator(chunk_size=2000), key=lambda row: row[1:3]):
+            group = [dict(zip(ARCHIVE_FIELDS, row)) for row in group]
+            member = gzip.compress(''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in group).encode(), mtime=0)
+            handle.write(member)
+            digest.update(member)
+            segments.append(ArchivedChangeSegment(product_id=product_id, user_id=user_id, offset=offset, length=len(member), row_count=len(group)))
+            offset += len(member)
+            total += len(group)
+            last = group[-1]  # Latest change of this user; keep the product's latest over all users
+            if product_id not in last_changes or (last['timestamp'], last['id']) > (last_changes[product_id]['timestamp'], last_changes[product_id]['id']):
+                last_changes[product_id] = last
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(handle.name, path)
+
+    archive = ChangeArchive.objects.create(month=month, path=path, row_count=total, sha256=digest.hexdigest())
+    for segment in segments:
+        segment.archive = archive
+    ArchivedChangeSegment.objects.bulk_create(segments, batch_size=1000)
+    StockSnapshot.objects.bulk_create([  # Where as_of picks up once the month's changes are gone
+        StockSnapshot(product_id=product_id, taken_at=change['timestamp'], quantity=change['quantity'], version=0)
+        for product_id, change in last_changes.items()
+    ], batch_size=1000)
+    return archive
+
+
+# End of the newest archived month, or None; change queries starting before it need the archive
+def archive_horizon():
+    month = ChangeArchive.objects.filter(purged=True).order_by('-month').values_list('month', flat=True).first()
+    return month_bounds(month)[1] if month else None
+
+
+# Archived changes of a product and/or made by a user with timestamps in [start, end), as unsaved
+# InventoryChange instances, oldest first. Only the segments of the months in range are read.
+def archived_changes(product_id=None, user_id=None, start=None, end=None, reason=None):
+    segments = ArchivedChangeSegment.objects.filter(archive__purged=True).select_related('archive')
+    if product_id is not None:
+        segments = segments.filter(product_id=product_id)
+    if user_id is not None:
+        segments = segments.filter(user_id=user_id)
+    if start is not None:
+        segments = segments.filter(archive__month__gte=month_start(start))
+    if end is not None:
+        segments = segments.filter(archive__month__lte=month_start(end))
+
+    changes = []
+    for archive, group in itertools.groupby(segments.order_by('archive__month', 'offset'), key=lambda segment: segment.archive):
+        with open(archive.path, 'rb') as handle:
+            for segment in group:
+                handle.seek(segment.offset)
+                for line in gzip.decompress(handle.read(segment.length)).splitlines():
+                    row = json.loads(line)
+                    row['timestamp'] = parse_datetime(row['timestamp'])
+                    if not archive.signed_deltas and row['reason'] == 'SALE':
+                        row['quantity_change'] = -row['quantity_change']  # Older files hold sales unsigned
+                    if (start is None or row['timestamp'] >= start) and (end is None or row['timestamp'] < end) and reason in (None, row['reason']):
+                        changes.append(InventoryChange(**row))
+    changes.sort(key=lambda change: (change.timestamp, change.pk))
+    return changes
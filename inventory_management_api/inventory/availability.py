@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .counters import increment_or_create
+from .models import InventoryProduct, StockAvailability
+
+# "Where is X in stock" reads StockAvailability, kept per (user, product name, store) by every
+# product write in its own transaction: post_save/post_delete for single saves, and the bulk
+# paths (stock movements, imports) with the transitions of the rows they wrote.
+
+
+# StockAvailability deltas for products going from old to new availability_state() (either may be
+# None), as {(user_id, name, store_id): [quantity, product count]}
+def availability_deltas(transitions):
+    deltas = defaultdict(lambda: [0, 0])
+    for old_state, new_state in transitions:
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None:
+                continue
+            user_id, name, store_id, quantity = state
+            deltas[(user_id, name, store_id)][0] += sign * quantity
+            deltas[(user_id, name, store_id)][1] += sign
+    return deltas
+
+
+# Keep StockAvailability in step with products moving between (old_state, new_state) pairs
+def record_availability(transitions):
+    for (user_id, name, store_id), (quantity, count) in availability_deltas(transitions).items():
+        if not (quantity or count):
+            continue
+        increment_or_create(
+            StockAvailability,
+            {'user_id': user_id, 'name': name, 'store_id': store_id},
+            {'quantity': quantity, 'product_count': count},
+            create=count > 0,  # Rows are only created by adding a product to them
+            extra={'updated': timezone.now()},
+        )
+
+
+# Transitions of products whose quantities moved by F() updates; products hold the refreshed
+# rows and quantity_deltas the net change applied to each of them
+def quantity_transitions(products, quantity_deltas):
+    transitions = []
+    for pk, delta in quantity_deltas.items():
+        new_state = products[pk].availability_state()
+        transitions.append((new_state[:3] + (new_state[3] - delta,), new_state))
+    return transitions
+
+
+# Recompute StockAvailability from InventoryProduct, for one user (id) or everybody
+def rebuild_availability(user_id=None):
+    products = InventoryProduct.objects.all()
+    rows = StockAvailability.objects.all()
+    if user_id is not None:
+        products = products.filter(user_id=user_id)
+        rows = rows.filter(user_id=user_id)
+
+    groups = products.values('user', 'name', 'store').annotate(quantity=Sum('quantity'), product_count=Count('id')).order_by()
+    with transaction.atomic():
+        rows.delete()
+        created = StockAvailability.objects.bulk_create([
+            StockAvailability(
+                user_id=group['user'], name=group['name'], store_id=group['store'],
+                quantity=group['quantity'], product_count=group['product_count'],
+            )
+            for group in groups
+        ], batch_size=1000)
+    return len(created)
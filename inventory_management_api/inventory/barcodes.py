@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import InventoryProduct, InventoryProductQuerySet
+
+# Barcode lookups are read through two tiers: a small per-process LRU, then the shared Django
+# cache, then the database. Invalidation clears both tiers of this process and the shared
+# tier; other processes can serve a stale entry from their local tier for LOCAL_TIMEOUT seconds.
+CACHE_ALIAS = getattr(settings, 'INVENTORY_BARCODE_CACHE_ALIAS', 'default')
+SHARED_TIMEOUT = 300  # Seconds a serialized product stays in the shared cache
+MISS_TIMEOUT = 30  # Seconds an unknown barcode is remembered, so scans of junk codes skip the database
+LOCAL_TIMEOUT = 5  # Seconds an entry stays in the per-process tier
+LOCAL_SIZE = 10000  # Entries kept per process
+
+MISSING = (None, None)  # Cached (owner id, data) of a barcode no product has
+
+
+# Thread-safe LRU dict whose entries expire after a fixed number of seconds
+class LocalCache:
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)  # Evict the least recently used entry
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LocalCache(LOCAL_SIZE, LOCAL_TIMEOUT)
+
+
+def cache_key(code):
+    return 'inventory:barcode:' + hashlib.sha1(code.encode()).hexdigest()  # Safe for every cache backend
+
+
+# Load and serialize the products with the given barcodes, as {code: (owner id, data)}
+def load_products(codes, serialize):
+    products = InventoryProduct.objects.select_related(*InventoryProductQuerySet.SERIALIZER_RELATIONS).filter(barcode__in=codes)
+    found = {product.barcode: (product.user_id, dict(serialize(product))) for product in products}
+    return {code: found.get(code, MISSING) for code in codes}
+
+
+# Cached (owner id, data) per barcode, reading through the local and shared tiers to the database.
+# serialize turns a product into the cached representation.
+def lookup_barcodes(codes, serialize):
+    entries, missing = {}, []
+    for code in codes:
+        entry = local_cache.get(cache_key(code))
+        if entry is None:
+            missing.append(code)
+        else:
+            entries[code] = entry
+    if not missing:
+        return entries
+
+    shared = caches[CACHE_ALIAS]
+    keys = {cache_key(code): code for code in missing}
+    for key, entry in shared.get_many(list(keys)).items():
+        entries[keys[key]] = entry
+        local_cache.set(key, entry)
+    missing = [code for code in missing if code not in entries]
+    if not missing:
+        return entries
+
+    loaded = load_products(missing, serialize)
+    found = {cache_key(code): entry for code, entry in loaded.items() if entry != MISSING}
+    unknown = {cache_key(code): entry for code, entry in loaded.items() if entry == MISSING}
+    if found:
+        shared.set_many(found, SHARED_TIMEOUT)
+    if unknown:
+        shared.set_many(unknown, MISS_TIMEOUT)
+    for code, entry in loaded.items():
+        local_cache.set(cache_key(code), entry)
+    entries.update(loaded)
+    return entries
+
+
+def lookup_barcode(code, serialize):
+    return lookup_barcodes([code], serialize)[code]
+
+
+# Drop cached lookups for the given barcodes now and again once the surrounding transaction
+# commits, so a lookup racing the write can't leave the pre-commit row cached
+def invalidate_barcodes(codes):
+    keys = [cache_key(code) for code in set(codes) if code]
+    if not keys:
+        return
+
+    def clear():
+        for key in keys:
+            local_cache.delete(key)
+        caches[CACHE_ALIAS].delete_many(keys)
+
+    clear()
+    transaction.on_commit(clear)
@@ -0,0 +1,138 @@
+import functools
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+# Cached responses live under a generation number per scope (e.g. all category lists, or one
+# user's inventory report). Writes bump the generation instead of hunting down every cached
+# page and query string, so the old entries are never read again and simply expire.
+CACHE_ALIAS = 'default'
+DEFAULT_TIMEOUT = 300  # Seconds a cached response is kept
+# Backends only the current process sees: a bump there leaves other workers serving stale entries
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+
+# Whether responses are cached: only with a cache every worker shares, unless the
+# INVENTORY_RESPONSE_CACHE setting (True/False) says otherwise, e.g. for a single process
+def response_cache_enabled():
+    configured = getattr(settings, 'INVENTORY_RESPONSE_CACHE', None)
+    if configured is not None:
+        return configured
+    return settings.CACHES[CACHE_ALIAS]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def generation_key(scope):
+    return f"inventory:generation:{scope}"
+
+
+# Current generation of a scope. A missing counter (never bumped, or evicted) starts at the
+# clock so it can't collide with a generation that still has entries cached.
+def get_generation(scope):
+    cache = caches[CACHE_ALIAS]
+    key = generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+# Invalidate every cached response of a scope, now and again once the surrounding transaction
+# commits, so a request recomputing from pre-commit data in between can't leave it cached
+# under the current generation
+def bump_generation(scope):
+    cache = caches[CACHE_ALIAS]
+    key = generation_key(scope)
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+# Scope of one user's inventory_report
+def report_scope(user_id):
+    return f"inventory_report:{user_id}"
+
+
+# Cache key of a request: scope generation, user and query string (in a stable order)
+def response_key(scope, generation, request):
+    query = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+    digest = hashlib.sha1(repr((request.path, query)).encode()).hexdigest()
+    return f"inventory:response:{scope}:{generation}:{request.user.pk}:{digest}"
+
+
+# Cache entry for response data: its ETag and the data
+def make_entry(data):
+    return quote_etag(hashlib.md5(JSONRenderer().render(data)).hexdigest()), data
+
+
+# Response for a cache entry built with response_class (304 when the ETag matches)
+def entry_response(entry, request, response_class=Response):
+    etag, data = entry
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = response_class(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = response_class(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'  # Per-user data; revalidate before reuse
+    return response
+
+
+# Cache a view method's successful responses per user and query string under scope, which is
+# a name or a function of the request. Clients get an ETag and revalidate with If-None-Match;
+# a warm request is answered (with 304 when the ETag matches) without running the view.
+# Data for which cacheable(data) is false (e.g. a degraded report) is served but not cached.
+def cache_response(scope, timeout=DEFAULT_TIMEOUT, cacheable=None):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if not response_cache_enabled():
+                return method(view, request, *args, **kwargs)
+            name = scope(request) if callable(scope) else scope
+            cache = caches[CACHE_ALIAS]
+            key = response_key(name, get_generation(name), request)
+            entry = cache.get(key)
+            if entry is None:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response  # Errors and redirects aren't cached
+                entry = make_entry(response.data)
+                if cacheable is None or cacheable(response.data):
+                    cache.set(key, entry, timeout)
+            return entry_response(entry, request)
+        return wrapper
+    return decorator
+
+
+# cache_response for async views: the view is a coroutine returning the response data, which
+# is rendered with response_class
+def acache_response(scope, response_class, timeout=DEFAULT_TIMEOUT, cacheable=None):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not response_cache_enabled():
+                return response_class(await view(request, *args, **kwargs))
+            name = scope(request) if callable(scope) else scope
+            cache = caches[CACHE_ALIAS]
+            key = response_key(name, await sync_to_async(get_generation)(name), request)
+            entry = await cache.aget(key)
+            if entry is None:
+                entry = make_entry(await view(request, *args, **kwargs))
+                if cacheable is None or cacheable(entry[1]):
+                    await cache.aset(key, entry, timeout)
+            return entry_response(entry, request, response_class)
+        return wrapper
+    return decorator
@@ -0,0 +1,20 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+# Add increments to the counter columns of the row identified by keys, using atomic F()
+# updates. A missing row is created (with defaults) only when create is true, since negative
+# deltas against a row that no longer exists (e.g. removed by a cascade) have nothing to undo.
+def increment_or_create(model, keys, increments, create=True, extra=None, defaults=None):
+    rows = model.objects.filter(**keys)
+    updates = {field: F(field) + value for field, value in increments.items()}
+    updates.update(extra or {})
+    if rows.update(**updates) or not create:
+        return
+
+    # First write for this key; a concurrent insert may win the race, then increment instead
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **increments, **(extra or {}), **(defaults or {}))
+    except IntegrityError:
+        rows.update(**updates)
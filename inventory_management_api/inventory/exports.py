@@ -0,0 +1,68 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .pagination import KeysetPagination
+
+# Columns of each export as (header, queryset lookup); related names are read through joins
+PRODUCT_EXPORT_COLUMNS = [
+    ('id', 'id'), ('name', 'name'), ('description', 'description'), ('barcode', 'barcode'),
+    ('category', 'category__name'), ('supplier', 'supplier__name'), ('store', 'store__name'),
+    ('quantity', 'quantity'), ('reorder_level', 'reorder_level'), ('price', 'price'),
+    ('date_added', 'date_added'), ('last_updated', 'last_updated'),
+]
+CHANGE_EXPORT_COLUMNS = [
+    ('id', 'id'), ('timestamp', 'timestamp'), ('product', 'product_id'), ('product_name', 'product__name'),
+    ('reason', 'reason'), ('quantity_change', 'quantity_change'), ('quantity', 'quantity'), ('user', 'user_id'),
+]
+
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+# Rows of the filtered and ordered queryset as dicts of lookups, read in keyset batches of
+# chunk_size on (leading ordering field, id). Memory stays constant on every backend, including
+# MySQL where mysqlclient buffers a whole result set even for iterator().
+def iterate_rows(queryset, lookups, chunk_size=2000):
+    paginator = KeysetPagination()
+    field, descending = paginator.get_ordering(queryset)
+    prefix = '-' if descending else ''
+    ordering = [f"{prefix}{field}"] + ([f"{prefix}{paginator.tiebreaker}"] if field != paginator.tiebreaker else [])
+    queryset = queryset.order_by(*ordering).values(*dict.fromkeys([*lookups, field, paginator.tiebreaker]))
+
+    position = None
+    while True:
+        batch = queryset if position is None else queryset.filter(paginator.seek(field, descending, *position))
+        rows = list(batch[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1][field], rows[-1][paginator.tiebreaker])
+
+
+# File-like object that hands back what csv.writer writes instead of buffering it
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in columns])
+    for row in rows:
+        yield writer.writerow(['' if row[lookup] is None else row[lookup] for _, lookup in columns])
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps({header: row[lookup] for header, lookup in columns}, cls=DjangoJSONEncoder) + '\n'
+
+
+# Stream queryset as a CSV or NDJSON attachment named after filename
+def export_response(queryset, columns, export_format, filename):
+    rows = iterate_rows(queryset, [lookup for _, lookup in columns])
+    lines = csv_lines(columns, rows) if export_format == 'csv' else ndjson_lines(columns, rows)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
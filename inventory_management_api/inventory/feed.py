@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+from .outbox import events_recorded
+
+# Live feed of stock changes for the SSE endpoint. Each worker process runs one Broker that fans
+# events out to its subscribers, which are plain asyncio queues, so an idle client costs a
+# coroutine and a queue rather than a thread. Events reach the broker through a backend:
+# OutboxPollingBackend (default) reads the outbox table every process shares, LocalFeedBackend
+# only sees writes committed by its own process.
+DEFAULT_BACKEND = 'inventory.feed.OutboxPollingBackend'
+QUEUE_SIZE = 1000  # Events buffered per subscriber before it is disconnected as too slow
+FEED_TYPES = ('change', 'low_stock')
+HEARTBEAT = 15  # Seconds of silence before a comment line keeps proxies from closing the stream
+
+logger = logging.getLogger('inventory.feed')
+
+
+# Feed events derived from an outbox event: ledger entries as 'change', and product writes that
+# leave the product at or below its reorder level as 'low_stock'
+def feed_events(event):
+    payload = event.payload
+    base = {'id': event.pk, 'user': event.user_id, 'product': event.product_id, 'store': payload.get('store')}
+    if event.topic.startswith('change.'):
+        return [{**base, 'type': 'change', 'action': event.topic.split('.', 1)[1], 'data': payload}]
+    if event.topic in ('product.created', 'product.updated') and payload['quantity'] <= payload['reorder_level']:
+        return [{**base, 'type': 'low_stock', 'data': payload}]
+    return []
+
+
+# A client's queue and the events it asked for
+class Subscription:
+    def __init__(self, user_id, stores=(), products=(), types=FEED_TYPES):
+        self.user_id = user_id
+        self.stores = set(stores)
+        self.products = set(products)
+        self.types = set(types)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, event):
+        return (
+            event['user'] == self.user_id
+            and event['type'] in self.types
+            and (not self.stores or event['store'] in self.stores)
+            and (not self.products or event['product'] in self.products)
+        )
+
+    # Runs on the subscriber's event loop
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True  # The stream ends and the client reconnects with Last-Event-ID
+
+
+class Broker:
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.backend = None
+
+    # Register a subscription, starting the backend on first use
+    def subscribe(self, subscription):
+        with self.lock:
+            if self.backend is None:
+                self.backend = import_string(getattr(settings, 'INVENTORY_FEED_BACKEND', DEFAULT_BACKEND))()
+                self.backend.start(self)
+            self.subscriptions.add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    # Hand events to the matching subscribers; safe to call from any thread
+    def publish(self, events):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for event in events:
+            for subscription in subscriptions:
+                if subscription.matches(event):
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+
+broker = Broker()
+
+
+# Backends feed the broker from wherever events are shared between processes
+class FeedBackend:
+    def start(self, broker):
+        raise NotImplementedError
+
+
+# Publishes the outbox events committed by this process only; enough for a single worker
+class LocalFeedBackend(FeedBackend):
+    def start(self, broker):
+        self.broker = broker
+        events_recorded.connect(self.receive, sender=OutboxEvent, weak=False)
+
+    def receive(self, sender, events, **kwargs):
+        self.broker.publish([feed_event for event in events for feed_event in feed_events(event)])
+
+
+# Polls the outbox table from a daemon thread, so writes from every process reach every
+# broker. Ids are assigned at insert but become visible at commit, so ids skipped over are kept
+# as gaps and looked for again until they are LOOKBACK seconds old (or turn out to be rollbacks).
+class OutboxPollingBackend(FeedBackend):
+    interval = 0.5  # Seconds between polls
+    max_backoff = 30  # Longest wait between polls while they keep failing
+    lookback = 10  # Seconds a transaction may take to commit an event and still be picked up
+    max_gap = 1000  # Skipped ids remembered per jump (auto-increment may leap after restarts)
+    batch_size = 1000
+
+    def __init__(self):
+        self.last = 0  # Highest id seen
+        self.gaps = {}  # Skipped id -> monotonic deadline
+
+    def start(self, broker):
+        self.broker = broker
+        self.last = OutboxEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0  # Only new events
+        threading.Thread(target=self.run, name='inventory-feed-poller', daemon=True).start()
+
+    # Poll forever; errors are logged and retried with exponential backoff up to max_backoff
+    def run(self):
+        delay = self.interval
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                delay = min(delay * 2, self.max_backoff)
+                logger.exception('Polling the outbox for the feed failed; retrying in %.1f seconds', delay)
+            else:
+                delay = self.interval
+            finally:
+                close_old_connections()
+            time.sleep(delay)
+
+    def poll(self):
+        now = time.monotonic()
+        self.gaps = {pk: deadline for pk, deadline in self.gaps.items() if deadline > now}
+        condition = Q(id__gt=self.last) | Q(id__in=list(self.gaps)) if self.gaps else Q(id__gt=self.last)
+        events = list(OutboxEvent.objects.filter(condition).order_by('id')[:self.batch_size])
+        for event in events:
+            if event.pk in self.gaps:
+                del self.gaps[event.pk]
+            elif event.pk > self.last:
+                for skipped in range(max(self.last + 1, event.pk - self.max_gap), event.pk):
+                    self.gaps[skipped] = now + self.lookback
+                self.last = event.pk
+        self.broker.publish([feed_event for event in events for feed_event in feed_events(event)])
+        return len(events)
+
+
+# One Server-Sent Events frame
+def sse_frame(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+
+# Feed events after last_id still in the outbox, for a client resuming with Last-Event-ID
+def replay_events(subscription, last_id):
+    events = OutboxEvent.objects.filter(user_id=subscription.user_id, id__gt=last_id).order_by('id')[:QUEUE_SIZE]
+    return [feed_event for event in events for feed_event in feed_events(event) if subscription.matches(feed_event)]
+
+
+# Body of the SSE response: replayed events first, then live ones until the client goes away or
+# falls QUEUE_SIZE events behind. The subscription is registered before the replay query so an
+# event committed in between is not lost; the ids replayed are skipped when they arrive live.
+async def stream_events(subscription, last_id=None, heartbeat=HEARTBEAT):
+    await sync_to_async(broker.subscribe)(subscription)  # May start the backend, which queries
+    try:
+        replayed = set()
+        if last_id is not None:
+            for event in await sync_to_async(replay_events)(subscription, last_id):
+                replayed.add(event['id'])
+                yield sse_frame(event)
+        yield 'retry: 3000\n\n'  # Browsers reconnect 3 seconds after the stream is cut
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['id'] not in replayed:
+                yield sse_frame(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,81 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventoryChange, InventoryProduct, StockSnapshot
+
+# Stock as of a past moment is the latest StockSnapshot at or before it, carried forward by the
+# ledger entries after the snapshot up to that moment. Every entry records the quantity it left,
+# so only the window since the snapshot is read, through the (product, taken_at) and
+# (product, timestamp) indexes. Products get an opening snapshot when they are created and
+# take_stock_snapshots adds one for every product written since its last.
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def snapshots_before(as_of):
+    return StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=as_of).order_by('-taken_at', '-id')
+
+
+# Annotate quantity_as_of on products and leave out the products that didn't exist yet at as_of:
+# those added on a later day, and those added later on the same day, which have neither a
+# snapshot nor a ledger entry before as_of
+def with_quantity_as_of(queryset, as_of):
+    queryset = queryset.filter(date_added__lte=timezone.localdate(as_of)).annotate(
+        snapshot_taken_at=Subquery(snapshots_before(as_of).values('taken_at')[:1]),
+        snapshot_quantity=Subquery(snapshots_before(as_of).values('quantity')[:1]),
+    )
+    last_change = InventoryChange.objects.filter(
+        product=OuterRef('pk'), timestamp__lte=as_of, timestamp__gt=Coalesce(OuterRef('snapshot_taken_at'), Value(EPOCH)),
+    ).order_by('-timestamp', '-id')
+    return queryset.annotate(
+        quantity_as_of=Coalesce(Subquery(last_change.values('quantity')[:1]), 'snapshot_quantity'),
+    ).filter(quantity_as_of__isnull=False)
+
+
+# (snapshot, changes, quantity) of a product as of a moment: the snapshot used (or None), the
+# ledger entries applied on top of it, newest first, and the resulting quantity
+def stock_as_of(product, as_of):
+    snapshot = product.snapshots.filter(taken_at__lte=as_of).order_by('-taken_at', '-id').first()
+    changes = InventoryChange.objects.filter(product=product, timestamp__lte=as_of)
+    if snapshot is not None:
+        changes = changes.filter(timestamp__gt=snapshot.taken_at)
+    changes = list(changes.order_by('-timestamp', '-id'))
+    if changes:
+        quantity = changes[0].quantity
+    else:
+        quantity = snapshot.quantity if snapshot is not None else None
+    return snapshot, changes, quantity
+
+
+# Snapshot freshly created products
+def record_opening_snapshots(products):
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=product.pk, taken_at=now, quantity=product.quantity, version=product.version)
+        for product in products
+    ])
+
+
+# Snapshot every product written since its latest snapshot, batch_size products per transaction;
+# returns how many snapshots were taken. Each batch is read under row locks, so a stock movement
+# in flight has either committed before the read or records its change after taken_at.
+def take_snapshots(batch_size=500):
+    latest_version = Subquery(StockSnapshot.objects.filter(product=OuterRef('pk')).order_by('-taken_at', '-id').values('version')[:1])
+    taken, last_id = 0, 0
+    while True:
+        with transaction.atomic():
+            ids = list(InventoryProduct.objects.filter(pk__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return taken
+            last_id = ids[-1]
+            products = InventoryProduct.objects.select_for_update().filter(pk__in=ids).annotate(snapshot_version=latest_version)
+            rows = list(products.order_by('id').values('id', 'quantity', 'version', 'snapshot_version'))
+            now = timezone.now()
+            snapshots = StockSnapshot.objects.bulk_create([
+                StockSnapshot(product_id=row['id'], taken_at=now, quantity=row['quantity'], version=row['version'])
+                for row in rows if row['version'] != row['snapshot_version']
+            ])
+            taken += len(snapshots)
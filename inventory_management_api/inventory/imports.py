@@ -0,0 +1,216 @@
+import csv
+import time
+from itertools import islice
+
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from .availability import record_availability
+from .barcodes import invalidate_barcodes
+from .caching import bump_generation, report_scope
+from .history import record_opening_snapshots
+from .models import Category, InventoryChange, InventoryProduct, Store, Supplier
+from .outbox import change_event, product_event, record_events
+from .rollups import record_changes
+from .search import index_products
+from .serializers import ProductImportRowSerializer
+from .summaries import record_state_changes
+
+# Related objects a row names, by column
+RELATED_MODELS = {'category': Category, 'supplier': Supplier, 'store': Store}
+
+# Columns rewritten when a row's barcode already exists
+UPSERT_FIELDS = ['name', 'description', 'category', 'supplier', 'store', 'quantity', 'price', 'reorder_level', 'version', 'last_updated']
+
+UPSERT_ATTEMPTS = 3  # Tries per batch when concurrent writers keep taking its barcodes
+
+
+# Raised when the file can't be imported at all (e.g. missing columns)
+class ImportFormatError(Exception):
+    pass
+
+
+# Raised inside a batch's transaction when a concurrent writer inserted one of its barcodes
+# for another user between the ownership check and the upsert
+class BarcodeTaken(Exception):
+    pass
+
+
+# Name -> instances cache for the related models. Each batch queries only the names no earlier
+# batch has seen, with one query per model.
+class RelatedLookup:
+    def __init__(self):
+        self.known = {field: {} for field in RELATED_MODELS}
+
+    def load(self, rows):
+        for field, model in RELATED_MODELS.items():
+            known = self.known[field]
+            names = {row[field] for row in rows} - known.keys()
+            if not names:
+                continue
+            for name in names:
+                known[name] = []
+            for instance in model.objects.filter(name__in=names).order_by('id'):
+                known[instance.name].append(instance)
+
+    # Instance named name, or an error message when there is none or several
+    def resolve(self, field, name):
+        matches = self.known[field][name]
+        if len(matches) == 1:
+            return matches[0], None
+        model = RELATED_MODELS[field]._meta.verbose_name
+        if not matches:
+            return None, f"No {model} named {name!r}."
+        return None, f"Several {model}s are named {name!r}."
+
+
+# Streams a product CSV into the user's catalogue, upserting by barcode in batches. Each batch
+# is validated without queries, resolves names through RelatedLookup and is written with one
+# multi-row INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE inside its own transaction.
+class ProductImport:
+    required_columns = {'barcode', 'name', 'category', 'supplier', 'store', 'quantity', 'price'}
+
+    def __init__(self, user, batch_size=500):
+        self.user = user
+        self.batch_size = batch_size
+        self.lookup = RelatedLookup()
+        self.validator = ProductImportRowSerializer()
+        self.rows = self.created = self.updated = 0
+        self.errors = []
+
+    # Import the CSV text lines (any iterable of str, e.g. an open file) and return the report
+    def run(self, lines):
+        started = time.monotonic()
+        reader = csv.DictReader(lines)
+        missing = self.required_columns - set(reader.fieldnames or ())
+        if missing:
+            raise ImportFormatError(f"Missing columns: {', '.join(sorted(missing))}")
+
+        numbered = ((reader.line_num, row) for row in reader)  # line_num is read after each row
+        while batch := list(islice(numbered, self.batch_size)):
+            self.rows += len(batch)
+            self.import_batch(batch)
+        if self.created or self.updated:
+            bump_generation(report_scope(self.user.pk))
+        return self.report(time.monotonic() - started)
+
+    def report(self, seconds):
+        imported = self.created + self.updated
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(imported / seconds, 1) if seconds else imported,
+        }
+
+    def reject(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    # Validated rows of a batch as (line, data); rejects invalid rows and repeated barcodes
+    def validate(self, batch):
+        valid, seen = [], set()
+        for line, row in batch:
+            values = {column: value for column, value in row.items() if column and value not in ('', None)}  # Blank cells take the defaults
+            try:
+                data = self.validator.run_validation(values)
+            except serializers.ValidationError as exc:
+                self.reject(line, exc.detail)
+                continue
+            if data['barcode'] in seen:
+                self.reject(line, {'barcode': ['Barcode appears more than once in the batch.']})
+                continue
+            seen.add(data['barcode'])
+            valid.append((line, data))
+        return valid
+
+    def import_batch(self, batch):
+        rows = []
+        valid = self.validate(batch)
+        self.lookup.load([data for _, data in valid])
+        for line, data in valid:
+            errors = {}
+            for field in RELATED_MODELS:
+                data[field], error = self.lookup.resolve(field, data[field])
+                if error:
+                    errors[field] = [error]
+            if errors:
+                self.reject(line, errors)
+            else:
+                rows.append((line, data))
+
+        # A batch rolled back by BarcodeTaken is retried, and the retry sees the new owner and
+        # rejects those rows. Writers that keep racing the batch get its rows rejected instead.
+        for _ in range(UPSERT_ATTEMPTS):
+            try:
+                self.upsert(rows)
+                return
+            except BarcodeTaken:
+                continue
+        for line, _ in rows:
+            self.reject(line, {'barcode': ['Barcode was claimed by a concurrent import; try the row again.']})
+
+    def upsert(self, rows):
+        with transaction.atomic():
+            # Lock the rows being updated so their old state stays valid until commit
+            existing = InventoryProduct.objects.select_for_update().filter(barcode__in=[data['barcode'] for _, data in rows]).only(
+                'barcode', 'version', 'user', 'name', 'store', 'category', 'quantity', 'price', 'reorder_level')
+            existing = {product.barcode: product for product in existing}
+
+            products, rejected = [], []
+            for line, data in rows:
+                current = existing.get(data['barcode'])
+                if current is not None and current.user_id != self.user.pk:
+                    rejected.append((line, {'barcode': ["Barcode belongs to another user's product."]}))
+                    continue
+                version = current.version + 1 if current is not None else 0
+                products.append(InventoryProduct(user=self.user, version=version, **data))
+
+            if products:
+                options = {'update_conflicts': True, 'update_fields': UPSERT_FIELDS}
+                if connection.features.supports_update_conflicts_with_target:
+                    options['unique_fields'] = ['barcode']  # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+                InventoryProduct.objects.bulk_create(products, **options)
+
+                # Upserts don't report primary keys on every backend. A conflicting row inserted
+                # since the check above kept its owner (user isn't overwritten), so undo the batch.
+                written = InventoryProduct.objects.filter(barcode__in=[product.barcode for product in products])
+                written = {barcode: (pk, user_id) for barcode, pk, user_id in written.values_list('barcode', 'pk', 'user_id')}
+                if any(user_id != self.user.pk for _, user_id in written.values()):
+                    raise BarcodeTaken()
+                for product in products:
+                    product.pk = written[product.barcode][0]
+                self.record(products, existing)
+
+        for line, errors in rejected:
+            self.reject(line, errors)
+        self.created += sum(1 for product in products if product.barcode not in existing)
+        self.updated += sum(1 for product in products if product.barcode in existing)
+
+    # Side effects a product save would have triggered through signals
+    def record(self, products, existing):
+        changes, transitions, availability = [], [], []
+        for product in products:
+            current = existing.get(product.barcode)
+            transitions.append((current._summary_state if current is not None else None, product.summary_state()))
+            availability.append((current._availability_state if current is not None else None, product.availability_state()))
+            if current is not None and current.quantity != product.quantity:
+                changes.append(InventoryChange(
+                    product=product,
+                    quantity=product.quantity,
+                    quantity_change=product.quantity - current.quantity,
+                    user=self.user,
+                    reason='ADJUSTMENT',
+                ))
+        changes = InventoryChange.objects.bulk_create(changes)
+        record_changes(changes)
+        record_events(
+            [product_event('product.updated' if product.barcode in existing else 'product.created', product) for product in products]
+            + [change_event('change.created', change, change.product) for change in changes]
+        )
+        record_state_changes(transitions)
+        record_availability(availability)
+        record_opening_snapshots(product for product in products if product.barcode not in existing)
+        index_products(products)
+        invalidate_barcodes(product.barcode for product in products)
@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from inventory.archive import archive_month, month_bounds, month_start
+from inventory.models import InventoryChange
+
+
+class Command(BaseCommand):
+    help = 'Move the inventory changes of cold months to compressed archive files (run periodically, e.g. monthly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='Keep this many full months before the current one live')
+        parser.add_argument('--before', help='Archive the months before this one instead (YYYY-MM)')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = datetime.datetime.strptime(options['before'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f"--before must look like YYYY-MM, got {options['before']!r}")
+        else:
+            cutoff = month_start(timezone.now())
+            for _ in range(options['months']):
+                cutoff = (month_bounds(cutoff)[0] - datetime.timedelta(days=1)).date().replace(day=1)
+        if cutoff > month_start(timezone.now()):
+            raise CommandError('Only past months can be archived')
+
+        oldest = InventoryChange.objects.aggregate(oldest=Min('timestamp'))['oldest']
+        month = month_start(oldest) if oldest else cutoff
+        archived = 0
+        while month < cutoff:
+            start, end = month_bounds(month)
+            if InventoryChange.objects.filter(timestamp__gte=start, timestamp__lt=end).exists():  # Empty months get no file
+                archive = archive_month(month)
+                self.stdout.write(f"{month:%Y-%m}: {archive.row_count} changes archived to {archive.path}")
+                archived += 1
+            month = end.date()
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} months"))
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from inventory.models import InventoryProduct
+
+# Endpoints compared as (label, sync url name, async url name, takes a product id)
+ENDPOINTS = [
+    ('list', 'inventoryproduct-list', 'inventoryproduct-list-async', False),
+    ('detail', 'inventoryproduct-detail', 'inventoryproduct-detail-async', True),
+    ('low_stock', 'inventoryproduct-low-stock', 'inventoryproduct-low-stock-async', False),
+    ('inventory_report', 'inventoryproduct-inventory-report', 'inventoryproduct-inventory-report-async', False),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of concurrent requests to the sync product reads through the WSGI handler '
+        '(one thread per in-flight request) with their async versions through the ASGI handler (one event loop)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, required=True, help='Id of the user whose products are read')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and handler')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(pk=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+        product = InventoryProduct.objects.filter(user=user).order_by('id').first()
+        if product is None:
+            raise CommandError(f"User {user.pk} has no products to read")
+
+        self.host = next((host for host in settings.ALLOWED_HOSTS if '*' not in host and not host.startswith('.')), 'localhost')
+        self.authorization = f"Bearer {AccessToken.for_user(user)}"
+        self.wsgi = get_wsgi_application()
+        self.asgi = get_asgi_application()
+        shares = self.shares(options['requests'], options['concurrency'])
+
+        self.stdout.write(f"{options['requests']} requests per endpoint, {len(shares)} in flight")
+        for label, sync_name, async_name, detail in ENDPOINTS:
+            args = [product.pk] if detail else []
+            wsgi = self.run_wsgi(reverse(sync_name, args=args), shares)
+            asgi = async_to_sync(self.run_asgi)(reverse(async_name, args=args), shares)
+            self.stdout.write(f"{label:<17} WSGI {wsgi:9.1f} req/s   ASGI {asgi:9.1f} req/s   x{asgi / wsgi:.2f}")
+
+    # Requests each concurrent worker sends
+    def shares(self, requests, concurrency):
+        workers = max(1, min(concurrency, requests))
+        return [requests // workers + (1 if index < requests % workers else 0) for index in range(workers)]
+
+    # Requests per second with one thread per worker, each sending its share through the WSGI handler
+    def run_wsgi(self, path, shares):
+        def worker(count):
+            try:
+                for _ in range(count):
+                    self.wsgi_get(path)
+            finally:
+                connections.close_all()  # The thread's own connections
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(shares)) as executor:
+            list(executor.map(worker, shares))
+        return sum(shares) / (time.perf_counter() - start)
+
+    # Requests per second with one coroutine per worker on a single event loop through the ASGI handler
+    async def run_asgi(self, path, shares):
+        async def worker(count):
+            for _ in range(count):
+                await self.asgi_get(path)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(count) for count in shares))
+        return sum(shares) / (time.perf_counter() - start)
+
+    def wsgi_get(self, path):
+        environ = {'PATH_INFO': path, 'HTTP_HOST': self.host, 'HTTP_AUTHORIZATION': self.authorization, 'wsgi.url_scheme': 'https'}
+        setup_testing_defaults(environ)
+        statuses = []
+        response = self.wsgi(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            body = b''.join(response)
+        finally:
+            response.close()  # Sends request_finished, as the server would
+        self.check(path, int(statuses[0].split()[0]), body)
+
+    async def asgi_get(self, path):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'https',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'client': ('127.0.0.1', 0), 'server': (self.host, 443),
+            'headers': [(b'host', self.host.encode()), (b'authorization', self.authorization.encode())],
+        }
+        requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await asyncio.Future()  # The client stays connected until the handler is done
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await self.asgi(scope, receive, send)
+        self.check(path, messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:]))
+
+    def check(self, path, status, body):
+        if status != 200:
+            raise CommandError(f"{path} answered {status}: {body[:200]!r}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.reorder import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recompute every product\'s sales velocity, days of cover and reorder suggestion (run periodically, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products assessed per query')
+
+    def handle(self, *args, **options):
+        assessed = compute_suggestions(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Assessed {assessed} products"))
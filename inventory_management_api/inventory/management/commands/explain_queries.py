@@ -0,0 +1,158 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from inventory.availability import rebuild_availability
+from inventory.models import *
+from inventory.reorder import compute_suggestions
+from inventory.rollups import rebuild_rollups
+from inventory.search import rebuild_search_documents
+from inventory.services import REASON_DIRECTIONS, TRANSFER_REASONS
+from inventory.summaries import rebuild_summaries
+
+# Tables that grow with the business; a full scan of any of them fails the check
+LARGE_TABLES = {model._meta.db_table for model in (InventoryProduct, InventoryChange, InventoryChangeRollup, ProductSearchDocument, StockSnapshot, StockAvailability, ReorderSuggestion)}
+
+
+class Command(BaseCommand):
+    help = 'Seed a large dataset, EXPLAIN every query the inventory endpoints run and fail on full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Users to spread the seeded products over')
+        parser.add_argument('--products', type=int, default=20000, help='Products to seed in total')
+        parser.add_argument('--changes', type=int, default=5, help='Ledger entries to seed per product')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded data instead of rolling it back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, product = self.seed(options['users'], options['products'], options['changes'])
+            self.analyze()
+            failures = []
+            for name, args, params in self.endpoints(product):
+                failures.extend(self.check_endpoint(user, reverse(name, args=args), params))
+            if not options['keep']:
+                transaction.set_rollback(True)  # Leave the database as we found it
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries do a full table scan: " + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('No full table scans'))
+
+    # Endpoints to check as (url name, url args, query parameters)
+    def endpoints(self, product):
+        now = timezone.now()
+        endpoints = [
+            ('inventoryproduct-list', [], {}),
+            ('inventoryproduct-list', [], {'name': product.name}),
+            ('inventoryproduct-list', [], {'search': product.name}),
+            ('inventoryproduct-detail', [product.pk], {}),
+            ('inventoryproduct-low-stock', [], {}),
+            ('inventoryproduct-reorder-suggestions', [], {}),
+            ('inventoryproduct-availability', [], {'name': product.name}),
+            ('inventoryproduct-availability', [], {'barcode': product.barcode}),
+            ('inventoryproduct-change-history', [product.pk], {}),
+            ('inventoryproduct-change-history', [product.pk], {'as_of': (now - timedelta(days=1)).isoformat()}),
+            ('inventoryproduct-list', [], {'as_of': now.isoformat()}),
+            ('inventoryproduct-inventory-report', [], {}),
+            ('inventorychange-list', [], {}),
+            ('inventorychange-list', [], {'cursor': '', 'ordering': '-timestamp'}),
+            ('inventorychange-rollup', [], {'start': (now - timedelta(days=30, minutes=17)).isoformat(), 'end': now.isoformat()}),
+        ]
+        for field in ('name', 'quantity', 'price', 'date_added'):
+            endpoints.append(('inventoryproduct-list', [], {'cursor': '', 'ordering': f"-{field}"}))
+        return endpoints
+
+    def seed(self, users, products, changes):
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        owners = [
+            get_user_model().objects.create_user(f"explain-{stamp}-{index}", f"explain-{stamp}-{index}@example.invalid", get_random_string(20))
+            for index in range(users)
+        ]
+        categories = [Category.objects.create(name=f"Explain {stamp} {index}") for index in range(5)]
+        suppliers = [Supplier.objects.create(name=f"Supplier {index}", contact=f"{stamp[-7:]}{index:03d}", email='supplier@example.invalid', address='-') for index in range(5)]
+        stores = [Store.objects.create(name=f"Store {index}", contact=f"{stamp[-7:]}{index + 500:03d}", email='store@example.invalid', address='-') for index in range(5)]
+
+        rows = InventoryProduct.objects.bulk_create([
+            InventoryProduct(
+                name=f"Product {index}", quantity=random.randint(0, 200), price=Decimal(random.randint(1, 10000)) / 100,
+                reorder_level=random.randint(0, 20), user=owners[index % users], category=random.choice(categories),
+                supplier=random.choice(suppliers), store=random.choice(stores), barcode=f"{stamp}-{index}",
+            )
+            for index in range(products)
+        ], batch_size=1000)
+        rows = list(InventoryProduct.objects.filter(user__in=owners).order_by('id'))  # Primary keys, whatever the backend
+
+        reasons = [choice for choice, _ in InventoryChange._meta.get_field('reason').choices if choice not in TRANSFER_REASONS]
+        InventoryChange.objects.bulk_create([
+            InventoryChange(product=row, quantity=row.quantity, quantity_change=REASON_DIRECTIONS[reason] * random.randint(1, 20), user=row.user, reason=reason)
+            for row in rows for reason in random.choices(reasons, k=changes)
+        ], batch_size=1000)
+        rebuild_summaries()  # bulk_create skipped the incremental maintenance
+        rebuild_availability()
+        rebuild_rollups()
+        compute_suggestions()  # Reads the rollups
+        rebuild_search_documents()
+        return owners[0], rows[0]
+
+    # Refresh planner statistics after seeding
+    def analyze(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('ANALYZE TABLE ' + ', '.join(sorted(LARGE_TABLES)))
+            elif connection.vendor in ('sqlite', 'postgresql'):
+                cursor.execute('ANALYZE')
+
+    # Run the endpoint, EXPLAIN each SELECT it issued and return the ones that scan a large table
+    def check_endpoint(self, user, path, params):
+        host = next((host for host in settings.ALLOWED_HOSTS if '*' not in host and not host.startswith('.')), 'localhost')
+        request = APIRequestFactory().get(path, params, HTTP_HOST=host)  # Pagination links are built from the host
+        force_authenticate(request, user)
+        match = resolve(path)
+        with CaptureQueriesContext(connection) as context:
+            response = match.func(request, *match.args, **match.kwargs)
+        if response.status_code != 200:
+            raise CommandError(f"{path} {params} answered {response.status_code}: {response.data}")
+
+        failures = []
+        for query in context.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            scans = self.full_scans(query['sql'])
+            label = f"{path} {params}"
+            if scans:
+                failures.append(f"{label} ({', '.join(scans)})")
+                self.stdout.write(self.style.ERROR(f"FULL SCAN {label}: {query['sql']}"))
+            else:
+                self.stdout.write(f"ok {label}: {query['sql'][:120]}")
+        return failures
+
+    # Large tables read in full according to the backend's query plan
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                details = [row[-1] for row in cursor.fetchall()]
+                return [
+                    detail for detail in details
+                    if detail.startswith('SCAN ') and 'USING' not in detail
+                    and detail.split()[-1] in LARGE_TABLES
+                ]
+            if connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql)
+                columns = [column[0] for column in cursor.description]
+                plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return [row['table'] for row in plan if row['type'] == 'ALL' and row['table'] in LARGE_TABLES]
+            cursor.execute('EXPLAIN ' + sql)
+            return [
+                line for (line,) in cursor.fetchall()
+                if 'Seq Scan on' in line and any(f"Seq Scan on {table}" in line for table in LARGE_TABLES)
+            ]
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.imports import ImportFormatError, ProductImport
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV file for a user, upserting them by barcode in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with barcode, name, description, category, supplier, store, quantity, price and reorder_level columns')
+        parser.add_argument('--user', type=int, required=True, help='Id of the user who owns the imported products')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows upserted per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(pk=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                report = ProductImport(user, options['batch_size']).run(lines)
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['rows']} rows: {report['created']} created, {report['updated']} updated, "
+            f"{len(report['errors'])} rejected in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+        ))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from inventory.archive import month_bounds, month_start, partition_name, table_partitions
+from inventory.models import InventoryChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Range partition the InventoryChange table by month (MySQL) and add the partitions of the coming months; '
+        'run it monthly. Partitioning needs the timestamp in the primary key and no foreign keys on the table, so the '
+        "first run replaces the primary key with (id, timestamp) and drops the table's foreign key constraints "
+        '(Django still applies on_delete itself).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='Future months to keep a partition ready for')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError('Partitioning the change table is only supported on MySQL')
+
+        current = month_start(timezone.now())
+        last = current
+        for _ in range(options['months_ahead']):
+            last = month_bounds(last)[1].date()
+
+        existing = table_partitions()
+        if existing:
+            added = self.extend(self.months(current, last), existing)
+        else:
+            oldest = InventoryChange.objects.aggregate(oldest=Min('timestamp'))['oldest']
+            added = self.partition(self.months(min(month_start(oldest), current) if oldest else current, last))
+        self.stdout.write(self.style.SUCCESS(f"Added {added} monthly partitions"))
+
+    # First days of the months from first to last
+    def months(self, first, last):
+        months = [first]
+        while months[-1] < last:
+            months.append(month_bounds(months[-1])[1].date())
+        return months
+
+    def execute_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    # PARTITION clause for a month: rows before the first day of the next month
+    def month_partition(self, month):
+        return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{month_bounds(month)[1]:%Y-%m-%d %H:%M:%S}')"
+
+    # First run: one partition per month from the oldest change on, a catch-all for anything
+    # older (so every month partition holds exactly its month) and one for the future
+    def partition(self, months):
+        table = connection.ops.quote_name(InventoryChange._meta.db_table)
+        for (name,) in self.execute_sql(
+            'SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS '
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_TYPE = 'FOREIGN KEY'",
+            [InventoryChange._meta.db_table],
+        ):
+            self.execute_sql(f"ALTER TABLE {table} DROP FOREIGN KEY {connection.ops.quote_name(name)}")
+        self.execute_sql(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, {connection.ops.quote_name('timestamp')})")
+
+        partitions = [f"PARTITION p_old VALUES LESS THAN ('{month_bounds(months[0])[0]:%Y-%m-%d %H:%M:%S}')"]
+        partitions += [self.month_partition(month) for month in months]
+        partitions.append('PARTITION pmax VALUES LESS THAN (MAXVALUE)')
+        self.execute_sql(f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS({connection.ops.quote_name('timestamp')}) ({', '.join(partitions)})")
+        return len(months)
+
+    # Later runs: split the future partition into the missing months
+    def extend(self, months, existing):
+        newest = max((name for name in existing if name[1:].isdigit()), default='')
+        months = [month for month in months if partition_name(month) > newest]
+        if not months:
+            return 0
+        table = connection.ops.quote_name(InventoryChange._meta.db_table)
+        partitions = [self.month_partition(month) for month in months] + ['PARTITION pmax VALUES LESS THAN (MAXVALUE)']
+        self.execute_sql(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(partitions)})")
+        return len(months)
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.alerts import deliver_alerts
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued low-stock alerts to the configured sinks (INVENTORY_ALERT_SINKS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=100, help='Alerts delivered per batch')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                delivered = deliver_alerts(batch_size=options['batch_size'])
+                total += delivered
+                if delivered:
+                    continue  # More may be due right away
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} alerts"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily InventoryChange rollups from the ledger (archived months are kept)'
+
+    def handle(self, *args, **options):
+        buckets = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} rollup buckets"))
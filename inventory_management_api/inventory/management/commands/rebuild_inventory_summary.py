@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the InventorySummary rows read by inventory_report from the product table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the summary of this user id')
+
+    def handle(self, *args, **options):
+        groups = rebuild_summaries(options['user'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {groups} summary rows"))
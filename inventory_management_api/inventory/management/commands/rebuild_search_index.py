@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search documents from the product table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the documents of this user id')
+
+    def handle(self, *args, **options):
+        documents = rebuild_search_documents(options['user'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {documents} search documents"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.availability import rebuild_availability
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the StockAvailability rows read by the availability endpoint from the product table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild the availability of this user id')
+
+    def handle(self, *args, **options):
+        rows = rebuild_availability(options['user'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} availability rows"))
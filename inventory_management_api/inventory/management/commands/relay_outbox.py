@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.outbox import purge_published, relay_events
+
+
+class Command(BaseCommand):
+    help = 'Publish outbox events in order to the configured sinks (INVENTORY_OUTBOX_SINKS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--batch-size', type=int, default=500, help='Events published per batch')
+        parser.add_argument('--purge-days', type=int, help='Delete events published more than this many days ago')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            purged = purge_published(timezone.now() - timedelta(days=options['purge_days']))
+            self.stdout.write(f"Purged {purged} published events")
+
+        total = 0
+        try:
+            while True:
+                published = relay_events(batch_size=options['batch_size'])
+                total += published
+                if published:
+                    continue  # Keep draining while there is a backlog
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Published {total} events"))
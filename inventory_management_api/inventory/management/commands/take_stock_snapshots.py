@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.history import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the stock of every product written since its last snapshot (run periodically, e.g. daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products snapshotted per transaction')
+
+    def handle(self, *args, **options):
+        taken = take_snapshots(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Took {taken} stock snapshots"))
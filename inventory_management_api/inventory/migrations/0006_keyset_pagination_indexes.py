@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_alter_inventoryproduct_store'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorychange',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='change_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryproduct',
+            index=models.Index(fields=['user', 'name', 'id'], name='product_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryproduct',
+            index=models.Index(fields=['user', 'quantity', 'id'], name='product_user_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryproduct',
+            index=models.Index(fields=['user', 'price', 'id'], name='product_user_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryproduct',
+            index=models.Index(fields=['user', 'date_added', 'id'], name='product_user_date_added_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryproduct',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Populate the summary from the products that already exist
+def build_summaries(apps, schema_editor):
+    InventoryProduct = apps.get_model('inventory', 'InventoryProduct')
+    InventorySummary = apps.get_model('inventory', 'InventorySummary')
+    groups = InventoryProduct.objects.values('user', 'store', 'category').annotate(
+        product_count=models.Count('id'),
+        low_stock_count=models.Count('id', filter=models.Q(quantity__lte=models.F('reorder_level'))),
+        total_value=models.Sum(models.ExpressionWrapper(models.F('quantity') * models.F('price'), output_field=models.DecimalField())),
+    ).order_by()
+    InventorySummary.objects.bulk_create([
+        InventorySummary(
+            user_id=group['user'], store_id=group['store'], category_id=group['category'],
+            product_count=group['product_count'], low_stock_count=group['low_stock_count'],
+            total_value=group['total_value'] or 0,
+        )
+        for group in groups
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventoryproduct_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_count', models.IntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.category')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'store', 'category'), name='unique_inventory_summary_group')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:37
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDay, TruncHour
+
+
+# Build the hourly and daily buckets for the changes already in the ledger
+def build_rollups(apps, schema_editor):
+    InventoryChange = apps.get_model('inventory', 'InventoryChange')
+    InventoryChangeRollup = apps.get_model('inventory', 'InventoryChangeRollup')
+    for granularity, trunc in (('HOUR', TruncHour), ('DAY', TruncDay)):
+        buckets = InventoryChange.objects.annotate(
+            bucket=trunc('timestamp', tzinfo=datetime.timezone.utc),
+        ).values('bucket', 'product', 'product__user', 'product__store', 'reason').annotate(
+            quantity_total=models.Sum('quantity_change'), change_count=models.Count('id'),
+        ).order_by()
+        InventoryChangeRollup.objects.bulk_create([
+            InventoryChangeRollup(
+                granularity=granularity, bucket=bucket['bucket'], product_id=bucket['product'],
+                user_id=bucket['product__user'], store_id=bucket['product__store'], reason=bucket['reason'],
+                quantity_total=bucket['quantity_total'], change_count=bucket['change_count'],
+            )
+            for bucket in buckets
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_inventorysummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryChangeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('reason', models.CharField(max_length=100)),
+                ('quantity_total', models.BigIntegerField(default=0)),
+                ('change_count', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.inventoryproduct')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'granularity', 'bucket'], name='rollup_user_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'product', 'reason', 'bucket'), name='unique_change_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
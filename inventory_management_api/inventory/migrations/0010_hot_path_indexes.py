@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_inventorychangerollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorychange',
+            index=models.Index(fields=['product', 'timestamp'], name='change_product_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryproduct',
+            index=models.Index(fields=['user', 'quantity', 'reorder_level'], name='product_user_low_stock_idx'),
+        ),
+    ]
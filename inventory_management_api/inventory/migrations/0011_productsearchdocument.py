@@ -0,0 +1,79 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+DOCUMENT_TABLE = 'inventory_productsearchdocument'
+FTS_TABLE = 'inventory_productsearch_fts'
+
+
+# Build the search document of every existing product
+def build_documents(apps, schema_editor):
+    InventoryProduct = apps.get_model('inventory', 'InventoryProduct')
+    ProductSearchDocument = apps.get_model('inventory', 'ProductSearchDocument')
+    products = InventoryProduct.objects.select_related('supplier', 'store').order_by('id')
+    ProductSearchDocument.objects.bulk_create([
+        ProductSearchDocument(
+            product_id=product.pk, user_id=product.user_id,
+            document='\n'.join([product.name, product.description, product.supplier.name, product.store.name]),
+        )
+        for product in products.iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+# Full-text index over the documents: FULLTEXT on MySQL, an external-content FTS5 table kept in
+# step by triggers on SQLite. Other backends search the document column with LIKE.
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE {DOCUMENT_TABLE} ADD FULLTEXT INDEX product_search_document_ft (document)")
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='{DOCUMENT_TABLE}', content_rowid='product_id')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {DOCUMENT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.product_id, new.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {DOCUMENT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.product_id, old.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.product_id, old.document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.product_id, new.document); END"
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")  # Index the documents built above
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE {DOCUMENT_TABLE} DROP INDEX product_search_document_ft")
+    elif vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='inventory.inventoryproduct')),
+                ('document', models.TextField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
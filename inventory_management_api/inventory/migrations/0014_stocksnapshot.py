@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Opening snapshot of every existing product; earlier moments are answered from the ledger
+def take_opening_snapshots(apps, schema_editor):
+    InventoryProduct = apps.get_model('inventory', 'InventoryProduct')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=product['id'], taken_at=now, quantity=product['quantity'], version=product['version'])
+        for product in InventoryProduct.objects.order_by('id').values('id', 'quantity', 'version').iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('version', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.inventoryproduct')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'taken_at'], name='snapshot_product_taken_idx')],
+            },
+        ),
+        migrations.RunPython(take_opening_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('path', models.CharField(max_length=500)),
+                ('row_count', models.IntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('purged', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedChangeSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField(null=True)),
+                ('offset', models.BigIntegerField()),
+                ('length', models.BigIntegerField()),
+                ('row_count', models.IntegerField()),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='inventory.changearchive')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_id', 'archive'], name='archive_segment_product_idx'), models.Index(fields=['user_id', 'archive'], name='archive_segment_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+import datetime
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Q, Subquery
+
+
+# Negate the given ledger entries (id, product_id, reason, timestamp, quantity_change) and move
+# their hourly and daily rollup buckets by the same amount
+def negate_changes(apps, changes):
+    InventoryChange = apps.get_model('inventory', 'InventoryChange')
+    InventoryChangeRollup = apps.get_model('inventory', 'InventoryChangeRollup')
+    ids, deltas = [], defaultdict(int)
+    for pk, product_id, reason, timestamp, quantity_change in changes:
+        ids.append(pk)
+        hour = timestamp.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+        for granularity, bucket in (('HOUR', hour), ('DAY', hour.replace(hour=0))):
+            deltas[(granularity, bucket, product_id, reason)] -= 2 * quantity_change
+    for start in range(0, len(ids), 1000):
+        InventoryChange.objects.filter(pk__in=ids[start:start + 1000]).update(quantity_change=-F('quantity_change'))
+    for (granularity, bucket, product_id, reason), delta in deltas.items():
+        InventoryChangeRollup.objects.filter(granularity=granularity, bucket=bucket, product_id=product_id, reason=reason).update(
+            quantity_total=F('quantity_total') + delta,
+        )
+
+
+# Sales take stock out, so they and their rollups become negative
+def negate_sales(apps):
+    apps.get_model('inventory', 'InventoryChange').objects.filter(reason='SALE').update(quantity_change=-F('quantity_change'))
+    apps.get_model('inventory', 'InventoryChangeRollup').objects.filter(reason='SALE').update(quantity_total=-F('quantity_total'))
+
+
+# Adjustments were stored as absolute values; the ones that left less stock than the product's
+# previous entry were decreases. An adjustment with no earlier entry keeps its positive value.
+def sign_changes(apps, schema_editor):
+    InventoryChange = apps.get_model('inventory', 'InventoryChange')
+    negate_sales(apps)
+    previous = InventoryChange.objects.filter(
+        Q(timestamp__lt=OuterRef('timestamp')) | Q(timestamp=OuterRef('timestamp'), id__lt=OuterRef('id')), product=OuterRef('product'),
+    ).order_by('-timestamp', '-id').values('quantity')[:1]
+    decreases = InventoryChange.objects.filter(reason='ADJUSTMENT').annotate(previous_quantity=Subquery(previous)).filter(
+        previous_quantity__gt=F('quantity'),
+    )
+    negate_changes(apps, list(decreases.values_list('id', 'product_id', 'reason', 'timestamp', 'quantity_change')))
+    apps.get_model('inventory', 'ChangeArchive').objects.update(signed_deltas=False)  # Files already written keep unsigned sales
+
+
+def unsign_changes(apps, schema_editor):
+    InventoryChange = apps.get_model('inventory', 'InventoryChange')
+    negate_sales(apps)
+    decreases = InventoryChange.objects.filter(reason='ADJUSTMENT', quantity_change__lt=0)
+    negate_changes(apps, list(decreases.values_list('id', 'product_id', 'reason', 'timestamp', 'quantity_change')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_changearchive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorychange',
+            name='quantity_change',
+            field=models.IntegerField(),
+        ),
+        migrations.AddField(
+            model_name='changearchive',
+            name='signed_deltas',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(sign_changes, unsign_changes),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+# Availability rows for the existing products; writes from here on keep them up to date
+def build_availability(apps, schema_editor):
+    InventoryProduct = apps.get_model('inventory', 'InventoryProduct')
+    StockAvailability = apps.get_model('inventory', 'StockAvailability')
+    groups = InventoryProduct.objects.values('user', 'name', 'store').annotate(quantity=Sum('quantity'), product_count=Count('id')).order_by()
+    StockAvailability.objects.bulk_create([
+        StockAvailability(
+            user_id=group['user'], name=group['name'], store_id=group['store'],
+            quantity=group['quantity'], product_count=group['product_count'],
+        )
+        for group in groups.iterator(chunk_size=1000)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_signed_quantity_change'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('product_count', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.store')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'name', 'store'), name='unique_stock_availability')],
+            },
+        ),
+        migrations.RunPython(build_availability, migrations.RunPython.noop),
+    ]
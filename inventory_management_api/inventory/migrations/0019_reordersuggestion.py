@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_stocktransfer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('sold_short', models.IntegerField(default=0)),
+                ('sold_long', models.IntegerField(default=0)),
+                ('daily_sales', models.FloatField(default=0)),
+                ('days_of_cover', models.FloatField(null=True)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_suggestion', to='inventory.inventoryproduct')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.supplier')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'suggested_quantity'], name='reorder_user_suggested_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_purchaseorder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventoryproduct',
+            name='product_user_low_stock_idx',
+        ),
+        migrations.AddField(
+            model_name='inventoryproduct',
+            name='is_low_stock',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('quantity__lte', models.F('reorder_level'))), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryproduct',
+            index=models.Index(fields=['user', 'is_low_stock', 'id'], name='product_user_is_low_stock_idx'),
+        ),
+    ]
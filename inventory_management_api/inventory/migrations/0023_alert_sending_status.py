@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_outbox_claimed_until'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lowstockalert',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=10),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
-from django.conf import settings 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 class Category(models.Model):   
@@ -29,6 +30,13 @@ class Store(models.Model):
     def __str__(self):
         return self.name  # String representation of the store
 
+class InventoryProductQuerySet(models.QuerySet):
+    # Relations rendered by the *_name fields of InventoryProductSerializer
+    SERIALIZER_RELATIONS = ('category', 'supplier', 'store', 'user')
+
+    def for_user(self, user):
+        return self.filter(user=user)  # Products owned/managed by the given user
+
 class InventoryProduct(models.Model):
     name = models.CharField(max_length=100, blank=False)  # Product name
     description = models.TextField(blank=True)  # Optional product description
@@ -42,22 +50,344 @@ class InventoryProduct(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE,  blank=False, null=False)  # Store where product is located
     barcode = models.CharField(max_length=100, unique=True, null=True, blank=True)  # Optional unique barcode
     reorder_level = models.PositiveIntegerField(default=10)  # Quantity at which to reorder
+    version = models.PositiveIntegerField(default=0)  # Bumped on every write for optimistic concurrency control
+    # Stored column computed by the database from quantity and reorder_level, so it stays correct
+    # through every write path, F() updates included, and low-stock reads are index lookups
+    is_low_stock = models.GeneratedField(
+        expression=models.Q(quantity__lte=models.F('reorder_level')), output_field=models.BooleanField(), db_persist=True,
+    )
+
+    objects = InventoryProductQuerySet.as_manager()
+
+    # Fields that determine the product's contribution to InventorySummary
+    SUMMARY_FIELDS = ('user_id', 'store_id', 'category_id', 'quantity', 'price', 'reorder_level')
+    # ... and to StockAvailability
+    AVAILABILITY_FIELDS = ('user_id', 'name', 'store_id', 'quantity')
+    # ... and to its ProductSearchDocument (search.SEARCH_DOCUMENT_FIELDS reads the supplier and store names)
+    SEARCH_FIELDS = ('user_id', 'name', 'description', 'supplier_id', 'store_id')
+
+    class Meta:
+        # Every product query is scoped to a user, so each index leads with it. (user, id) is served
+        # by the user_id foreign key index, which carries the primary key on InnoDB and SQLite.
+        indexes = [
+            # (user, ordering field, id) for keyset pagination over the OrderingFilter fields; the
+            # name index also serves the exact name filter
+            models.Index(fields=['user', 'name', 'id'], name='product_user_name_idx'),
+            models.Index(fields=['user', 'quantity', 'id'], name='product_user_quantity_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='product_user_price_idx'),
+            models.Index(fields=['user', 'date_added', 'id'], name='product_user_date_added_idx'),
+            # low_stock's rows in id order, by an equality on the stored low-stock flag
+            models.Index(fields=['user', 'is_low_stock', 'id'], name='product_user_is_low_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - Quantity: {self.quantity}- @ ${self.price}"  # String representation of the product
 
+    # Remember the persisted summary and availability fields so saves can apply deltas to them,
+    # the search fields so saves that leave them alone skip reindexing, and the persisted
+    # barcode so a changed barcode's cached lookup can be dropped
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in instance.__dict__ for field in cls.SUMMARY_FIELDS):
+            instance._summary_state = instance.summary_state()
+        if all(field in instance.__dict__ for field in cls.AVAILABILITY_FIELDS):
+            instance._availability_state = instance.availability_state()
+        if all(field in instance.__dict__ for field in cls.SEARCH_FIELDS):
+            instance._search_state = instance.search_state()
+        instance._persisted_barcode = instance.__dict__.get('barcode')  # Cached lookups to invalidate if it changes
+        return instance
+
+    # The database computes is_low_stock on write; mirror the stored value so the saved instance
+    # doesn't carry the one it was loaded with
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.is_low_stock = self.quantity <= self.reorder_level
+
+    def summary_state(self):
+        return tuple(getattr(self, field) for field in self.SUMMARY_FIELDS)
+
+    def availability_state(self):
+        return tuple(getattr(self, field) for field in self.AVAILABILITY_FIELDS)
+
+    def search_state(self):
+        return tuple(getattr(self, field) for field in self.SEARCH_FIELDS)
+
+class StockTransfer(models.Model):
+    # Stock moved between two stores in one operation; its InventoryChange rows come in pairs,
+    # TRANSFER_OUT on the source product and TRANSFER_IN on the destination product
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)  # User who made the transfer
+    from_store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='transfers_out')  # Store the stock left
+    to_store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='transfers_in')  # Store the stock arrived at
+    created = models.DateTimeField(auto_now_add=True)  # When the transfer was made
+
+    def __str__(self):
+        return f"{self.from_store} -> {self.to_store} at {self.created}"
+
 class InventoryChange(models.Model):
+    # Fields that determine which InventoryChangeRollup buckets the change counts towards
+    ROLLUP_FIELDS = ('product_id', 'reason', 'timestamp', 'quantity_change')
+
     product = models.ForeignKey(InventoryProduct, on_delete=models.CASCADE)  # Associated product
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(0)])  # New quantity after change
-    quantity_change = models.PositiveIntegerField(validators=[MinValueValidator(0)])  # Amount of change
+    quantity_change = models.IntegerField()  # Signed change in stock: negative for sales, positive for restocks and returns
     timestamp = models.DateTimeField(auto_now=True)  # When the change occurred
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)  # User who made the change
     reason = models.CharField(max_length=100, choices=[
         ('SALE', 'Sale'),
         ('RESTOCK', 'Restock'),
         ('ADJUSTMENT', 'Adjustment'),
-        ('RETURN', 'Return')
+        ('RETURN', 'Return'),
+        ('TRANSFER_OUT', 'Transfer out'),
+        ('TRANSFER_IN', 'Transfer in'),
     ])  # Reason for the inventory change
+    # Transfer the entry belongs to; no database constraint, as partition_changes drops the table's foreign keys
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, null=True, blank=True, related_name='changes', db_constraint=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'id'], name='change_user_timestamp_idx'),  # Keyset pages ordered by timestamp
+            models.Index(fields=['product', 'timestamp'], name='change_product_timestamp_idx'),  # change_history and per-product ranges
+        ]
+
+    # Remember the persisted rollup fields so edits and deletes can be undone in the rollups
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in instance.__dict__ for field in cls.ROLLUP_FIELDS):
+            instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        return tuple(getattr(self, field) for field in self.ROLLUP_FIELDS)
+
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity} at {self.timestamp}"  # String representation of the change
+
+class StockSnapshot(models.Model):
+    # Stock of a product at a point in time. Stock as of any moment is the latest snapshot before
+    # it combined with the ledger entries after the snapshot, instead of a replay of the history.
+    product = models.ForeignKey(InventoryProduct, on_delete=models.CASCADE, related_name='snapshots')  # Product counted
+    taken_at = models.DateTimeField()  # Moment the quantity was read
+    quantity = models.PositiveIntegerField()  # Quantity at taken_at
+    version = models.PositiveIntegerField()  # Product version at taken_at; unchanged products aren't snapshotted again
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'taken_at'], name='snapshot_product_taken_idx'),  # Latest snapshot before a moment
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} at {self.taken_at}"
+
+class ChangeArchive(models.Model):
+    # A month of InventoryChange rows moved out of the database into a gzip file of JSON lines,
+    # written as one gzip member per ArchivedChangeSegment so a segment is read on its own
+    month = models.DateField(unique=True)  # First day of the archived month (UTC)
+    path = models.CharField(max_length=500)  # Archive file
+    row_count = models.IntegerField()  # Rows in the file
+    sha256 = models.CharField(max_length=64)  # Checksum of the file
+    purged = models.BooleanField(default=False)  # Rows deleted from the table; only purged archives are served
+    signed_deltas = models.BooleanField(default=True)  # False for files written while quantity_change was unsigned
+    created = models.DateTimeField(auto_now_add=True)  # When the archive was written
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.row_count} changes"
+
+
+class ArchivedChangeSegment(models.Model):
+    # Archived changes of one product made by one user, at [offset, offset + length) of the file
+    archive = models.ForeignKey(ChangeArchive, on_delete=models.CASCADE, related_name='segments')  # Archive holding the rows
+    product_id = models.BigIntegerField()  # Product of the changes; plain columns, as the archive outlives the rows
+    user_id = models.BigIntegerField(null=True)  # User who made the changes
+    offset = models.BigIntegerField()  # Start of the segment's gzip member in the file
+    length = models.BigIntegerField()  # Compressed size of the member
+    row_count = models.IntegerField()  # Changes in the segment
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product_id', 'archive'], name='archive_segment_product_idx'),  # change_history
+            models.Index(fields=['user_id', 'archive'], name='archive_segment_user_idx'),  # Change lists
+        ]
+
+    def __str__(self):
+        return f"{self.archive_id}: product {self.product_id}, user {self.user_id} ({self.row_count})"
+
+
+class InventorySummary(models.Model):
+    # Incrementally maintained totals per (user, store, category), read by inventory_report
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner of the summarized products
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)  # Store of the summarized products
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)  # Category of the summarized products
+    product_count = models.IntegerField(default=0)  # Number of products in the group
+    low_stock_count = models.IntegerField(default=0)  # Products at or below their reorder level
+    total_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)  # Sum of quantity * price
+    updated = models.DateTimeField(auto_now=True)  # Last time the row was rebuilt
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'store', 'category'], name='unique_inventory_summary_group'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.store} / {self.category}: {self.product_count} products"
+
+
+class StockAvailability(models.Model):
+    # Incrementally maintained stock per (user, product name, store). A user's products sharing a
+    # name are one item stocked at several stores, so its availability is one index range.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner of the products
+    name = models.CharField(max_length=100)  # Product name shared by the item's rows
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)  # Store holding the stock
+    quantity = models.BigIntegerField(default=0)  # Units in stock at the store
+    product_count = models.IntegerField(default=0)  # Products behind the row
+    updated = models.DateTimeField(auto_now=True)  # Last time the row was written
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name', 'store'], name='unique_stock_availability'),  # Also the lookup index
+        ]
+
+    def __str__(self):
+        return f"{self.name} @ {self.store}: {self.quantity}"
+
+
+class ReorderSuggestion(models.Model):
+    # Per-product sales velocity and reorder quantity, recomputed by compute_reorder_suggestions
+    product = models.OneToOneField(InventoryProduct, on_delete=models.CASCADE, related_name='reorder_suggestion')  # Product assessed
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner of the product at computed_at
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)  # Supplier to reorder from at computed_at
+    quantity = models.PositiveIntegerField()  # Stock at computed_at
+    sold_short = models.IntegerField(default=0)  # Units sold over the short window
+    sold_long = models.IntegerField(default=0)  # Units sold over the long window
+    daily_sales = models.FloatField(default=0)  # Units per day, the faster of the two windows
+    days_of_cover = models.FloatField(null=True)  # Days the stock lasts at daily_sales; None without sales
+    suggested_quantity = models.PositiveIntegerField(default=0)  # Units to order to cover lead time and target cover
+    computed_at = models.DateTimeField()  # When the batch job computed the row
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'suggested_quantity'], name='reorder_user_suggested_idx'),  # Products to reorder
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: order {self.suggested_quantity} ({self.days_of_cover} days of cover)"
+
+
+class PurchaseOrder(models.Model):
+    # Order of low-stock products from one supplier; drafts are generated, receiving restocks them
+    DRAFT = 'DRAFT'
+    RECEIVED = 'RECEIVED'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Buyer
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='purchase_orders')  # Supplier ordered from
+    status = models.CharField(max_length=10, choices=[(DRAFT, 'Draft'), (RECEIVED, 'Received')], default=DRAFT)
+    created = models.DateTimeField(auto_now_add=True)  # When the order was generated
+    received_at = models.DateTimeField(null=True, blank=True)  # When the goods were received
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='purchase_order_user_status_idx'),  # Open orders per buyer
+        ]
+
+    def __str__(self):
+        return f"PO {self.pk} - {self.supplier} ({self.status})"
+
+
+class PurchaseOrderLine(models.Model):
+    order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='lines')  # Order the line belongs to
+    product = models.ForeignKey(InventoryProduct, on_delete=models.CASCADE, related_name='purchase_order_lines')  # Product ordered
+    quantity = models.PositiveIntegerField()  # Units ordered
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id}"
+
+
+class InventoryChangeRollup(models.Model):
+    # Incrementally maintained InventoryChange totals per time bucket, product and reason
+    HOUR = 'HOUR'
+    DAY = 'DAY'
+
+    granularity = models.CharField(max_length=4, choices=[(HOUR, 'Hour'), (DAY, 'Day')])  # Bucket width
+    bucket = models.DateTimeField()  # Start of the bucket (UTC)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner of the product
+    product = models.ForeignKey(InventoryProduct, on_delete=models.CASCADE)  # Product the changes belong to
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)  # Store of the product
+    reason = models.CharField(max_length=100)  # Reason of the summed changes
+    quantity_total = models.BigIntegerField(default=0)  # Sum of quantity_change (signed)
+    change_count = models.IntegerField(default=0)  # Number of changes in the bucket
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'product', 'reason', 'bucket'], name='unique_change_rollup_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'granularity', 'bucket'], name='rollup_user_bucket_idx'),  # Range scans per user
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.reason} {self.granularity} {self.bucket}: {self.quantity_total}"
+
+
+class ProductSearchDocument(models.Model):
+    # Denormalized text of a product and its related names, indexed by the search backend
+    # (FULLTEXT on MySQL, an FTS5 table on SQLite) instead of LIKE scans over four columns
+    product = models.OneToOneField(InventoryProduct, on_delete=models.CASCADE, primary_key=True, related_name='search_document')  # Indexed product
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner of the product
+    document = models.TextField()  # Name, description, supplier and store name of the product
+
+    def __str__(self):
+        return f"{self.product_id}: {self.document[:50]}"
+
+
+class LowStockAlert(models.Model):
+    # Queued low-stock notification, delivered by the process_alerts worker. Repeat alerts for a
+    # product within one coalescing window update the same row instead of queueing another.
+    PENDING = 'PENDING'
+    SENDING = 'SENDING'  # Claimed by a worker until available_at
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+
+    product = models.ForeignKey(InventoryProduct, on_delete=models.CASCADE)  # Product that ran low
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner to notify
+    window_start = models.DateTimeField()  # Start of the coalescing window the alert belongs to
+    quantity = models.PositiveIntegerField()  # Latest quantity reported in the window
+    reorder_level = models.PositiveIntegerField()  # Reorder level at the latest report
+    occurrences = models.IntegerField(default=0)  # Low-stock events coalesced into this alert
+    status = models.CharField(max_length=10, choices=[(PENDING, 'Pending'), (SENDING, 'Sending'), (SENT, 'Sent'), (FAILED, 'Failed')], default=PENDING)
+    attempts = models.IntegerField(default=0)  # Delivery attempts so far
+    available_at = models.DateTimeField()  # Earliest time the worker may (re)try delivery
+    last_error = models.TextField(blank=True)  # Error of the last failed attempt
+    created = models.DateTimeField(auto_now_add=True)  # When the first event of the window arrived
+    sent_at = models.DateTimeField(null=True, blank=True)  # When the alert was delivered
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'window_start'], name='unique_low_stock_alert_window'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='alert_status_available_idx'),  # Worker's queue scan
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} low stock ({self.quantity}/{self.reorder_level}) {self.status}"
+
+
+class OutboxEvent(models.Model):
+    # Inventory event written in the same transaction as the change it describes, published to
+    # the outbox sinks in id order by the relay_outbox worker
+    topic = models.CharField(max_length=50)  # e.g. product.updated, change.created
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)  # Owner of the product concerned
+    product_id = models.BigIntegerField(null=True)  # Product concerned; a plain column so events outlive the product
+    payload = models.JSONField(encoder=DjangoJSONEncoder)  # Snapshot of the row after the change
+    created = models.DateTimeField(auto_now_add=True)  # When the event was recorded
+    published_at = models.DateTimeField(null=True, blank=True)  # When the relay delivered it
+    claimed_until = models.DateTimeField(null=True, blank=True)  # Lease of the relay currently sending it
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['published_at', 'id'], name='outbox_published_id_idx'),  # Relay's scan of unpublished events
+        ]
 
     def __str__(self):
-        return f"{self.product.name} - {self.quantity} at {self.timestamp}"  # String representation of the change
\ No newline at end of file
+        return f"{self.pk} {self.topic} {self.product_id}"
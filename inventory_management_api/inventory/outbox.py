@@ -0,0 +1,96 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import OutboxEvent
+from .sinks import load_sinks
+
+# Every product and InventoryChange write records an OutboxEvent in its own transaction (through
+# the signals, or explicitly where rows are written in bulk). The relay_outbox worker then
+# pushes the events to the sinks in INVENTORY_OUTBOX_SINKS, so consumers stop polling /changes/.
+DEFAULT_SINKS = [{'BACKEND': 'inventory.sinks.LogSink', 'OPTIONS': {'logger': 'inventory.outbox', 'level': 20}}]
+RELAY_LEASE = datetime.timedelta(seconds=getattr(settings, 'INVENTORY_OUTBOX_LEASE', 300))  # How long a relay may hold a batch
+
+# Sent with events (a list of OutboxEvent) once the transaction that recorded them commits
+events_recorded = Signal()
+
+
+def product_payload(product):
+    return {
+        'id': product.pk, 'name': product.name, 'barcode': product.barcode, 'quantity': product.quantity,
+        'price': product.price, 'reorder_level': product.reorder_level, 'version': product.version,
+        'category': product.category_id, 'supplier': product.supplier_id, 'store': product.store_id,
+        'user': product.user_id,
+    }
+
+
+# product is the change's product (at least its user and store); id is None for changes
+# bulk-inserted on backends that don't return primary keys (MySQL)
+def change_payload(change, product):
+    return {
+        'id': change.pk, 'product': change.product_id, 'quantity': change.quantity, 'quantity_change': change.quantity_change,
+        'reason': change.reason, 'timestamp': change.timestamp, 'user': change.user_id,
+        'owner': product.user_id, 'store': product.store_id,
+    }
+
+
+def product_event(topic, product):
+    return OutboxEvent(topic=topic, user_id=product.user_id, product_id=product.pk, payload=product_payload(product))
+
+
+# The event belongs to the product's owner, who may differ from the user who made the change
+def change_event(topic, change, product):
+    return OutboxEvent(topic=topic, user_id=product.user_id, product_id=change.product_id, payload=change_payload(change, product))
+
+
+# Save events in the current transaction and announce them once it commits. Listeners need
+# their ids (the feed's event ids), which a multi-row INSERT doesn't report on MySQL, so there
+# each event is inserted on its own.
+def record_events(events):
+    if connection.features.can_return_rows_from_bulk_insert:
+        events = OutboxEvent.objects.bulk_create(events, batch_size=1000)
+    else:
+        for event in events:
+            event.save(force_insert=True)
+    transaction.on_commit(lambda: events_recorded.send(sender=OutboxEvent, events=events))
+
+
+# What the sinks receive for an event
+def event_message(event):
+    return {'id': event.pk, 'type': event.topic, 'product': event.product_id, 'created': event.created, 'data': event.payload}
+
+
+# Publish up to batch_size unpublished events in id order and return how many were sent. The
+# batch is claimed with a lease in a short transaction and the sinks are called after it
+# commits, so writes recording new events never wait on sink I/O. While a batch is leased
+# other relays back off instead of sending later events ahead of it; a failing sink releases
+# the batch for the next run, and a relay that dies mid-batch loses it when the lease expires.
+def relay_events(sinks=None, batch_size=500):
+    if sinks is None:
+        sinks = load_sinks('INVENTORY_OUTBOX_SINKS', DEFAULT_SINKS)
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(OutboxEvent.objects.select_for_update().filter(published_at__isnull=True).order_by('id')[:batch_size])
+        if not events or any(event.claimed_until and event.claimed_until > now for event in events):
+            return 0
+        ids = [event.pk for event in events]
+        OutboxEvent.objects.filter(pk__in=ids).update(claimed_until=now + RELAY_LEASE)
+
+    try:
+        messages = [event_message(event) for event in events]
+        for sink in sinks:
+            sink.send(messages)
+    except BaseException:
+        OutboxEvent.objects.filter(pk__in=ids, published_at__isnull=True).update(claimed_until=None)
+        raise
+    OutboxEvent.objects.filter(pk__in=ids).update(published_at=timezone.now(), claimed_until=None)
+    return len(events)
+
+
+# Delete events published before the given time; returns how many were removed
+def purge_published(before):
+    deleted, _ = OutboxEvent.objects.filter(published_at__lt=before).delete()
+    return deleted
@@ -0,0 +1,186 @@
+import base64
+import heapq
+import itertools
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Page-number pagination by default; requests that pass ?cursor= (empty for the first page) switch to
+# keyset pagination on (ordering field, id), which needs neither COUNT(*) nor OFFSET
+class KeysetPagination(PageNumberPagination):
+    cursor_query_param = 'cursor'  # Query parameter that opts a request into keyset mode
+    tiebreaker = 'id'  # Unique column appended to the ordering so every position is exact
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)  # Regular numbered pages
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        queryset, field = self.keyset_queryset(queryset, request)
+        return self.keyset_page(list(queryset[:page_size + 1]), field, page_size)  # One extra row tells us whether there is a next page
+
+    # paginate_queryset for async views: the same pages, counted and fetched with the async ORM
+    async def apaginate_queryset(self, queryset, request):
+        self.keyset = self.cursor_query_param in request.query_params
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        if self.keyset:
+            queryset, field = self.keyset_queryset(queryset, request)
+            return self.keyset_page([row async for row in queryset[:page_size + 1]], field, page_size)
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()  # Fills the cached property, so page() doesn't count again
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        return list(self.page)
+
+    # Page of queryset merged with extra rows from another source (e.g. archived changes), in
+    # either mode. The queryset is only read up to the end of the requested page.
+    def paginate_merged(self, queryset, extra, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        self.request = request
+        queryset, field = self.keyset_queryset(queryset, request)
+        descending = self.get_ordering(queryset)[1]
+        key = self.row_key(field)
+        extra = sorted(extra, key=key, reverse=descending)
+        if not self.keyset:
+            return super().paginate_queryset(MergedRows(queryset, extra, key, descending), request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        position = self.decode_cursor(request, queryset.model, field)
+        if position is not None:
+            start = position[1:] if field == self.tiebreaker else position
+            extra = [row for row in extra if (key(row) < start if descending else key(row) > start)]
+        rows = MergedRows(queryset, extra, key, descending)[:page_size + 1]
+        return self.keyset_page(rows, field, page_size)
+
+    # Sort key of a row under an ordering on field, with id as the tiebreaker
+    def row_key(self, field):
+        if field == self.tiebreaker:
+            return lambda row: (row.pk,)
+        return lambda row: (getattr(row, field), row.pk)
+
+    # Queryset ordered by (field, id) and positioned after the request's cursor, and that field
+    def keyset_queryset(self, queryset, request):
+        field, descending = self.get_ordering(queryset)
+        prefix = '-' if descending else ''
+        ordering = [f"{prefix}{field}"]
+        if field != self.tiebreaker:
+            ordering.append(f"{prefix}{self.tiebreaker}")
+        queryset = queryset.order_by(*ordering)  # Ordering backed by the (user, field, id) indexes
+
+        position = self.decode_cursor(request, queryset.model, field)
+        if position is not None:
+            queryset = queryset.filter(self.seek(field, descending, *position))  # Start right after the last row of the previous page
+        return queryset, field
+
+    # Page of rows fetched with one row beyond page_size, remembering where the next page starts
+    def keyset_page(self, rows, field, page_size):
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_position = (field, self.encode_value(getattr(last, field)), last.pk)
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    # Leading ordering field of the (already filtered and ordered) queryset
+    def get_ordering(self, queryset):
+        ordering = queryset.query.order_by or (self.tiebreaker,)
+        first = str(ordering[0])
+        return first.lstrip('-'), first.startswith('-')
+
+    # WHERE clause equivalent to (field, id) > (value, pk), or < when descending
+    def seek(self, field, descending, value, pk):
+        comparison = 'lt' if descending else 'gt'
+        if field == self.tiebreaker:
+            return Q(**{f"{self.tiebreaker}__{comparison}": pk})
+        return Q(**{f"{field}__{comparison}": value}) | Q(**{field: value, f"{self.tiebreaker}__{comparison}": pk})
+
+    def encode_value(self, value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    # (value, pk) position of the request's cursor, parsed as model's field and primary key
+    # would be, or None for the first page. Tampered cursors are rejected like malformed ones.
+    def decode_cursor(self, request, model, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None  # Empty cursor means the first page
+        try:
+            cursor_field, value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor_field != field:
+            raise NotFound(self.invalid_cursor_message)  # Cursor was issued for a different ordering
+        if value is None or isinstance(value, (list, dict)) or type(pk) is not int:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            value = model._meta.get_field(field).to_python(value)
+        except (ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+
+# Ordered queryset merged with a list of extra rows sorted the same way, sliceable like a list
+# for the paginators: a slice reads the queryset only up to the slice's end
+class MergedRows:
+    def __init__(self, queryset, extra, key, descending=False):
+        self.queryset = queryset
+        self.extra = extra
+        self.key = key
+        self.descending = descending
+
+    def count(self):
+        return self.queryset.count() + len(self.extra)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, window):
+        stop = window.stop if window.stop is not None else self.count()
+        merged = heapq.merge(self.queryset[:stop], self.extra[:stop], key=self.key, reverse=self.descending)
+        return list(itertools.islice(merged, stop))[window]
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import InventoryProduct, PurchaseOrder, PurchaseOrderLine
+from .services import apply_stock_movements
+
+# Draft purchase orders are generated from the products at or below their reorder level, one
+# order per supplier. Each line orders the product's reorder suggestion (see reorder.py), and at
+# least enough to bring it up to twice its reorder level. Receiving an order restocks its lines
+# as one batch of stock movements.
+
+
+# Raised when an order can't be received; the message says why
+class PurchaseOrderRejected(Exception):
+    pass
+
+
+# Create draft orders for the user's low-stock products that aren't on a draft order yet, and
+# return them. The products and their quantities come from one query, run after locking the
+# user's row so that concurrent generations for the same user take turns instead of both
+# putting the same products on new drafts.
+def generate_purchase_orders(user):
+    with transaction.atomic():
+        get_user_model().objects.select_for_update().only('pk').get(pk=user.pk)  # Per-user generation lock
+        products = InventoryProduct.objects.for_user(user).filter(is_low_stock=True).exclude(
+            purchase_order_lines__order__status=PurchaseOrder.DRAFT,
+        ).annotate(
+            order_quantity=Greatest(
+                Coalesce('reorder_suggestion__suggested_quantity', Value(0)),
+                F('reorder_level') * 2 - F('quantity'),
+                Value(1),
+            ),
+        ).order_by('supplier_id', 'id').values_list('id', 'supplier_id', 'order_quantity')
+
+        orders, lines = {}, []
+        for product_id, supplier_id, quantity in products:
+            if supplier_id not in orders:
+                orders[supplier_id] = PurchaseOrder.objects.create(user=user, supplier_id=supplier_id)
+            lines.append(PurchaseOrderLine(order=orders[supplier_id], product_id=product_id, quantity=quantity))
+        PurchaseOrderLine.objects.bulk_create(lines, batch_size=1000)
+    return list(orders.values())
+
+
+# Receive a draft order: every line is restocked by one bulk batch of RESTOCK changes and F()
+# increments, and the order is marked received, all in one transaction
+def receive_purchase_order(user, order):
+    with transaction.atomic():
+        order = PurchaseOrder.objects.select_for_update().get(pk=order.pk)  # Receiving twice would restock twice
+        if order.status != PurchaseOrder.DRAFT:
+            raise PurchaseOrderRejected('Only draft orders can be received.')
+        movements = [
+            {'product': product_id, 'quantity_change': quantity, 'reason': 'RESTOCK'}
+            for product_id, quantity in order.lines.order_by('id').values_list('product_id', 'quantity')
+        ]
+        applied, errors, products = apply_stock_movements(user, movements)
+        if errors:
+            raise PurchaseOrderRejected('Some products of the order are no longer yours.')
+        order.status = PurchaseOrder.RECEIVED
+        order.received_at = timezone.now()
+        order.save(update_fields=['status', 'received_at'])
+    return order
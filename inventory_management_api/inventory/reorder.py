@@ -0,0 +1,67 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import InventoryChangeRollup, InventoryProduct, ReorderSuggestion
+from .rollups import bucket_start
+
+# Reorder suggestions from sales velocity. compute_suggestions reads the daily SALE rollups of a
+# batch of products at a time and sums them over a short and a long trailing window in one
+# grouped query, so the whole catalogue is assessed without touching the raw ledger. The faster
+# of the two rates drives the suggestion, so a recent spike is reordered for before it shows in
+# the long average. Only whole UTC days count; today is still filling up.
+SHORT_WINDOW = getattr(settings, 'INVENTORY_REORDER_SHORT_WINDOW', 7)  # Days
+LONG_WINDOW = getattr(settings, 'INVENTORY_REORDER_LONG_WINDOW', 28)  # Days
+LEAD_TIME = getattr(settings, 'INVENTORY_REORDER_LEAD_TIME', 7)  # Days a supplier takes to deliver
+TARGET_COVER = getattr(settings, 'INVENTORY_REORDER_TARGET_COVER', 14)  # Days of stock an order should leave after delivery
+
+
+# Units sold per product over the short and long windows ending at end, as {id: (short, long)}
+def sales_by_window(product_ids, end):
+    short_start, long_start = end - timedelta(days=SHORT_WINDOW), end - timedelta(days=LONG_WINDOW)
+    rows = InventoryChangeRollup.objects.filter(
+        granularity=InventoryChangeRollup.DAY, reason='SALE', product_id__in=product_ids,
+        bucket__gte=min(short_start, long_start), bucket__lt=end,
+    ).values('product_id').annotate(
+        short=Sum('quantity_total', filter=Q(bucket__gte=short_start)),
+        long=Sum('quantity_total', filter=Q(bucket__gte=long_start)),
+    ).order_by()
+    return {row['product_id']: (-(row['short'] or 0), -(row['long'] or 0)) for row in rows}  # Sales are negative deltas
+
+
+# Suggestion for a product given its sales over the two windows
+def suggestion(product, sold_short, sold_long, now):
+    daily_sales = max(sold_short / SHORT_WINDOW, sold_long / LONG_WINDOW)
+    days_of_cover = product.quantity / daily_sales if daily_sales else None
+    target = math.ceil(daily_sales * (LEAD_TIME + TARGET_COVER))  # Stock that lasts until delivery plus the target cover
+    return ReorderSuggestion(
+        product_id=product.pk, user_id=product.user_id, supplier_id=product.supplier_id, quantity=product.quantity,
+        sold_short=sold_short, sold_long=sold_long, daily_sales=daily_sales, days_of_cover=days_of_cover,
+        suggested_quantity=max(target - product.quantity, 0), computed_at=now,
+    )
+
+
+# Recompute the suggestion of every product, batch_size products per query and transaction;
+# returns how many products were assessed
+def compute_suggestions(batch_size=1000):
+    now = timezone.now()
+    end = bucket_start(now, InventoryChangeRollup.DAY)
+    options = {'update_conflicts': True, 'update_fields': [
+        'user', 'supplier', 'quantity', 'sold_short', 'sold_long', 'daily_sales', 'days_of_cover', 'suggested_quantity', 'computed_at',
+    ]}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['product']  # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+
+    assessed, last_id = 0, 0
+    while True:
+        products = list(InventoryProduct.objects.filter(pk__gt=last_id).order_by('id').only('id', 'user', 'supplier', 'quantity')[:batch_size])
+        if not products:
+            return assessed
+        last_id = products[-1].pk
+        sales = sales_by_window([product.pk for product in products], end)
+        ReorderSuggestion.objects.bulk_create([suggestion(product, *sales.get(product.pk, (0, 0)), now) for product in products], **options)
+        assessed += len(products)
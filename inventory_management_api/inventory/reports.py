@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from .caching import CACHE_ALIAS
+from .models import InventorySummary
+from .rollups import rollup_totals
+
+# inventory_report is made of independent sections that run at the same time on a thread pool,
+# each thread on its own database connection. A section that misses the time budget (or fails)
+# is answered from the last value it computed and listed in 'stale_sections'; its query keeps
+# running and refreshes that value for the next report. Until a section has a value the report
+# waits for it.
+SECTION_TIMEOUT = getattr(settings, 'INVENTORY_REPORT_SECTION_TIMEOUT', 2.0)  # Seconds
+STALE_TIMEOUT = 7 * 24 * 3600  # Seconds a section's last value is kept as a fallback
+executor = ThreadPoolExecutor(getattr(settings, 'INVENTORY_REPORT_WORKERS', 8), thread_name_prefix='inventory-report')
+logger = logging.getLogger('inventory.report')
+
+
+# Total inventory value and low stock count from the maintained per-group summary rows
+def summary_section(user_id, now):
+    summary = InventorySummary.objects.filter(user_id=user_id).aggregate(
+        total_value=Sum('total_value'),  # Total inventory value
+        low_stock_items=Sum('low_stock_count'),  # Count low stock products
+    )
+    return {'total_inventory_value': summary['total_value'] or 0, 'low_stock_items_count': summary['low_stock_items'] or 0}
+
+
+# Changes over the last 30 days from the hourly/daily rollups and the ledger edges
+def recent_changes_section(user_id, now):
+    totals = rollup_totals(user_id, now - timedelta(days=30), now)
+    return {
+        'sales_last_30_days': -totals.get('SALE', {}).get('quantity', 0),  # Sales are stored as negative deltas
+        'restocks_last_30_days': totals.get('RESTOCK', {}).get('quantity', 0),
+    }
+
+
+# Sections by name, with the report fields each one fills
+REPORT_SECTIONS = {
+    'summary': (summary_section, ('total_inventory_value', 'low_stock_items_count')),
+    'recent_changes': (recent_changes_section, ('sales_last_30_days', 'restocks_last_30_days')),
+}
+
+
+def stale_key(user_id, name):
+    return f"inventory:report-section:{user_id}:{name}"
+
+
+# Compute a section and keep it as the fallback for later reports
+def run_section(name, user_id, now):
+    value = REPORT_SECTIONS[name][0](user_id, now)
+    caches[CACHE_ALIAS].set(stale_key(user_id, name), value, STALE_TIMEOUT)
+    return value
+
+
+# run_section on a pool thread, releasing its connection as a request would
+def run_pooled_section(name, user_id, now):
+    close_old_connections()
+    try:
+        return run_section(name, user_id, now)
+    finally:
+        close_old_connections()
+
+
+# Start every section and return their futures by name. Other connections can't see the writes
+# of an open transaction, so inside one the sections run inline on this connection instead.
+def start_report(user_id):
+    now = timezone.now()
+    if not connection.in_atomic_block:
+        return {name: executor.submit(run_pooled_section, name, user_id, now) for name in REPORT_SECTIONS}
+
+    futures = {}
+    for name in REPORT_SECTIONS:
+        futures[name] = Future()
+        try:
+            futures[name].set_result(run_section(name, user_id, now))
+        except Exception as exc:
+            futures[name].set_exception(exc)
+    return futures
+
+
+# Report from the sections done by now, falling back to the stale values for the others. A
+# section that has never been computed has no fallback, so the report waits for it (or raises
+# its error) rather than answering null for fields that are always numbers.
+def finish_report(user_id, futures):
+    report, stale = {}, []
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            report.update(future.result())
+            continue
+        fallback = caches[CACHE_ALIAS].get(stale_key(user_id, name))
+        if fallback is None:
+            report.update(future.result())
+            continue
+        if future.done():
+            logger.error('inventory_report section %s failed', name, exc_info=future.exception())
+        stale.append(name)
+        report.update(fallback)
+    report['stale_sections'] = stale
+    return report
+
+
+# Whether every section of a report is fresh
+def is_complete_report(report):
+    return not report['stale_sections']
+
+
+def build_report(user_id):
+    futures = start_report(user_id)
+    wait(futures.values(), timeout=SECTION_TIMEOUT)
+    return finish_report(user_id, futures)
+
+
+# build_report for async views: the event loop waits on the pool instead of a thread
+async def abuild_report(user_id):
+    futures = await sync_to_async(start_report)(user_id)
+    await asyncio.wait([asyncio.wrap_future(future) for future in futures.values()], timeout=SECTION_TIMEOUT)
+    return await sync_to_async(finish_report)(user_id, futures)
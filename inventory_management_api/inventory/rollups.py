@@ -0,0 +1,126 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from .archive import archive_horizon
+from .counters import increment_or_create
+from .models import InventoryChange, InventoryChangeRollup
+
+GRANULARITIES = (
+    (InventoryChangeRollup.HOUR, datetime.timedelta(hours=1)),
+    (InventoryChangeRollup.DAY, datetime.timedelta(days=1)),
+)
+
+
+# Start of the UTC bucket containing timestamp
+def bucket_start(timestamp, granularity):
+    timestamp = timestamp.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == InventoryChangeRollup.DAY:
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+# First bucket boundary at or after timestamp
+def bucket_ceil(timestamp, granularity, width):
+    start = bucket_start(timestamp, granularity)
+    return start if start == timestamp else start + width
+
+
+# Apply (rollup_state, sign, product) entries to the hourly and daily buckets; product is only
+# needed for additions, which may have to create the bucket with the product's owner and store
+def apply_rollup_entries(entries):
+    deltas = {}
+    for (product_id, reason, timestamp, quantity_change), sign, product in entries:
+        for granularity, _ in GRANULARITIES:
+            key = (granularity, bucket_start(timestamp, granularity), product_id, reason)
+            delta = deltas.setdefault(key, [0, 0, product])
+            delta[0] += sign * quantity_change
+            delta[1] += sign
+            delta[2] = delta[2] or product
+
+    for (granularity, bucket, product_id, reason), (quantity, count, product) in deltas.items():
+        if not (quantity or count):
+            continue
+        increment_or_create(
+            InventoryChangeRollup,
+            {'granularity': granularity, 'bucket': bucket, 'product_id': product_id, 'reason': reason},
+            {'quantity_total': quantity, 'change_count': count},
+            create=count > 0 and product is not None,
+            defaults={'user_id': product.user_id, 'store_id': product.store_id} if product is not None else None,
+        )
+
+
+# Add freshly recorded changes (with their product loaded) to the rollups
+def record_changes(changes):
+    apply_rollup_entries([(change.rollup_state(), 1, change.product) for change in changes])
+
+
+# Totals per reason over [start, end) for a user's products. Whole days come from the daily
+# buckets, whole hours at the edges from the hourly buckets, and only the sub-hour remainders
+# at either end are read from the ledger itself.
+def rollup_totals(user, start, end, product=None, store=None):
+    hour_width = GRANULARITIES[0][1]
+    day_width = GRANULARITIES[1][1]
+    first_hour = min(bucket_ceil(start, InventoryChangeRollup.HOUR, hour_width), end)
+    last_hour = max(bucket_start(end, InventoryChangeRollup.HOUR), first_hour)
+    first_day = min(bucket_ceil(first_hour, InventoryChangeRollup.DAY, day_width), last_hour)
+    last_day = max(bucket_start(last_hour, InventoryChangeRollup.DAY), first_day)
+
+    rollups = InventoryChangeRollup.objects.filter(user=user)
+    ledger = InventoryChange.objects.filter(product__user=user)
+    if product is not None:
+        rollups = rollups.filter(product=product)
+        ledger = ledger.filter(product=product)
+    if store is not None:
+        rollups = rollups.filter(store=store)
+        ledger = ledger.filter(product__store=store)
+
+    hourly = Q(bucket__gte=first_hour, bucket__lt=first_day) | Q(bucket__gte=last_day, bucket__lt=last_hour)
+    raw = Q(timestamp__gte=start, timestamp__lt=first_hour) | Q(timestamp__gte=last_hour, timestamp__lt=end)
+    parts = [
+        rollups.filter(granularity=InventoryChangeRollup.DAY, bucket__gte=first_day, bucket__lt=last_day)
+        .values('reason').annotate(quantity=Sum('quantity_total'), changes=Sum('change_count')),
+        rollups.filter(hourly, granularity=InventoryChangeRollup.HOUR)
+        .values('reason').annotate(quantity=Sum('quantity_total'), changes=Sum('change_count')),
+        ledger.filter(raw).values('reason').annotate(quantity=Sum('quantity_change'), changes=Count('id')),
+    ]
+
+    totals = {}
+    for part in parts:
+        for row in part.order_by():
+            total = totals.setdefault(row['reason'], {'quantity': 0, 'changes': 0})
+            total['quantity'] += row['quantity'] or 0
+            total['changes'] += row['changes'] or 0
+    return totals
+
+
+# Recompute the rollup buckets from the ledger. Buckets before archive_horizon() are kept as
+# they are: the changes they sum have left the table for the archive (see archive.py).
+def rebuild_rollups():
+    horizon = archive_horizon()
+    rollups = InventoryChangeRollup.objects.all()
+    changes = InventoryChange.objects.all()
+    if horizon is not None:
+        rollups = rollups.filter(bucket__gte=horizon)
+        changes = changes.filter(timestamp__gte=horizon)
+
+    with transaction.atomic():
+        rollups.delete()
+        created = 0
+        for (granularity, _), trunc in zip(GRANULARITIES, (TruncHour, TruncDay)):
+            buckets = changes.annotate(
+                bucket=trunc('timestamp', tzinfo=datetime.timezone.utc),
+            ).values('bucket', 'product', 'product__user', 'product__store', 'reason').annotate(
+                quantity_total=Sum('quantity_change'), change_count=Count('id'),
+            ).order_by()
+            created += len(InventoryChangeRollup.objects.bulk_create([
+                InventoryChangeRollup(
+                    granularity=granularity, bucket=bucket['bucket'], product_id=bucket['product'],
+                    user_id=bucket['product__user'], store_id=bucket['product__store'], reason=bucket['reason'],
+                    quantity_total=bucket['quantity_total'], change_count=bucket['change_count'],
+                )
+                for bucket in buckets
+            ], batch_size=1000))
+    return created
@@ -0,0 +1,133 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models import InventoryProduct, ProductSearchDocument
+
+# Product fields (and related names) folded into the search document, in document order
+SEARCH_DOCUMENT_FIELDS = ('name', 'description', 'supplier__name', 'store__name')
+
+# Search backend per database vendor, overridable with the INVENTORY_SEARCH_BACKEND setting
+DEFAULT_BACKENDS = {
+    'mysql': 'inventory.search.MySQLFullTextBackend',
+    'sqlite': 'inventory.search.SQLiteFTS5Backend',
+}
+FALLBACK_BACKEND = 'inventory.search.ContainsSearchBackend'
+
+FTS_TABLE = 'inventory_productsearch_fts'  # FTS5 table created by migration 0011 on SQLite
+
+
+# Text indexed for a product; supplier and store should be loaded with select_related
+def document_text(product):
+    values = []
+    for path in SEARCH_DOCUMENT_FIELDS:
+        value = product
+        for attribute in path.split('__'):
+            value = getattr(value, attribute)
+        values.append(value or '')
+    return '\n'.join(values)
+
+
+# Create or refresh the search documents of the given products with one upsert per batch
+def index_products(products, batch_size=1000):
+    documents = [ProductSearchDocument(product=product, user_id=product.user_id, document=document_text(product)) for product in products]
+    options = {'update_conflicts': True, 'update_fields': ['user', 'document']}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['product']  # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+    ProductSearchDocument.objects.bulk_create(documents, batch_size=batch_size, **options)
+    return len(documents)
+
+
+# Refresh the documents of every product in queryset, e.g. after a supplier or store was renamed
+def reindex_queryset(queryset, chunk_size=1000):
+    indexed, batch = 0, []
+    for product in queryset.select_related('supplier', 'store').order_by('id').iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) == chunk_size:
+            indexed += index_products(batch)
+            batch = []
+    if batch:
+        indexed += index_products(batch)
+    return indexed
+
+
+# Rebuild the search documents from InventoryProduct, for one user (id) or everybody
+def rebuild_search_documents(user_id=None):
+    products = InventoryProduct.objects.all()
+    if user_id is not None:
+        products = products.filter(user_id=user_id)
+    return reindex_queryset(products)
+
+
+# Words of the search terms, stripped of the operators each full-text syntax would interpret
+def search_words(terms):
+    return [word for term in terms for word in re.findall(r'\w+', term)]
+
+
+# A backend narrows a product queryset to the rows matching every search term and
+# annotates each with a relevance score (higher is better)
+class SearchBackend:
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+
+# Portable fallback: one LIKE per word over the single document column instead of four
+# columns and two joins. Every match is equally relevant.
+class ContainsSearchBackend(SearchBackend):
+    def search(self, queryset, terms):
+        for word in search_words(terms):
+            queryset = queryset.filter(search_document__document__icontains=word)
+        return queryset.annotate(relevance=Value(1.0, output_field=FloatField()))
+
+
+# InnoDB FULLTEXT index in boolean mode: every word is required and matches as a prefix
+class MySQLFullTextBackend(SearchBackend):
+    def search(self, queryset, terms):
+        words = search_words(terms)
+        if not words:
+            return queryset.annotate(relevance=Value(1.0, output_field=FloatField()))
+        against = ' '.join(f"+{word}*" for word in words)
+        table = ProductSearchDocument._meta.db_table
+        # The isnull filter joins the document table under its own name, which MATCH refers to
+        relevance = RawSQL(f"MATCH ({table}.document) AGAINST (%s IN BOOLEAN MODE)", [against], output_field=FloatField())
+        return queryset.filter(search_document__isnull=False).annotate(relevance=relevance).filter(relevance__gt=0)
+
+
+# SQLite FTS5 table mirroring the documents; bm25() ranks the matches
+class SQLiteFTS5Backend(SearchBackend):
+    def search(self, queryset, terms):
+        words = search_words(terms)
+        if not words:
+            return queryset.annotate(relevance=Value(1.0, output_field=FloatField()))
+        match = ' '.join(f'"{word}"*' for word in words)  # Implicit AND of prefix queries
+        product_table = InventoryProduct._meta.db_table
+        matching = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        relevance = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {product_table}.id",
+            [match], output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matching).annotate(relevance=relevance)
+
+
+def get_search_backend():
+    path = getattr(settings, 'INVENTORY_SEARCH_BACKEND', None) or DEFAULT_BACKENDS.get(connection.vendor, FALLBACK_BACKEND)
+    return import_string(path)()
+
+
+# SearchFilter that queries the full-text index instead of LIKE '%term%' on every search
+# field. Results are ordered by relevance unless the client asked for an explicit ordering.
+class FullTextSearchFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        queryset = get_search_backend().search(queryset, terms)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset  # OrderingFilter already applied the requested ordering
+        return queryset.order_by('-relevance', 'id')
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import *
+from .services import REASON_DIRECTIONS, TRANSFER_REASONS
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from decimal import Decimal
 
 user = get_user_model()
 
@@ -37,6 +40,14 @@ class InventoryProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventoryProduct
         fields = '__all__'  # Include all fields from the InventoryProduct model
+        read_only_fields = ['version']  # Maintained by the server, sent back by clients to detect conflicts
+
+    # Products listed ?as_of= a past moment carry their quantity at that moment
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, 'quantity_as_of'):
+            data['quantity'] = instance.quantity_as_of
+        return data
 
 # Serializer for InventoryChange model
 class InventoryChangeSerializer(serializers.ModelSerializer):   
@@ -44,3 +55,134 @@ class InventoryChangeSerializer(serializers.ModelSerializer):
         model = InventoryChange
         fields = ['id', 'product', 'quantity', 'quantity_change', 'timestamp', 'user', 'reason']  # Fields to be included in the serialized output
         read_only_fields = ['id', 'timestamp', 'user']  # Mark these fields as read-only
+
+    # quantity_change is the signed delta: sales are negative, restocks and returns positive
+    def validate(self, data):
+        reason = data.get('reason', getattr(self.instance, 'reason', None))
+        quantity_change = data.get('quantity_change', getattr(self.instance, 'quantity_change', None))
+        if reason in TRANSFER_REASONS:
+            raise serializers.ValidationError({'reason': 'Transfer entries are only written by transfers.'})
+        if quantity_change == 0:
+            raise serializers.ValidationError({'quantity_change': 'Quantity change must not be zero.'})
+        if reason != 'ADJUSTMENT' and quantity_change * REASON_DIRECTIONS[reason] < 0:
+            sign = 'negative' if REASON_DIRECTIONS[reason] < 0 else 'positive'
+            raise serializers.ValidationError({'quantity_change': f"{reason} changes must be {sign}."})
+        return data
+
+# Serializer for a single entry of a bulk stock movement request
+class StockMovementSerializer(serializers.Serializer):
+    product = serializers.IntegerField()  # Product id, resolved in bulk when the batch is applied
+    quantity_change = serializers.IntegerField()  # Units moved; only ADJUSTMENT movements may be negative
+    reason = serializers.ChoiceField(choices=[
+        choice for choice in InventoryChange._meta.get_field('reason').choices if choice[0] not in TRANSFER_REASONS
+    ])
+
+    def validate(self, data):
+        if data['quantity_change'] == 0:
+            raise serializers.ValidationError({'quantity_change': 'Quantity change must not be zero.'})
+        if data['reason'] != 'ADJUSTMENT' and data['quantity_change'] < 0:
+            raise serializers.ValidationError({'quantity_change': 'Only ADJUSTMENT movements may be negative.'})
+        return data
+
+# Serializer for one item of a stock transfer
+class TransferItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()  # Id of the product at the source store
+    quantity = serializers.IntegerField(min_value=1)  # Units moved
+
+# Serializer for stock transfers: the stores and items on the way in, the paired ledger entries on the way out
+class StockTransferSerializer(serializers.ModelSerializer):
+    items = TransferItemSerializer(many=True, allow_empty=False, write_only=True)
+    changes = InventoryChangeSerializer(many=True, read_only=True)  # TRANSFER_OUT / TRANSFER_IN pairs
+
+    class Meta:
+        model = StockTransfer
+        fields = ['id', 'from_store', 'to_store', 'user', 'created', 'items', 'changes']
+        read_only_fields = ['id', 'user', 'created']
+
+    def validate(self, data):
+        if data['from_store'] == data['to_store']:
+            raise serializers.ValidationError({'to_store': 'Stock must move to a different store.'})
+        return data
+
+# Serializer for one row of a product CSV import; related objects are given by name and
+# resolved in bulk, so validating a row never touches the database
+class ProductImportRowSerializer(serializers.Serializer):
+    barcode = serializers.CharField(max_length=100)  # Key the row is upserted by
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    category = serializers.CharField(max_length=100)  # Category name
+    supplier = serializers.CharField(max_length=150)  # Supplier name
+    store = serializers.CharField(max_length=150)  # Store name
+    quantity = serializers.IntegerField(min_value=0)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    reorder_level = serializers.IntegerField(min_value=0, required=False, default=10)
+
+# Serializer for the query parameters of the change rollup endpoint
+class ChangeRollupQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField()  # Inclusive start of the range
+    end = serializers.DateTimeField(required=False)  # Exclusive end of the range, defaults to now
+    product = serializers.IntegerField(required=False)  # Restrict to one product
+    store = serializers.IntegerField(required=False)  # Restrict to one store
+
+    def validate(self, data):
+        data.setdefault('end', timezone.now())
+        if data['start'] >= data['end']:
+            raise serializers.ValidationError({'end': 'End must be after start.'})
+        return data
+
+# Serializer for the stock of an item at one store, from StockAvailability
+class StockAvailabilitySerializer(serializers.ModelSerializer):
+    store_name = serializers.CharField(source='store.name', read_only=True)  # Store name
+
+    class Meta:
+        model = StockAvailability
+        fields = ['store', 'store_name', 'quantity', 'product_count']
+
+# Serializer for the parameters of the availability lookup: an item by name, or by the barcode of one of its products
+class AvailabilityQuerySerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100, required=False)
+    barcode = serializers.CharField(max_length=100, required=False)
+    in_stock = serializers.BooleanField(default=False)  # Only stores with stock left
+
+    def validate(self, data):
+        if ('name' in data) == ('barcode' in data):
+            raise serializers.ValidationError('Give either name or barcode.')
+        return data
+
+# Serializer for a precomputed reorder suggestion
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    store_name = serializers.CharField(source='product.store.name', read_only=True)
+
+    class Meta:
+        model = ReorderSuggestion
+        fields = [
+            'product', 'product_name', 'store_name', 'quantity', 'sold_short', 'sold_long',
+            'daily_sales', 'days_of_cover', 'suggested_quantity', 'computed_at',
+        ]
+
+# Serializer for the parameters of the reorder suggestions endpoint
+class ReorderQuerySerializer(serializers.Serializer):
+    all = serializers.BooleanField(default=False)  # Include the products that don't need reordering
+
+# Serializer for a line of a purchase order
+class PurchaseOrderLineSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = PurchaseOrderLine
+        fields = ['id', 'product', 'product_name', 'quantity']
+
+# Serializer for purchase orders; they are generated and received, not written field by field
+class PurchaseOrderSerializer(serializers.ModelSerializer):
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    lines = PurchaseOrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = ['id', 'supplier', 'supplier_name', 'status', 'created', 'received_at', 'user', 'lines']
+        read_only_fields = fields
+
+# Serializer for the ?as_of= parameter of the point-in-time stock queries
+class AsOfQuerySerializer(serializers.Serializer):
+    as_of = serializers.DateTimeField()  # Moment to report stock at
@@ -0,0 +1,202 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import F
+
+from .availability import quantity_transitions, record_availability
+from .barcodes import invalidate_barcodes
+from .caching import bump_generation, report_scope
+from .models import InventoryChange, InventoryProduct, StockTransfer
+from .outbox import change_event, product_event, record_events
+from .rollups import record_changes
+from .summaries import record_quantity_changes
+
+# Direction each reason moves stock in; ADJUSTMENT movements carry their own sign. Ledger entries
+# store the signed delta, so net movement over any set of them is a plain SUM(quantity_change).
+REASON_DIRECTIONS = {'SALE': -1, 'RESTOCK': 1, 'RETURN': 1, 'ADJUSTMENT': 1, 'TRANSFER_OUT': -1, 'TRANSFER_IN': 1}
+TRANSFER_REASONS = ('TRANSFER_OUT', 'TRANSFER_IN')  # Only written in pairs by apply_transfer
+
+
+# Raised when a product was modified by someone else since the client last read it
+class StockConflict(Exception):
+    pass
+
+
+# Raised when a transfer can't be applied as a whole; errors are per item, keyed by position.
+# conflict tells a shortage of stock (which may resolve itself) from an invalid request.
+class TransferRejected(Exception):
+    def __init__(self, errors, conflict=False):
+        super().__init__(errors)
+        self.errors = errors
+        self.conflict = conflict
+
+
+# Signed quantity delta of a validated movement
+def movement_delta(movement):
+    return REASON_DIRECTIONS[movement['reason']] * movement['quantity_change']
+
+
+# Apply many stock movements in one transaction. Each movement is a dict with
+# product (id), quantity_change and reason. Returns (applied, errors, products) where
+# applied/errors hold per-movement results keyed by the movement's position in the batch
+# and products maps the id of every touched product to its refreshed instance.
+def apply_stock_movements(user, movements):
+    applied, errors = [], []
+    product_ids = {movement['product'] for movement in movements}
+
+    with transaction.atomic():
+        owned = set(InventoryProduct.objects.for_user(user).filter(pk__in=product_ids).values_list('pk', flat=True))
+
+        # Lock rows in product id order so concurrent batches can't deadlock each other
+        ordered = sorted(enumerate(movements), key=lambda item: (item[1]['product'], item[0]))
+        today = datetime.date.today()  # Same value DateField(auto_now=True) would store
+        accepted = []
+        for index, movement in ordered:
+            if movement['product'] not in owned:
+                errors.append({'index': index, 'errors': {'product': ['Product not found.']}})
+                continue
+
+            delta = movement_delta(movement)
+            queryset = InventoryProduct.objects.filter(pk=movement['product'])
+            if delta < 0:
+                queryset = queryset.filter(quantity__gte=-delta)  # Never let stock go negative
+            if not queryset.update(quantity=F('quantity') + delta, version=F('version') + 1, last_updated=today):
+                errors.append({'index': index, 'errors': {'quantity_change': ['Insufficient stock.']}})
+                continue
+            accepted.append((index, movement, delta))
+
+        # Rows stay locked until commit, so the final quantities only reflect this batch and
+        # each change's resulting quantity can be derived by walking the batch backwards
+        products = InventoryProduct.objects.select_related('store').in_bulk({movement['product'] for _, movement, _ in accepted})
+        running = {pk: product.quantity for pk, product in products.items()}
+        changes = {}
+        for index, movement, delta in reversed(accepted):
+            product = products[movement['product']]
+            changes[index] = InventoryChange(
+                product=product,
+                quantity=running[product.pk],
+                quantity_change=delta,
+                user=user,
+                reason=movement['reason'],
+            )
+            applied.append({'index': index, 'product': product.pk, 'quantity': running[product.pk]})
+            running[product.pk] -= delta
+
+        changes = InventoryChange.objects.bulk_create([changes[index] for index in sorted(changes)])  # One multi-row INSERT in batch order
+        record_changes(changes)  # bulk_create doesn't send post_save, so add the batch to the rollups here
+
+        net_deltas = {pk: product.quantity - running[pk] for pk, product in products.items()}
+        record_quantity_changes(products, net_deltas)  # F() updates bypass the post_save summary handler
+        record_availability(quantity_transitions(products, net_deltas))  # ... and the availability handler
+        record_events(  # ... and the outbox handlers
+            [change_event('change.created', change, change.product) for change in changes]
+            + [product_event('product.updated', product) for product in products.values()]
+        )
+        invalidate_barcodes(product.barcode for product in products.values())  # ... and the barcode cache handler
+        if products:
+            bump_generation(report_scope(user.pk))  # ... and the cached inventory_report
+
+    applied.sort(key=lambda result: result['index'])
+    errors.sort(key=lambda result: result['index'])
+    return applied, errors, products
+
+
+# Save a validated product serializer only if the row is still at expected_version.
+# The version is bumped with a conditional UPDATE first, so the row is locked only for the
+# duration of this short transaction and a concurrent writer surfaces as StockConflict
+# instead of a lost update. The serializer's instance must have been loaded at that version
+# too, since its fields are written back. Returns the InventoryChange recorded for a quantity
+# change, if any.
+def save_product_versioned(serializer, expected_version, user):
+    instance = serializer.instance
+    if instance.version != expected_version:
+        raise StockConflict()  # Loaded at another version; its fields and quantity aren't the row's
+    with transaction.atomic():
+        bumped = InventoryProduct.objects.filter(pk=instance.pk, version=expected_version).update(version=F('version') + 1)
+        if not bumped:
+            raise StockConflict()
+
+        # The row matched the loaded version, so the loaded quantity is the one being replaced
+        old_quantity = instance.quantity
+        instance.version = expected_version + 1
+        product = serializer.save()
+
+        if product.quantity == old_quantity:
+            return None
+        return InventoryChange.objects.create(  # Record the change
+            product=product,
+            quantity=product.quantity,
+            quantity_change=product.quantity - old_quantity,
+            user=user,
+            reason='ADJUSTMENT',
+        )
+
+
+# Move stock of many products from one store to another in one transaction. Each item is a dict
+# with product (id of the user's product at from_store) and quantity. The stock lands on the
+# user's product with the same name at to_store, created as a copy without stock if there is
+# none. Every row involved is updated in primary key order, so concurrent transfers (in either
+# direction) and stock movements lock rows in the same order and can't deadlock. Either every
+# item is applied or TransferRejected is raised; returns (transfer, products) with products
+# mapping the id of every touched product to its refreshed instance.
+def apply_transfer(user, from_store, to_store, items):
+    with transaction.atomic():
+        sources = InventoryProduct.objects.for_user(user).filter(pk__in=[item['product'] for item in items], store=from_store).in_bulk()
+        errors = [
+            {'index': index, 'errors': {'product': ['Product not found at the source store.']}}
+            for index, item in enumerate(items) if item['product'] not in sources
+        ]
+        if errors:
+            raise TransferRejected(errors)
+
+        destinations = {}
+        for product in InventoryProduct.objects.for_user(user).filter(store=to_store, name__in={source.name for source in sources.values()}).order_by('-id'):
+            destinations[product.name] = product  # The oldest product of a name wins
+        for source in sources.values():
+            if source.name not in destinations:
+                destinations[source.name] = InventoryProduct.objects.create(  # Saved through signals like any new product
+                    name=source.name, description=source.description, category_id=source.category_id, quantity=0,
+                    price=source.price, user=user, supplier_id=source.supplier_id, store=to_store, reorder_level=source.reorder_level,
+                )
+
+        moves = [(sources[item['product']].pk, destinations[sources[item['product']].name].pk, item['quantity']) for item in items]
+        deltas = {}
+        for source_pk, destination_pk, quantity in moves:
+            deltas[source_pk] = deltas.get(source_pk, 0) - quantity
+            deltas[destination_pk] = deltas.get(destination_pk, 0) + quantity
+
+        today = datetime.date.today()  # Same value DateField(auto_now=True) would store
+        for pk in sorted(deltas):
+            queryset = InventoryProduct.objects.filter(pk=pk)
+            if deltas[pk] < 0:
+                queryset = queryset.filter(quantity__gte=-deltas[pk])  # Never let stock go negative
+            if not queryset.update(quantity=F('quantity') + deltas[pk], version=F('version') + 1, last_updated=today):
+                raise TransferRejected([
+                    {'index': index, 'errors': {'quantity': ['Insufficient stock.']}}
+                    for index, item in enumerate(items) if item['product'] == pk
+                ], conflict=True)
+
+        # Rows stay locked until commit; walk the moves backwards from the final quantities to
+        # get the quantity each entry left, as apply_stock_movements does
+        transfer = StockTransfer.objects.create(user=user, from_store=from_store, to_store=to_store)
+        products = InventoryProduct.objects.select_related('store').in_bulk(list(deltas))
+        running = {pk: product.quantity for pk, product in products.items()}
+        changes = []
+        for source_pk, destination_pk, quantity in reversed(moves):
+            for pk, delta, reason in ((destination_pk, quantity, 'TRANSFER_IN'), (source_pk, -quantity, 'TRANSFER_OUT')):
+                changes.append(InventoryChange(
+                    product=products[pk], quantity=running[pk], quantity_change=delta, user=user, reason=reason, transfer=transfer,
+                ))
+                running[pk] -= delta
+        changes = InventoryChange.objects.bulk_create(changes[::-1])  # Pairs in item order, the outgoing entry first
+        record_changes(changes)
+
+        record_quantity_changes(products, deltas)  # Same bookkeeping as apply_stock_movements
+        record_availability(quantity_transitions(products, deltas))
+        record_events(
+            [change_event('change.created', change, change.product) for change in changes]
+            + [product_event('product.updated', product) for product in products.values()]
+        )
+        invalidate_barcodes(product.barcode for product in products.values())
+        bump_generation(report_scope(user.pk))
+    return transfer, products
@@ -0,0 +1,197 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import record_availability
+from .barcodes import invalidate_barcodes
+from .caching import bump_generation, report_scope
+from .history import record_opening_snapshots
+from .outbox import change_event, product_event, record_events
+from .models import ArchivedChangeSegment, Category, InventoryChange, InventoryProduct, Store, Supplier
+from .rollups import apply_rollup_entries
+from .search import index_products, reindex_queryset
+from .summaries import record_product_change
+
+
+# An instance saved without its persisted summary and availability fields (built by hand with a
+# pk, or loaded with only()) reads them from its row first, locked when inside a transaction,
+# so the handlers below still apply deltas instead of rebuilding the owner's tables
+@receiver(pre_save, sender=InventoryProduct)
+def load_persisted_state(sender, instance, using, **kwargs):
+    if instance.pk is None or (hasattr(instance, '_summary_state') and hasattr(instance, '_availability_state')):
+        return
+    rows = InventoryProduct.objects.using(using).filter(pk=instance.pk)
+    if transaction.get_connection(using).in_atomic_block:
+        rows = rows.select_for_update()
+    fields = sorted(set(InventoryProduct.SUMMARY_FIELDS + InventoryProduct.AVAILABILITY_FIELDS))
+    persisted = rows.values(*fields).first()
+    if persisted is None:
+        return  # Not stored yet; the save inserts it
+    instance._summary_state = tuple(persisted[field] for field in InventoryProduct.SUMMARY_FIELDS)
+    instance._availability_state = tuple(persisted[field] for field in InventoryProduct.AVAILABILITY_FIELDS)
+
+
+# Apply the difference between the last persisted and the saved state to InventorySummary
+@receiver(post_save, sender=InventoryProduct)
+def update_summary_on_save(sender, instance, created, **kwargs):
+    new_state = instance.summary_state()
+    record_product_change(None if created else instance._summary_state, new_state)
+    instance._summary_state = new_state
+
+
+# Move a saved product's stock between its StockAvailability rows
+@receiver(post_save, sender=InventoryProduct)
+def update_availability_on_save(sender, instance, created, **kwargs):
+    new_state = instance.availability_state()
+    record_availability([(None if created else instance._availability_state, new_state)])
+    instance._availability_state = new_state
+
+
+# Opening stock snapshot of a new product, the base of its as_of quantities
+@receiver(post_save, sender=InventoryProduct)
+def record_opening_snapshot(sender, instance, created, **kwargs):
+    if created:
+        record_opening_snapshots([instance])
+
+
+# Keep the product's full-text search document in step with its text fields; saves that leave
+# them alone (e.g. quantity updates) don't load the supplier and store or rewrite the document
+@receiver(post_save, sender=InventoryProduct)
+def update_search_document_on_save(sender, instance, created, **kwargs):
+    new_state = instance.search_state()
+    if created or getattr(instance, '_search_state', None) != new_state:
+        index_products([instance])
+    instance._search_state = new_state
+
+
+# Renaming a supplier or store changes the search document of each of its products
+@receiver(post_save, sender=Supplier)
+def update_search_documents_on_supplier_save(sender, instance, created, **kwargs):
+    if not created:
+        reindex_queryset(InventoryProduct.objects.filter(supplier=instance))
+
+
+@receiver(post_save, sender=Store)
+def update_search_documents_on_store_save(sender, instance, created, **kwargs):
+    if not created:
+        reindex_queryset(InventoryProduct.objects.filter(store=instance))
+
+
+# Drop the cached barcode lookups of a saved product, under its old and new barcode
+@receiver(post_save, sender=InventoryProduct)
+def invalidate_barcode_on_save(sender, instance, **kwargs):
+    invalidate_barcodes([instance.barcode, getattr(instance, '_persisted_barcode', None)])
+    instance._persisted_barcode = instance.barcode
+
+
+@receiver(post_delete, sender=InventoryProduct)
+def invalidate_barcode_on_delete(sender, instance, **kwargs):
+    invalidate_barcodes([instance.barcode, getattr(instance, '_persisted_barcode', None)])
+
+
+# A deleted product's archived changes go with its live ones; the segments stop pointing at them
+@receiver(post_delete, sender=InventoryProduct)
+def forget_archived_changes_on_delete(sender, instance, **kwargs):
+    ArchivedChangeSegment.objects.filter(product_id=instance.pk).delete()
+
+
+# Cached lookups embed category, supplier and store names, so renaming one drops its products' entries
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Store)
+def invalidate_barcodes_on_relation_save(sender, instance, created, **kwargs):
+    if not created:
+        field = sender._meta.model_name
+        invalidate_barcodes(InventoryProduct.objects.filter(**{field: instance}, barcode__isnull=False).values_list('barcode', flat=True))
+
+
+# Remove a deleted product from its InventorySummary group
+@receiver(post_delete, sender=InventoryProduct)
+def update_summary_on_delete(sender, instance, **kwargs):
+    record_product_change(getattr(instance, '_summary_state', None) or instance.summary_state(), None)
+
+
+# Take a deleted product's stock out of its StockAvailability row
+@receiver(post_delete, sender=InventoryProduct)
+def update_availability_on_delete(sender, instance, **kwargs):
+    record_availability([(getattr(instance, '_availability_state', None) or instance.availability_state(), None)])
+
+
+# Move an individually saved change into (or between) its rollup buckets
+@receiver(post_save, sender=InventoryChange)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    old_state = None if created else getattr(instance, '_rollup_state', None)
+    entries = [(instance.rollup_state(), 1, instance.product)]
+    if old_state is not None:
+        entries.append((old_state, -1, None))
+    apply_rollup_entries(entries)
+    instance._rollup_state = instance.rollup_state()
+
+
+# Take a deleted change out of its rollup buckets
+@receiver(post_delete, sender=InventoryChange)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    apply_rollup_entries([(getattr(instance, '_rollup_state', None) or instance.rollup_state(), -1, None)])
+
+
+# Cached list responses of each catalog model, invalidated on any write to it
+CATALOG_SCOPES = {Category: 'categories', Supplier: 'suppliers', Store: 'stores'}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Store)
+def invalidate_catalog_responses(sender, **kwargs):
+    bump_generation(CATALOG_SCOPES[sender])
+
+
+# A product write changes its owner's inventory report
+@receiver(post_save, sender=InventoryProduct)
+@receiver(post_delete, sender=InventoryProduct)
+def invalidate_report_on_product_write(sender, instance, **kwargs):
+    bump_generation(report_scope(instance.user_id))
+
+
+# A change's product (at least its owner and store), loaded only when it isn't cached
+def change_product(change):
+    product = change._state.fields_cache.get('product')
+    if product is not None:
+        return product
+    return InventoryProduct.objects.only('user', 'store').filter(pk=change.product_id).first()
+
+
+# So does a change to one of their products (through the rollups)
+@receiver(post_save, sender=InventoryChange)
+@receiver(post_delete, sender=InventoryChange)
+def invalidate_report_on_change_write(sender, instance, **kwargs):
+    product = change_product(instance)
+    if product is not None:
+        bump_generation(report_scope(product.user_id))
+
+
+# Outbox events, written in the transaction of the save or delete that caused them
+@receiver(post_save, sender=InventoryProduct)
+def record_product_saved_event(sender, instance, created, **kwargs):
+    record_events([product_event('product.created' if created else 'product.updated', instance)])
+
+
+@receiver(post_delete, sender=InventoryProduct)
+def record_product_deleted_event(sender, instance, **kwargs):
+    record_events([product_event('product.deleted', instance)])
+
+
+@receiver(post_save, sender=InventoryChange)
+def record_change_saved_event(sender, instance, created, **kwargs):
+    product = change_product(instance)
+    if product is not None:
+        record_events([change_event('change.created' if created else 'change.updated', instance, product)])
+
+
+@receiver(post_delete, sender=InventoryChange)
+def record_change_deleted_event(sender, instance, **kwargs):
+    product = change_product(instance)
+    if product is not None:
+        record_events([change_event('change.deleted', instance, product)])
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import queue
+import threading
+import urllib.request
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+# A sink delivers event dicts to the outside world. Every event carries a 'type' and a
+# JSON-able 'data' dict; notifications also carry a 'subject', 'message' and 'recipients'.
+# send() either delivers all the events or raises, in which case the caller retries them.
+
+
+class Sink:
+    def send(self, events):
+        raise NotImplementedError
+
+
+# Writes each event to the inventory.events logger
+class LogSink(Sink):
+    def __init__(self, logger='inventory.events', level=logging.WARNING):
+        self.logger = logging.getLogger(logger)
+        self.level = level
+
+    def send(self, events):
+        for event in events:
+            self.logger.log(self.level, event.get('message') or json.dumps(event, cls=DjangoJSONEncoder))
+
+
+# Emails notifications through the configured Django email backend
+class EmailSink(Sink):
+    def __init__(self, from_email=None):
+        self.from_email = from_email  # None uses DEFAULT_FROM_EMAIL
+
+    def send(self, events):
+        for event in events:
+            if event.get('recipients'):
+                send_mail(event['subject'], event['message'], self.from_email, event['recipients'])
+
+
+# POSTs the events as one JSON array to url; any non-2xx answer fails the batch
+class WebhookSink(Sink):
+    def __init__(self, url, timeout=5, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+
+    def send(self, events):
+        body = json.dumps(events, cls=DjangoJSONEncoder).encode()
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:  # Raises HTTPError on 4xx/5xx
+            response.read()
+
+
+# Appends each event as one JSON line to path and fsyncs, so a returned batch is on disk
+class FileSink(Sink):
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, events):
+        lines = ''.join(json.dumps(event, cls=DjangoJSONEncoder) + '\n' for event in events)
+        with self.lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(lines)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+# In-process queues by name, read by consumers running in the same process
+local_queues = {}
+local_queues_lock = threading.Lock()
+
+
+def get_local_queue(name):
+    with local_queues_lock:
+        return local_queues.setdefault(name, queue.Queue())
+
+
+# Puts each event on the named in-process queue
+class LocalQueueSink(Sink):
+    def __init__(self, name='inventory'):
+        self.queue = get_local_queue(name)
+
+    def send(self, events):
+        for event in events:
+            self.queue.put(event)
+
+
+# Sinks configured by a setting holding a list of {'BACKEND': dotted path, 'OPTIONS': {...}}
+def load_sinks(setting, default):
+    return [
+        import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        for config in getattr(settings, setting, default)
+    ]
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .counters import increment_or_create
+from .models import InventoryProduct, InventorySummary
+
+
+# What a product in the given state adds to its InventorySummary row:
+# ((user_id, store_id, category_id), (value, product count, low stock count))
+def contribution(state):
+    user_id, store_id, category_id, quantity, price, reorder_level = state
+    return (user_id, store_id, category_id), (Decimal(quantity) * Decimal(price), 1, int(quantity <= reorder_level))
+
+
+# Summary deltas for a product going from old_state to new_state (either may be None)
+def state_deltas(old_state, new_state):
+    deltas = defaultdict(lambda: [Decimal(0), 0, 0])
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None:
+            continue
+        group, values = contribution(state)
+        for position, value in enumerate(values):
+            deltas[group][position] += sign * value
+    return deltas
+
+
+# Apply {group: [value, count, low]} deltas with atomic F() increments
+def apply_deltas(deltas):
+    for (user_id, store_id, category_id), (value, count, low) in deltas.items():
+        if not (value or count or low):
+            continue
+        increment_or_create(
+            InventorySummary,
+            {'user_id': user_id, 'store_id': store_id, 'category_id': category_id},
+            {'total_value': value, 'product_count': count, 'low_stock_count': low},
+            create=count > 0,  # Groups are only created by adding a product to them
+            extra={'updated': timezone.now()},
+        )
+
+
+# Keep the summary in step with a product moving from old_state to new_state
+def record_product_change(old_state, new_state):
+    apply_deltas(state_deltas(old_state, new_state))
+
+
+# Keep the summary in step with F() quantity updates that bypass save(); products hold the
+# refreshed rows and quantity_deltas the net change applied to each of them
+def record_quantity_changes(products, quantity_deltas):
+    transitions = []
+    for pk, delta in quantity_deltas.items():
+        product = products[pk]
+        new_state = product.summary_state()
+        transitions.append((new_state[:3] + (product.quantity - delta,) + new_state[4:], new_state))
+    record_state_changes(transitions)
+
+
+# Keep the summary in step with products written in bulk, given (old_state, new_state) pairs
+def record_state_changes(transitions):
+    deltas = defaultdict(lambda: [Decimal(0), 0, 0])
+    for old_state, new_state in transitions:
+        for group, values in state_deltas(old_state, new_state).items():
+            for position, value in enumerate(values):
+                deltas[group][position] += value
+    apply_deltas(deltas)
+
+
+# Recompute summary rows from InventoryProduct, for one user (id) or everybody
+def rebuild_summaries(user_id=None):
+    products = InventoryProduct.objects.all()
+    summaries = InventorySummary.objects.all()
+    if user_id is not None:
+        products = products.filter(user_id=user_id)
+        summaries = summaries.filter(user_id=user_id)
+
+    groups = products.values('user', 'store', 'category').annotate(
+        product_count=Count('id'),
+        low_stock_count=Count('id', filter=Q(is_low_stock=True)),
+        total_value=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField())),
+    ).order_by()
+
+    with transaction.atomic():
+        summaries.delete()
+        created = InventorySummary.objects.bulk_create([
+            InventorySummary(
+                user_id=group['user'], store_id=group['store'], category_id=group['category'],
+                product_count=group['product_count'], low_stock_count=group['low_stock_count'],
+                total_value=group['total_value'] or 0,
+            )
+            for group in groups
+        ], batch_size=1000)
+    return len(created)
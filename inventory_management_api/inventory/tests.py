@@ -0,0 +1,1384 @@
+import asyncio
+import base64
+import csv
+import importlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from unittest import mock
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, OperationalError, connection, connections, transaction
+from django.db.models import Count, Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Users.models import CustomUser
+from .alerts import MAX_ATTEMPTS, deliver_alerts
+from .availability import rebuild_availability
+from . import archive
+from .barcodes import local_cache
+from .caching import bump_generation, get_generation, report_scope
+from .exports import iterate_rows
+from .feed import OutboxPollingBackend, broker, feed_events
+from .history import stock_as_of, take_snapshots
+from .imports import UPSERT_ATTEMPTS, BarcodeTaken, ProductImport
+from .models import *
+from .rollups import rebuild_rollups, rollup_totals
+from .outbox import events_recorded, relay_events
+from .pagination import KeysetPagination
+from .purchasing import generate_purchase_orders
+from .reorder import compute_suggestions
+from . import reports
+from .serializers import InventoryProductSerializer
+from .services import StockConflict, save_product_versioned
+from .sinks import FileSink, LocalQueueSink, Sink, WebhookSink
+from .summaries import rebuild_summaries
+
+
+# The tests run in one process, so a memory cache is shared by everything they exercise and
+# keeps cache hits free of queries
+TEST_SETTINGS = {
+    'SECURE_SSL_REDIRECT': False,
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'inventory-tests'}},
+    'INVENTORY_RESPONSE_CACHE': True,
+}
+
+
+# Mixin for pinning the number of SQL queries an endpoint issues
+class QueryCountAssertionsMixin:
+    def assertEndpointQueries(self, expected, url, method='get', **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, **kwargs)  # Call the endpoint through the test client
+        executed = len(context.captured_queries)
+        if executed != expected:
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.fail(f"{method.upper()} {url} ran {executed} queries, expected {expected}:\n{queries}")
+        return response
+
+
+# Shared fixtures for inventory endpoint tests
+@override_settings(**TEST_SETTINGS)
+class InventoryAPITestCase(APITestCase):
+    def setUp(self):
+        caches['default'].clear()  # Responses cached for rolled back rows of earlier tests
+        self.user = CustomUser.objects.create_user('owner', 'owner@example.com', 'password')
+        self.category = Category.objects.create(name='Beverages')
+        self.supplier = Supplier.objects.create(name='Acme', contact='0700000001', email='acme@example.com', address='1 Acme Way')
+        self.store = Store.objects.create(name='Main', email='main@example.com', address='1 Main St', contact='0700000002')
+        self.client.force_authenticate(self.user)
+
+    def create_products(self, count, **fields):
+        return [
+            InventoryProduct.objects.create(
+                name=f"Product {index}", category=self.category, quantity=fields.get('quantity', 50),
+                price=Decimal('2.50'), user=self.user, supplier=self.supplier, store=self.store,
+                reorder_level=fields.get('reorder_level', 10),
+            )
+            for index in range(count)
+        ]
+
+
+# Query counts for InventoryProductViewSet must not grow with the number of rows serialized
+class InventoryProductQueryCountTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def test_list_query_count(self):
+        self.create_products(15)
+        response = self.assertEndpointQueries(2, reverse('inventoryproduct-list'))  # COUNT(*) + page SELECT
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['store_name'], 'Main')
+
+    def test_retrieve_query_count(self):
+        product = self.create_products(1)[0]
+        response = self.assertEndpointQueries(1, reverse('inventoryproduct-detail', args=[product.pk]))
+        self.assertEqual(response.data['supplier_name'], 'Acme')
+
+    def test_low_stock_query_count(self):
+        self.create_products(12, quantity=2)
+        response = self.assertEndpointQueries(1, reverse('inventoryproduct-low-stock'))
+        self.assertEqual(len(response.data), 12)
+
+
+# Opt-in keyset pagination walks every row exactly once without COUNT(*)
+class KeysetPaginationTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.assertEndpointQueries(1, url)  # A single seek query per page
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_walks_all_rows_in_order(self):
+        products = self.create_products(25)
+        seen = self.walk(reverse('inventoryproduct-list') + '?cursor=')
+        self.assertEqual(seen, [product.pk for product in products])
+
+    def test_descending_ordering_with_ties(self):
+        products = self.create_products(23)  # Every row shares the same price, so the id tiebreaker decides
+        seen = self.walk(reverse('inventoryproduct-list') + '?cursor=&ordering=-price')
+        self.assertEqual(seen, [product.pk for product in reversed(products)])
+
+    def test_page_numbers_remain_default(self):
+        self.create_products(11)
+        response = self.client.get(reverse('inventoryproduct-list'))
+        self.assertEqual(response.data['count'], 11)
+
+    def test_cursor_for_other_ordering_is_rejected(self):
+        self.create_products(11)
+        next_url = self.client.get(reverse('inventoryproduct-list') + '?cursor=&ordering=name').data['next']
+        response = self.client.get(next_url.replace('ordering=name', 'ordering=quantity'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursors_are_rejected(self):
+        self.create_products(3)
+        url = reverse('inventoryproduct-list')
+        for ordering, position in (
+            ('date_added', ['date_added', 'not a date', 1]),
+            ('price', ['price', 'cheap', 1]),
+            ('price', ['price', ['2.50'], 1]),
+            ('name', ['name', 'Product 1', '1']),
+            ('id', ['id', None, 1]),
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(url, {'cursor': cursor, 'ordering': ordering})
+            self.assertEqual(response.status_code, 404, position)
+
+
+# Batches of stock movements are applied atomically with per-item error reporting
+class BulkMovementTests(InventoryAPITestCase):
+    def test_applies_batch_and_records_changes(self):
+        first, second = self.create_products(2, quantity=20)
+        response = self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': first.pk, 'quantity_change': 5, 'reason': 'SALE'},
+            {'product': second.pk, 'quantity_change': 10, 'reason': 'RESTOCK'},
+            {'product': first.pk, 'quantity_change': 3, 'reason': 'SALE'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['quantity'] for result in response.data['applied']], [15, 30, 12])
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 12)
+        self.assertEqual(list(InventoryChange.objects.filter(product=first).order_by('id').values_list('quantity', flat=True)), [15, 12])
+
+    def test_reports_errors_per_item(self):
+        product = self.create_products(1, quantity=4)[0]
+        response = self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': product.pk, 'quantity_change': 3, 'reason': 'SALE'},
+            {'product': product.pk, 'quantity_change': 3, 'reason': 'SALE'},
+            {'product': 999999, 'quantity_change': 1, 'reason': 'SALE'},
+            {'product': product.pk, 'quantity_change': -1, 'reason': 'SALE'},
+        ], format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['index'] for result in response.data['applied']], [0])
+        self.assertEqual([result['index'] for result in response.data['errors']], [1, 2, 3])
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 1)
+
+
+# Versioned updates turn concurrent writes into 409s instead of lost updates
+class OptimisticConcurrencyTests(InventoryAPITestCase):
+    def test_stale_version_is_rejected(self):
+        product = self.create_products(1, quantity=20)[0]
+        url = reverse('inventoryproduct-detail', args=[product.pk])
+        first = self.client.patch(url, {'quantity': 18, 'version': 0}, format='json')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['version'], 1)
+        stale = self.client.patch(url, {'quantity': 25, 'version': 0}, format='json')
+        self.assertEqual(stale.status_code, 409)
+        product.refresh_from_db()
+        self.assertEqual((product.quantity, product.version), (18, 1))
+        self.assertEqual(InventoryChange.objects.get(product=product).quantity_change, -2)  # Signed delta
+
+    def test_instance_loaded_before_a_concurrent_write_is_rejected(self):
+        product = self.create_products(1, quantity=20)[0]
+        serializer = InventoryProductSerializer(product, data={'name': 'Renamed', 'version': 1}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        InventoryProduct.objects.filter(pk=product.pk).update(quantity=15, version=1)  # Written after the instance was read
+        with self.assertRaises(StockConflict):
+            save_product_versioned(serializer, 1, self.user)  # The newer version, sent with the stale instance
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.quantity, product.version), ('Product 0', 15, 1))
+        self.assertFalse(InventoryChange.objects.exists())
+
+    def test_adjust_stock_conflicts_when_insufficient(self):
+        product = self.create_products(1, quantity=2)[0]
+        url = reverse('inventoryproduct-adjust-stock', args=[product.pk])
+        response = self.client.post(url, {'quantity_change': 3, 'reason': 'SALE'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+
+# Many threads selling the same SKU at once must not lose a single unit
+@override_settings(**TEST_SETTINGS)
+class ConcurrentStockStressTests(TransactionTestCase):
+    threads = 8
+    sales_per_thread = 10
+    max_retries = 20  # SQLite fails contended writes at once instead of waiting on the lock
+    mysql_lock_errors = (1205, 1213)  # Lock wait timeout, deadlock
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', 'owner@example.com', 'password')
+        self.product = InventoryProduct.objects.create(
+            name='Hot item', category=Category.objects.create(name='Snacks'), quantity=1000, price=Decimal('1.00'), user=self.user,
+            supplier=Supplier.objects.create(name='Acme', contact='0700000001', email='acme@example.com', address='1 Acme Way'),
+            store=Store.objects.create(name='Main', email='main@example.com', address='1 Main St', contact='0700000002'),
+        )
+
+    def run_concurrently(self, worker):
+        failures = []
+
+        def target():
+            client = APIClient(raise_request_exception=False)  # The exception signal is shared across threads
+            client.force_authenticate(self.user)
+            try:
+                worker(client)
+            except Exception as exc:  # Surface worker failures in the main thread
+                failures.append(exc)
+            finally:
+                connections.close_all()  # Each thread owns its own connection
+
+        workers = [threading.Thread(target=target) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(failures, [])
+
+    # Retry a version conflict (409) or lock contention, which the database reports as an
+    # OperationalError (500): SQLite's "database (table) is locked", MySQL's deadlock and lock wait
+    # timeout. Any other 500 fails, and so does contention that outlasts max_retries.
+    def retry(self, request):
+        for attempt in range(self.max_retries + 1):
+            response = request()
+            if response.status_code == 500 and not self.is_lock_error(response):
+                raise AssertionError(f"Server error: {response.exc_info and response.exc_info[1]!r}")
+            if response.status_code not in (409, 500):
+                return response
+            time.sleep(random.uniform(0, min(0.01 * 2 ** attempt, 1)))  # Back off so the contenders spread out
+        raise AssertionError(f"Still {response.status_code} after {self.max_retries} retries")
+
+    def is_lock_error(self, response):
+        error = response.exc_info and response.exc_info[1]
+        if not isinstance(error, OperationalError):
+            return False
+        if connection.vendor == 'sqlite':
+            return 'is locked' in str(error)
+        return bool(error.args) and error.args[0] in self.mysql_lock_errors
+
+    def test_atomic_decrements_lose_no_updates(self):
+        url = reverse('inventoryproduct-adjust-stock', args=[self.product.pk])
+
+        def worker(client):
+            for _ in range(self.sales_per_thread):
+                response = self.retry(lambda: client.post(url, {'quantity_change': 1, 'reason': 'SALE'}, format='json'))
+                assert response.status_code == 200, response.data
+
+        self.run_concurrently(worker)
+        sold = self.threads * self.sales_per_thread
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1000 - sold)
+        quantities = InventoryChange.objects.filter(product=self.product).values_list('quantity', flat=True)
+        self.assertEqual(sorted(quantities), list(range(1000 - sold, 1000)))  # Every sale saw a distinct stock level
+
+    def test_versioned_read_modify_write_loses_no_updates(self):
+        url = reverse('inventoryproduct-detail', args=[self.product.pk])
+
+        def sell_one(client):
+            current = client.get(url)
+            if current.status_code != 200:
+                return current
+            return client.patch(url, {'quantity': current.data['quantity'] - 1, 'version': current.data['version']}, format='json')
+
+        def worker(client):
+            for _ in range(self.sales_per_thread):
+                response = self.retry(lambda: sell_one(client))
+                assert response.status_code == 200, response.data
+
+        self.run_concurrently(worker)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1000 - self.threads * self.sales_per_thread)
+        self.assertEqual(InventoryChange.objects.filter(product=self.product).count(), self.threads * self.sales_per_thread)
+
+
+# InventorySummary stays equal to a full rebuild through every write path
+class InventorySummaryTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def summary_rows(self):
+        return sorted(InventorySummary.objects.values_list('store', 'category', 'product_count', 'low_stock_count', 'total_value'))
+
+    def assertSummaryMatchesRebuild(self):
+        maintained = self.summary_rows()
+        rebuild_summaries()
+        self.assertEqual(maintained, self.summary_rows())
+
+    def test_saves_of_partially_loaded_products_apply_deltas(self):
+        first, second = self.create_products(2, quantity=20)
+        partial = InventoryProduct.objects.only('id', 'quantity').get(pk=first.pk)
+        partial.quantity = 5
+        detached = InventoryProduct(**{field.attname: getattr(second, field.attname) for field in InventoryProduct._meta.concrete_fields
+                                       if not field.generated})
+        detached.quantity = 3
+        with CaptureQueriesContext(connection) as context:
+            partial.save()
+            detached.save()
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('DELETE')])  # No per-user rebuild
+        self.assertSummaryMatchesRebuild()
+        self.assertEqual(StockAvailability.objects.get(name='Product 1').quantity, 3)
+
+    def test_write_paths_keep_summary_in_sync(self):
+        first, second, third = self.create_products(3, quantity=20)
+        other_category = Category.objects.create(name='Snacks')
+        self.client.patch(reverse('inventoryproduct-detail', args=[first.pk]), {'quantity': 5, 'category': other_category.pk}, format='json')
+        self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': second.pk, 'quantity_change': 15, 'reason': 'SALE'},
+            {'product': third.pk, 'quantity_change': 7, 'reason': 'RESTOCK'},
+        ], format='json')
+        self.client.delete(reverse('inventoryproduct-detail', args=[third.pk]))
+        self.assertSummaryMatchesRebuild()
+
+    def test_report_reads_summary(self):
+        self.create_products(4, quantity=20)
+        self.create_products(2, quantity=3)
+        response = self.assertEndpointQueries(4, reverse('inventoryproduct-inventory-report'))  # Summary + daily, hourly and edge ledger reads
+        self.assertEqual(response.data['total_inventory_value'], Decimal('215.00'))
+        self.assertEqual(response.data['low_stock_items_count'], 2)
+
+
+# Rollup totals over arbitrary ranges equal a scan of the raw ledger
+class ChangeRollupTests(InventoryAPITestCase):
+    def rollup_rows(self):
+        return sorted(InventoryChangeRollup.objects.filter(change_count__gt=0).values_list('granularity', 'bucket', 'product', 'reason', 'quantity_total', 'change_count'))
+
+    def test_recorded_changes_keep_rollups_in_sync(self):
+        first, second = self.create_products(2, quantity=50)
+        self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': first.pk, 'quantity_change': 4, 'reason': 'SALE'},
+            {'product': second.pk, 'quantity_change': 6, 'reason': 'RESTOCK'},
+        ], format='json')
+        self.client.patch(reverse('inventoryproduct-detail', args=[first.pk]), {'quantity': 40}, format='json')
+        InventoryChange.objects.filter(product=second).first().delete()
+        maintained = self.rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(maintained, self.rollup_rows())
+
+    def test_ranges_match_ledger_scan(self):
+        product = self.create_products(1)[0]
+        base = timezone.now().replace(microsecond=0) - timedelta(days=5)
+        for offset in range(0, 5 * 24 * 60, 97):  # A change every 97 minutes over five days
+            change = InventoryChange.objects.create(product=product, quantity=0, quantity_change=(offset % 7 + 1) * (-1 if offset % 2 else 1), user=self.user, reason='SALE' if offset % 2 else 'RESTOCK')
+            InventoryChange.objects.filter(pk=change.pk).update(timestamp=base + timedelta(minutes=offset))  # Backdate past auto_now
+        rebuild_rollups()
+
+        for start, end in [
+            (base, base + timedelta(days=5)),
+            (base + timedelta(minutes=13), base + timedelta(days=3, minutes=41)),
+            (base + timedelta(minutes=5), base + timedelta(minutes=50)),
+        ]:
+            response = self.client.get(reverse('inventorychange-rollup'), {'start': start.isoformat(), 'end': end.isoformat()})
+            expected = InventoryChange.objects.filter(timestamp__gte=start, timestamp__lt=end).values('reason').annotate(
+                quantity=Sum('quantity_change'), changes=Count('id'))
+            self.assertEqual(response.data['totals'], {row['reason']: {'quantity': row['quantity'], 'changes': row['changes']} for row in expected})
+
+
+
+# Product search goes through the full-text index over the maintained search documents
+class ProductSearchTests(InventoryAPITestCase):
+    def search(self, terms, **params):
+        response = self.client.get(reverse('inventoryproduct-list'), {'search': terms, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def create_product(self, name, description=''):
+        return InventoryProduct.objects.create(
+            name=name, description=description, category=self.category, quantity=5, price=Decimal('1.00'),
+            user=self.user, supplier=self.supplier, store=self.store,
+        )
+
+    def test_every_word_must_match_by_prefix(self):
+        self.create_product('Green tea', 'Loose leaf')
+        self.create_product('Black tea')
+        self.create_product('Green coffee')
+        self.assertEqual(sorted(self.search('gree tea')), ['Green tea'])
+        self.assertEqual(sorted(self.search('acme main')), ['Black tea', 'Green coffee', 'Green tea'])  # Supplier and store names
+
+    def test_results_are_ordered_by_relevance(self):
+        self.create_product('Mug', 'Tea mug')
+        self.create_product('Tea', 'Tea tea tea')
+        self.assertEqual(self.search('tea'), ['Tea', 'Mug'])
+        self.assertEqual(self.search('tea', ordering='name'), ['Mug', 'Tea'])  # Explicit ordering wins
+
+    def test_documents_follow_product_and_supplier_edits(self):
+        product = self.create_product('Espresso beans')
+        self.client.patch(reverse('inventoryproduct-detail', args=[product.pk]), {'name': 'Decaf beans'}, format='json')
+        self.assertEqual(self.search('espresso'), [])
+        self.assertEqual(self.search('decaf'), ['Decaf beans'])
+
+        self.supplier.name = 'Roastery'
+        self.supplier.save()
+        self.assertEqual(self.search('roastery'), ['Decaf beans'])
+
+        product.delete()
+        self.assertEqual(self.search('decaf'), [])
+
+    def test_quantity_only_saves_keep_the_document(self):
+        self.create_product('Espresso beans')
+        product = InventoryProduct.objects.get()  # Loaded without its supplier and store
+        product.quantity = 2
+        with CaptureQueriesContext(connection) as context:
+            product.save()
+        tables = ('productsearch', 'FROM "inventory_supplier"', 'FROM "inventory_store"')
+        self.assertFalse([query for query in context.captured_queries if any(table in query['sql'] for table in tables)])
+        product.description = 'Dark roast'
+        product.save()
+        self.assertEqual(self.search('dark'), ['Espresso beans'])
+
+
+
+# Barcode lookups read through the local and shared caches and are invalidated by writes
+class BarcodeLookupTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        local_cache.clear()  # Entries of rolled back products from earlier tests
+        self.product = self.create_products(1)[0]
+        self.product.barcode = '4006381333931'
+        self.product.save()
+
+    def test_warm_lookup_skips_the_database(self):
+        url = reverse('inventoryproduct-by-barcode', args=[self.product.barcode])
+        self.assertEndpointQueries(1, url)
+        response = self.assertEndpointQueries(0, url)
+        self.assertEqual(response.data['id'], self.product.pk)
+
+        local_cache.clear()
+        self.assertEndpointQueries(0, url)  # Served by the shared tier
+
+    def test_writes_invalidate_cached_lookups(self):
+        url = reverse('inventoryproduct-by-barcode', args=[self.product.barcode])
+        self.client.get(url)
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[self.product.pk]), {'quantity_change': 5, 'reason': 'SALE'}, format='json')
+        self.assertEqual(self.client.get(url).data['quantity'], 45)
+
+        self.store.name = 'Outlet'
+        self.store.save()
+        self.assertEqual(self.client.get(url).data['store_name'], 'Outlet')
+
+        self.client.patch(reverse('inventoryproduct-detail', args=[self.product.pk]), {'barcode': '123'}, format='json')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('inventoryproduct-by-barcode', args=['123'])).data['id'], self.product.pk)
+
+    def test_other_users_products_are_not_found(self):
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'password')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(reverse('inventoryproduct-by-barcode', args=[self.product.barcode])).status_code, 404)
+
+    def test_batch_lookup(self):
+        response = self.client.get(reverse('inventoryproduct-by-barcodes'), {'code': [self.product.barcode, 'unknown', self.product.barcode]})
+        self.assertEqual(list(response.data['results']), [self.product.barcode])
+        self.assertEqual(response.data['missing'], ['unknown'])
+        self.assertEndpointQueries(0, reverse('inventoryproduct-by-barcodes'), data={'code': [self.product.barcode, 'unknown']})
+
+
+
+# Catalog lists and inventory_report are cached per user and query string until a write
+class ResponseCacheTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def test_category_list_is_cached_until_a_write(self):
+        url = reverse('category-list')
+        self.assertEndpointQueries(2, url)  # COUNT(*) and the page
+        self.assertEndpointQueries(0, url)
+        self.assertEndpointQueries(2, url, data={'page': 1})  # Another query string is another entry
+
+        self.client.post(url, {'name': 'Snacks'})
+        names = [row['name'] for row in self.assertEndpointQueries(2, url).data['results']]
+        self.assertEqual(names, ['Beverages', 'Snacks'])
+
+    def test_unchanged_responses_revalidate_with_304(self):
+        url = reverse('supplier-list')
+        etag = self.client.get(url)['ETag']
+        response = self.assertEndpointQueries(0, url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.supplier.name = 'Acme Ltd'
+        self.supplier.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_report_follows_stock_movements(self):
+        product = self.create_products(1, quantity=50)[0]
+        url = reverse('inventoryproduct-inventory-report')
+        self.assertEqual(self.client.get(url).data['total_inventory_value'], Decimal('125.00'))
+        self.assertEndpointQueries(0, url)
+
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': 10, 'reason': 'SALE'}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_inventory_value'], Decimal('100.00'))
+        self.assertEqual(response.data['sales_last_30_days'], 10)
+
+    def test_report_cached_before_the_write_commits_is_dropped(self):
+        url = reverse('inventoryproduct-inventory-report')
+        scope = report_scope(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_generation(scope)
+            # A report computed before the commit is cached under the bumped generation ...
+            self.client.get(url)
+            self.assertEndpointQueries(0, url)
+            pending = get_generation(scope)
+        # ... which the second bump on commit retires
+        self.assertNotEqual(get_generation(scope), pending)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertTrue(context.captured_queries)  # Recomputed from committed data
+
+    def test_process_local_caches_serve_fresh_responses(self):
+        url = reverse('category-list')
+        with self.settings(INVENTORY_RESPONSE_CACHE=None):  # Decided by the backend, a per-process LocMemCache here
+            self.assertEndpointQueries(2, url)
+            response = self.assertEndpointQueries(2, url)  # Other workers wouldn't see a bump, so nothing is cached
+        self.assertNotIn('ETag', response)
+
+    def test_responses_are_not_shared_between_users(self):
+        self.create_products(1, quantity=50)
+        url = reverse('inventoryproduct-inventory-report')
+        self.client.get(url)
+        self.client.force_authenticate(CustomUser.objects.create_user('other', 'other@example.com', 'password'))
+        self.assertEqual(self.client.get(url).data['total_inventory_value'], 0)
+
+
+
+# Exports stream every row matching the list filters, in keyset batches
+class ExportTests(InventoryAPITestCase):
+    def stream(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_product_csv_honours_filters_and_ordering(self):
+        self.create_products(3)
+        other = Store.objects.create(name='Outlet', email='outlet@example.com', address='2 Main St', contact='0700000003')
+        InventoryProduct.objects.filter(name='Product 1').update(store=other)
+        content = self.stream(reverse('inventoryproduct-export'), store=self.store.pk, ordering='-name')
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual([row['name'] for row in rows], ['Product 2', 'Product 0'])
+        self.assertEqual(rows[0]['store'], 'Main')
+        self.assertEqual(rows[0]['price'], '2.50')
+
+    def test_change_ndjson(self):
+        product = self.create_products(1)[0]
+        self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': product.pk, 'quantity_change': 3, 'reason': 'SALE'},
+            {'product': product.pk, 'quantity_change': 5, 'reason': 'RESTOCK'},
+        ], format='json')
+        lines = self.stream(reverse('inventorychange-export'), export_format='ndjson', reason='SALE').splitlines()
+        self.assertEqual([json.loads(line)['quantity_change'] for line in lines], [-3])
+
+    def test_batches_cover_every_row_once(self):
+        products = self.create_products(7)
+        InventoryProduct.objects.filter(pk__in=[product.pk for product in products[:4]]).update(name='Same')  # Ties resolved by id
+        for ordering in ('id', '-name', 'quantity'):
+            rows = list(iterate_rows(InventoryProduct.objects.order_by(ordering), ['id'], chunk_size=2))
+            self.assertEqual(sorted(row['id'] for row in rows), sorted(product.pk for product in products))
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('inventoryproduct-export'), {'export_format': 'xml'}).status_code, 400)
+
+
+
+# CSV imports upsert products by barcode in batches and keep the derived tables in step
+class ProductImportTests(InventoryAPITestCase):
+    header = 'barcode,name,description,category,supplier,store,quantity,price,reorder_level\n'
+
+    def upload(self, rows):
+        upload = SimpleUploadedFile('products.csv', (self.header + rows).encode(), content_type='text/csv')
+        return self.client.post(reverse('inventoryproduct-import'), {'file': upload}, format='multipart')
+
+    def test_rows_are_created_then_updated(self):
+        response = self.upload('111,Tea,,Beverages,Acme,Main,5,2.00,\n222,Coffee,Ground,Beverages,Acme,Main,3,4.00,1\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 0))
+
+        response = self.upload('111,Green tea,,Beverages,Acme,Main,8,2.00,\n')
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        product = InventoryProduct.objects.get(barcode='111')
+        self.assertEqual((product.name, product.quantity, product.version, product.reorder_level), ('Green tea', 8, 1, 10))
+        self.assertEqual(InventoryChange.objects.get(product=product).quantity_change, 3)  # Recorded as an ADJUSTMENT
+
+        maintained = list(InventorySummary.objects.values_list('product_count', 'total_value'))
+        rebuild_summaries()
+        self.assertEqual(maintained, list(InventorySummary.objects.values_list('product_count', 'total_value')))
+        self.assertEqual([row['name'] for row in self.client.get(reverse('inventoryproduct-list'), {'search': 'green'}).data['results']], ['Green tea'])
+
+    def test_invalid_rows_are_reported_per_line(self):
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'password')
+        InventoryProduct.objects.create(name='Theirs', category=self.category, quantity=1, price=Decimal('1.00'), user=other,
+                                        supplier=self.supplier, store=self.store, barcode='999')
+        response = self.upload(
+            '111,Tea,,Beverages,Acme,Main,5,2.00,\n'
+            '222,Coffee,,Snacks,Acme,Main,3,4.00,\n'
+            '333,Cocoa,,Beverages,Acme,Main,-1,4.00,\n'
+            '999,Stolen,,Beverages,Acme,Main,1,1.00,\n'
+            '111,Tea again,,Beverages,Acme,Main,5,2.00,\n'
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4, 5, 6])
+        self.assertIn('category', response.data['errors'][0]['errors'])
+        self.assertIn('quantity', response.data['errors'][1]['errors'])
+        self.assertEqual(InventoryProduct.objects.get(barcode='999').name, 'Theirs')
+
+    def test_batches_losing_every_barcode_race_are_rejected(self):
+        with mock.patch.object(ProductImport, 'upsert', side_effect=BarcodeTaken) as upsert:
+            response = self.upload('111,Tea,,Beverages,Acme,Main,5,2.00,\n222,Coffee,,Beverages,Acme,Main,3,4.00,\n')
+        self.assertEqual(upsert.call_count, UPSERT_ATTEMPTS)
+        self.assertEqual(response.status_code, 400)  # Per-row errors rather than a 500
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+        self.assertFalse(InventoryProduct.objects.exists())
+
+    def test_command_imports_in_batches(self):
+        rows = ''.join(f"{index},Product {index},,Beverages,Acme,Main,{index},1.00,\n" for index in range(25))
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self.header + rows)
+        self.addCleanup(os.remove, handle.name)
+        output = StringIO()
+        call_command('import_products', handle.name, user=self.user.pk, batch_size=10, stdout=output)
+        self.assertIn('25 created', output.getvalue())
+        self.assertEqual(InventoryProduct.objects.filter(user=self.user).count(), 25)
+
+
+
+# Sink that remembers what it was sent, or fails every batch
+class RecordingSink(Sink):
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.events = []
+
+    def send(self, events):
+        if self.fail:
+            raise ConnectionError('sink unavailable')
+        self.events.extend(events)
+
+
+# Low-stock alerts are queued by the request, coalesced per product and window, and delivered by the worker
+class LowStockAlertTests(InventoryAPITestCase):
+    def sell(self, product, quantity):
+        return self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': quantity, 'reason': 'SALE'}, format='json')
+
+    def test_repeat_alerts_coalesce_within_the_window(self):
+        product = self.create_products(1, quantity=12, reorder_level=10)[0]
+        self.sell(product, 1)  # Still above the reorder level
+        self.assertFalse(LowStockAlert.objects.exists())
+        self.sell(product, 3)
+        self.sell(product, 2)
+        alert = LowStockAlert.objects.get()
+        self.assertEqual((alert.quantity, alert.occurrences, alert.status), (6, 2, LowStockAlert.PENDING))
+
+        sink = RecordingSink()
+        self.assertEqual(deliver_alerts([sink]), 1)
+        self.assertEqual(sink.events[0]['data']['quantity'], 6)
+        self.assertEqual(sink.events[0]['recipients'], ['owner@example.com'])
+
+        self.sell(product, 1)  # Same window: folded into the delivered alert, nothing new to send
+        self.assertEqual(deliver_alerts([sink]), 0)
+        self.assertEqual(LowStockAlert.objects.get().occurrences, 3)
+
+    def test_alerts_are_claimed_before_delivery(self):
+        product = self.create_products(1, quantity=5)[0]
+        self.sell(product, 1)
+        test = self
+
+        class SellingSink:
+            def send(self, events):
+                # The claim has committed; a stock write folding into the alert doesn't wait on delivery
+                test.assertEqual(LowStockAlert.objects.get().status, LowStockAlert.SENDING)
+                test.sell(product, 1)
+                test.assertEqual(deliver_alerts([RecordingSink()]), 0)
+
+        self.assertEqual(deliver_alerts([SellingSink()]), 1)
+        alert = LowStockAlert.objects.get()
+        self.assertEqual((alert.status, alert.occurrences, alert.attempts), (LowStockAlert.SENT, 2, 1))
+
+    def test_failed_deliveries_back_off_then_fail(self):
+        product = self.create_products(1, quantity=5)[0]
+        self.sell(product, 1)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            LowStockAlert.objects.update(available_at=timezone.now())  # Skip the backoff
+            self.assertEqual(deliver_alerts([RecordingSink(fail=True)]), 1)
+            alert = LowStockAlert.objects.get()
+            self.assertEqual(alert.attempts, attempt)
+            self.assertGreater(alert.available_at, timezone.now())
+        self.assertEqual(alert.status, LowStockAlert.FAILED)
+        self.assertIn('sink unavailable', alert.last_error)
+
+    def test_webhook_sink_posts_to_a_local_endpoint(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+
+        product = self.create_products(1, quantity=5)[0]
+        self.sell(product, 1)
+        deliver_alerts([WebhookSink(f"http://127.0.0.1:{server.server_port}/alerts")])
+        self.assertEqual(received[0][0]['data']['product'], product.pk)
+        self.assertEqual(LowStockAlert.objects.get().status, LowStockAlert.SENT)
+
+
+
+# Product and ledger writes record outbox events in their transaction; the relay publishes them in order
+class OutboxTests(InventoryAPITestCase):
+    def test_writes_record_events(self):
+        response = self.client.post(reverse('inventoryproduct-list'), {
+            'name': 'Tea', 'quantity': 5, 'price': '2.00', 'category': self.category.pk,
+            'supplier': self.supplier.pk, 'store': self.store.pk, 'user': self.user.pk,
+        })
+        product_id = response.data['id']
+        self.client.post(reverse('inventoryproduct-bulk-movements'), [{'product': product_id, 'quantity_change': 2, 'reason': 'SALE'}], format='json')
+        self.client.delete(reverse('inventoryproduct-detail', args=[product_id]))
+
+        topics = list(OutboxEvent.objects.order_by('id').values_list('topic', flat=True))
+        self.assertEqual(topics, ['product.created', 'change.created', 'product.updated', 'change.deleted', 'product.deleted'])
+        self.assertEqual(OutboxEvent.objects.get(topic='product.updated').payload['quantity'], 3)
+
+    def test_announced_events_have_ids_without_bulk_insert_returning(self):
+        announced = []
+
+        def receive(sender, events, **kwargs):
+            announced.extend(event.pk for event in events)
+
+        events_recorded.connect(receive)
+        self.addCleanup(events_recorded.disconnect, receive)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):  # As on MySQL
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_products(2)
+        self.assertEqual(announced, list(OutboxEvent.objects.order_by('id').values_list('id', flat=True)))
+        self.assertNotIn(None, announced)
+
+    def test_rolled_back_writes_leave_no_events(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.create_products(1)
+            raise RuntimeError()
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_relay_publishes_in_order_and_retries_failures(self):
+        product = self.create_products(1)[0]
+        for quantity in (1, 2, 3):
+            self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': quantity, 'reason': 'RESTOCK'}, format='json')
+        expected = list(OutboxEvent.objects.order_by('id').values_list('id', flat=True))
+
+        with self.assertRaises(ConnectionError):
+            relay_events([RecordingSink(fail=True)])
+        self.assertEqual(OutboxEvent.objects.filter(published_at__isnull=True).count(), len(expected))
+
+        path = os.path.join(tempfile.mkdtemp(), 'events.ndjson')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        queue_sink = LocalQueueSink('outbox-test')
+        self.assertEqual(relay_events([FileSink(path), queue_sink], batch_size=4), 4)
+        self.assertEqual(relay_events([FileSink(path), queue_sink], batch_size=4), len(expected) - 4)
+        self.assertEqual(relay_events([FileSink(path), queue_sink]), 0)
+
+        with open(path) as handle:
+            self.assertEqual([json.loads(line)['id'] for line in handle], expected)
+        self.assertEqual([queue_sink.queue.get_nowait()['id'] for _ in expected], expected)
+
+    def test_relay_leases_the_batch_while_sending(self):
+        self.create_products(2)
+        seen = []
+
+        class ReentrantSink:
+            def send(self, messages):
+                # The batch is already claimed, so a concurrent relay backs off instead of overtaking it
+                seen.append(OutboxEvent.objects.filter(claimed_until__isnull=False).count())
+                seen.append(relay_events([RecordingSink()]))
+
+        self.assertEqual(relay_events([ReentrantSink()]), 2)
+        self.assertEqual(seen, [2, 0])
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+        self.assertFalse(OutboxEvent.objects.filter(claimed_until__isnull=False).exists())
+
+
+# The async read views answer exactly like the viewset actions they mirror
+class AsyncProductViewTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = self.create_products(12)
+        self.create_products(3, quantity=2)
+        self.headers = {'Authorization': f"Bearer {AccessToken.for_user(self.user)}"}
+
+    async def assertSameResponse(self, sync_name, async_name, args=(), params=None):
+        expected = await sync_to_async(self.client.get)(reverse(sync_name, args=args), params or {})
+        response = await self.async_client.get(reverse(async_name, args=args), params or {}, headers=self.headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        data = json.loads(response.content)
+        self.assertEqual(json.dumps(data, sort_keys=True).replace('/async', ''), json.dumps(json.loads(expected.content), sort_keys=True))
+        return data
+
+    async def test_list_pages(self):
+        await self.assertSameResponse('inventoryproduct-list', 'inventoryproduct-list-async', params={'page': 2})
+        await self.assertSameResponse('inventoryproduct-list', 'inventoryproduct-list-async', params={'store': self.store.pk, 'ordering': '-quantity'})
+        page = await self.assertSameResponse('inventoryproduct-list', 'inventoryproduct-list-async', params={'cursor': '', 'ordering': 'quantity'})
+        self.assertIsNotNone(page['next'])
+
+    async def test_filters_are_the_viewsets(self):
+        await self.assertSameResponse('inventoryproduct-list', 'inventoryproduct-list-async', params={'name': 'Product 3', 'price': '2.50'})
+        errors = await self.assertSameResponse('inventoryproduct-list', 'inventoryproduct-list-async', params={'store': 0, 'price': 'cheap'})
+        self.assertEqual(sorted(errors), ['price', 'store'])
+
+    async def test_detail_low_stock_and_report(self):
+        await self.assertSameResponse('inventoryproduct-detail', 'inventoryproduct-detail-async', args=[self.products[0].pk])
+        await self.assertSameResponse('inventoryproduct-detail', 'inventoryproduct-detail-async', args=[0])
+        self.assertEqual(len(await self.assertSameResponse('inventoryproduct-low-stock', 'inventoryproduct-low-stock-async')), 3)
+        await self.assertSameResponse('inventoryproduct-inventory-report', 'inventoryproduct-inventory-report-async')
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('inventoryproduct-list-async'))
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post(reverse('inventoryproduct-list-async'), headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+
+# The benchmark drives the sync views from several threads and the async ones from one event loop
+@override_settings(**TEST_SETTINGS)
+class AsyncViewBenchmarkTests(TransactionTestCase):
+    def test_benchmark_command(self):
+        user = CustomUser.objects.create_user('owner', 'owner@example.com', 'password')
+        InventoryProduct.objects.create(
+            name='Tea', category=Category.objects.create(name='Beverages'), quantity=5, price=Decimal('1.00'), user=user,
+            supplier=Supplier.objects.create(name='Acme', contact='0700000001', email='acme@example.com', address='1 Acme Way'),
+            store=Store.objects.create(name='Main', email='main@example.com', address='1 Main St', contact='0700000002'),
+        )
+        out = StringIO()
+        call_command('benchmark_async_views', user=user.pk, requests=8, concurrency=4, stdout=out)
+        self.assertEqual(out.getvalue().count('req/s'), 8)
+
+
+# inventory_report sections run on the pool's own connections; a slow one is served stale
+@override_settings(**TEST_SETTINGS)
+class ConcurrentReportTests(TransactionTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = CustomUser.objects.create_user('owner', 'owner@example.com', 'password')
+        self.product = InventoryProduct.objects.create(
+            name='Tea', category=Category.objects.create(name='Beverages'), quantity=40, price=Decimal('2.50'), user=self.user,
+            supplier=Supplier.objects.create(name='Acme', contact='0700000001', email='acme@example.com', address='1 Acme Way'),
+            store=Store.objects.create(name='Main', email='main@example.com', address='1 Main St', contact='0700000002'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('inventoryproduct-inventory-report')
+
+    def sell(self, quantity):
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[self.product.pk]), {'quantity_change': quantity, 'reason': 'SALE'}, format='json')
+
+    def slow(self, name, seconds):
+        section, fields = reports.REPORT_SECTIONS[name]
+
+        def slow_section(user_id, now):
+            threading.Event().wait(seconds)
+            return section(user_id, now)
+        return mock.patch.dict(reports.REPORT_SECTIONS, {name: (slow_section, fields)})
+
+    def test_sections_run_concurrently(self):
+        self.sell(4)
+        with self.slow('summary', 0.4), self.slow('recent_changes', 0.4):
+            started = timezone.now()
+            report = reports.build_report(self.user.pk)
+        self.assertLess((timezone.now() - started).total_seconds(), 0.75)
+        self.assertEqual(report, {
+            'total_inventory_value': Decimal('90.00'), 'low_stock_items_count': 0,
+            'sales_last_30_days': 4, 'restocks_last_30_days': 0, 'stale_sections': [],
+        })
+
+    def test_slow_section_falls_back_to_last_value(self):
+        self.sell(4)
+        self.assertEqual(self.client.get(self.url).data['sales_last_30_days'], 4)
+        self.sell(6)
+        with self.slow('recent_changes', 0.5), mock.patch.object(reports, 'SECTION_TIMEOUT', 0.1):
+            response = self.client.get(self.url)
+            self.assertEqual(response.data['stale_sections'], ['recent_changes'])
+            self.assertEqual(response.data['sales_last_30_days'], 4)  # Last computed value
+            self.assertEqual(response.data['total_inventory_value'], Decimal('75.00'))  # Fresh
+            threading.Event().wait(0.6)  # The late section still finishes and refreshes the fallback
+
+            report = self.client.get(self.url).data  # The degraded report wasn't cached
+            self.assertEqual(report['sales_last_30_days'], 10)
+            self.assertEqual(report['stale_sections'], ['recent_changes'])
+
+    def test_slow_section_without_a_last_value_is_waited_for(self):
+        self.sell(4)
+        with self.slow('recent_changes', 0.3), mock.patch.object(reports, 'SECTION_TIMEOUT', 0.05):
+            report = self.client.get(self.url).data
+        self.assertEqual((report['sales_last_30_days'], report['stale_sections']), (4, []))  # Never null
+
+
+# Stock as of a past moment comes from the latest snapshot before it plus the ledger after it
+class StockHistoryTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def sell(self, product, quantity):
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': quantity, 'reason': 'SALE'}, format='json')
+        return timezone.now()
+
+    def test_as_of_combines_snapshot_and_ledger(self):
+        product, other = self.create_products(2, quantity=50)
+        opened = timezone.now()
+        after_first_sale = self.sell(product, 5)
+        self.assertEqual(take_snapshots(), 1)  # Only the product written since its opening snapshot
+        self.assertEqual(take_snapshots(), 0)
+        after_second_sale = self.sell(product, 3)
+
+        url = reverse('inventoryproduct-list')
+        for moment, expected in ((opened, 50), (after_first_sale, 45), (after_second_sale, 42)):
+            response = self.assertEndpointQueries(2, url, data={'as_of': moment.isoformat()})  # Subqueries, not a query per row
+            self.assertEqual({row['id']: row['quantity'] for row in response.data['results']}, {product.pk: expected, other.pk: 50})
+
+        history = self.client.get(reverse('inventoryproduct-change-history', args=[product.pk]), {'as_of': after_second_sale.isoformat()}).data
+        self.assertEqual((history['quantity'], history['snapshot']['quantity']), (42, 45))
+        self.assertEqual([change['quantity'] for change in history['changes']], [42])  # Only the changes since the snapshot
+
+        history = self.client.get(reverse('inventoryproduct-change-history', args=[product.pk]), {'as_of': after_first_sale.isoformat()}).data
+        self.assertEqual((history['quantity'], history['snapshot']['quantity'], len(history['changes'])), (45, 50, 1))
+
+    def test_products_added_later_the_same_day_are_left_out(self):
+        existing = self.create_products(1, quantity=50)[0]
+        before = timezone.now()
+        InventoryProduct.objects.create(
+            name='Late', category=self.category, quantity=5, price=Decimal('1.00'), user=self.user, supplier=self.supplier, store=self.store,
+        )
+        response = self.client.get(reverse('inventoryproduct-list'), {'as_of': before.isoformat()})
+        self.assertEqual([(row['id'], row['quantity']) for row in response.data['results']], [(existing.pk, 50)])
+
+    def test_invalid_as_of(self):
+        response = self.client.get(reverse('inventoryproduct-list'), {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+# Cold months of the ledger move to archive files and are read back for ranges that reach them
+class ChangeArchiveTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch.object(archive, 'ARCHIVE_DIR', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # Sell from two products and move those changes back to January 2025
+    def create_old_changes(self):
+        product, other = self.create_products(2, quantity=50)
+        for item, quantity in ((product, 5), (product, 3), (other, 2)):
+            self.client.post(reverse('inventoryproduct-adjust-stock', args=[item.pk]), {'quantity_change': quantity, 'reason': 'SALE'}, format='json')
+        january = timezone.make_aware(datetime(2025, 1, 10))
+        for offset, change in enumerate(InventoryChange.objects.order_by('id')):
+            InventoryChange.objects.filter(pk=change.pk).update(timestamp=january + timedelta(hours=offset))
+        return product, other
+
+    def test_archived_changes_are_served_from_the_archive(self):
+        product, other = self.create_old_changes()
+        url = reverse('inventorychange-list')
+        live = self.client.get(url).data['results']
+        rollups = list(InventoryChangeRollup.objects.order_by('id').values())
+
+        call_command('archive_changes', before='2025-02', stdout=StringIO())
+        self.assertFalse(InventoryChange.objects.exists())
+        self.assertEqual(list(InventoryChangeRollup.objects.order_by('id').values()), rollups)  # Archiving isn't a stock change
+        self.assertEqual(ChangeArchive.objects.get().row_count, 3)
+        call_command('archive_changes', before='2025-02', stdout=StringIO())  # Nothing left to archive
+        self.assertEqual(ChangeArchive.objects.count(), 1)
+
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': 1, 'reason': 'SALE'}, format='json')
+        history = self.client.get(reverse('inventoryproduct-change-history', args=[product.pk])).data
+        self.assertEqual([change['quantity'] for change in history], [41, 42, 45])  # Live first, then archived, newest first
+
+        response = self.client.get(url, {'timestamp__gte': '2025-01-01T00:00:00Z', 'timestamp__lt': '2025-02-01T00:00:00Z'})
+        self.assertEqual(response.data['results'], live)
+        response = self.client.get(url, {'timestamp__gte': '2025-01-01T00:00:00Z', 'product': product.pk, 'ordering': '-timestamp'})
+        self.assertEqual([change['quantity'] for change in response.data['results']], [41, 42, 45])
+        self.assertEqual(response.data['count'], 3)
+        response = self.client.get(url)  # Ranges after the archive stay on the live table
+        self.assertEqual([change['quantity'] for change in response.data['results']], [41])
+
+        snapshot, changes, quantity = stock_as_of(other, timezone.make_aware(datetime(2025, 1, 20)))
+        self.assertEqual((quantity, changes), (48, []))  # Month-end snapshot left by the archive
+
+        product.delete()
+        self.assertEqual(list(ArchivedChangeSegment.objects.values_list('product_id', flat=True)), [other.pk])
+
+    @mock.patch.object(KeysetPagination, 'page_size', 2)
+    def test_merged_lists_page_through_live_and_archived_changes(self):
+        product, other = self.create_old_changes()
+        call_command('archive_changes', before='2025-02', stdout=StringIO())
+        for _ in range(2):
+            self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': 1, 'reason': 'SALE'}, format='json')
+        url = reverse('inventorychange-list')
+        params = {'timestamp__gte': '2025-01-01T00:00:00Z', 'ordering': '-timestamp'}
+
+        pages, next_url = [], f"{url}?cursor=&timestamp__gte=2025-01-01T00:00:00Z&ordering=-timestamp"
+        while next_url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(next_url)
+            self.assertTrue(any('LIMIT 3' in query['sql'] for query in context.captured_queries))  # Only a page window of live rows
+            pages.append([change['quantity'] for change in response.data['results']])
+            next_url = response.data['next']
+        self.assertEqual(pages, [[40, 41], [48, 42], [45]])
+
+        response = self.client.get(url, {**params, 'page': 2})
+        self.assertEqual((response.data['count'], [change['quantity'] for change in response.data['results']]), (5, [48, 42]))
+
+    def test_rebuilding_rollups_keeps_archived_months(self):
+        product, other = self.create_old_changes()
+        rebuild_rollups()  # Into the January buckets of the backdated changes
+        call_command('archive_changes', before='2025-02', stdout=StringIO())
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': 1, 'reason': 'SALE'}, format='json')
+        start, end = timezone.make_aware(datetime(2025, 1, 1)), timezone.now() + timedelta(hours=1)
+        totals = rollup_totals(self.user, start, end)
+        self.assertEqual(totals['SALE'], {'quantity': -11, 'changes': 4})
+
+        call_command('rebuild_change_rollups', stdout=StringIO())
+        self.assertEqual(rollup_totals(self.user, start, end), totals)
+
+    def test_partitioning_needs_mysql(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_changes', stdout=StringIO())
+
+
+# Ledger entries carry signed deltas, so a product's net movement is the SUM of its entries
+class SignedChangeTests(InventoryAPITestCase):
+    def test_net_movement_is_a_sum(self):
+        product = self.create_products(1, quantity=50)[0]
+        self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': product.pk, 'quantity_change': 8, 'reason': 'SALE'},
+            {'product': product.pk, 'quantity_change': 3, 'reason': 'RETURN'},
+        ], format='json')
+        self.client.patch(reverse('inventoryproduct-detail', args=[product.pk]), {'quantity': 40}, format='json')
+        product.refresh_from_db()
+        self.assertEqual(InventoryChange.objects.filter(product=product).aggregate(net=Sum('quantity_change'))['net'], product.quantity - 50)
+
+        now = timezone.now()
+        response = self.client.get(reverse('inventorychange-rollup'), {'start': (now - timedelta(hours=1)).isoformat(), 'end': (now + timedelta(hours=1)).isoformat()})
+        self.assertEqual(response.data['net'], -10)
+        self.assertEqual(response.data['totals']['SALE']['quantity'], -8)
+        self.assertEqual(self.client.get(reverse('inventoryproduct-inventory-report')).data['sales_last_30_days'], 8)
+
+    def test_change_sign_must_match_reason(self):
+        product = self.create_products(1)[0]
+        url = reverse('inventorychange-list')
+        response = self.client.post(url, {'product': product.pk, 'quantity': 45, 'quantity_change': 5, 'reason': 'SALE'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'product': product.pk, 'quantity': 45, 'quantity_change': -5, 'reason': 'SALE'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_migration_signs_legacy_entries(self):
+        migration = importlib.import_module('inventory.migrations.0016_signed_quantity_change')
+        product = self.create_products(1, quantity=50)[0]
+        for quantity, quantity_change, reason in ((45, 5, 'SALE'), (47, 2, 'ADJUSTMENT'), (40, 7, 'ADJUSTMENT'), (43, 3, 'RESTOCK')):
+            InventoryChange.objects.create(product=product, quantity=quantity, quantity_change=quantity_change, user=self.user, reason=reason)
+        rebuild_rollups()
+
+        migration.sign_changes(apps, None)
+        self.assertEqual(list(InventoryChange.objects.order_by('id').values_list('quantity_change', flat=True)), [-5, 2, -7, 3])
+        maintained = sorted(InventoryChangeRollup.objects.values_list('granularity', 'reason', 'quantity_total'))
+        rebuild_rollups()
+        self.assertEqual(maintained, sorted(InventoryChangeRollup.objects.values_list('granularity', 'reason', 'quantity_total')))
+
+        migration.unsign_changes(apps, None)
+        self.assertEqual(list(InventoryChange.objects.order_by('id').values_list('quantity_change', flat=True)), [5, 2, 7, 3])
+
+
+# Availability per store is maintained by every product write and read in one query
+class StockAvailabilityTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = Store.objects.create(name='Branch', email='branch@example.com', address='2 Side St', contact='0700000003')
+
+    def availability_rows(self):
+        return sorted(StockAvailability.objects.filter(product_count__gt=0).values_list('user', 'name', 'store', 'quantity', 'product_count'))
+
+    def test_writes_keep_availability_in_sync(self):
+        main, other = self.create_products(2, quantity=20)
+        branch = InventoryProduct.objects.create(
+            name=main.name, category=self.category, quantity=7, price=Decimal('2.50'), user=self.user,
+            supplier=self.supplier, store=self.branch, barcode='555',
+        )
+        self.client.post(reverse('inventoryproduct-bulk-movements'), [
+            {'product': main.pk, 'quantity_change': 5, 'reason': 'SALE'},
+            {'product': branch.pk, 'quantity_change': 4, 'reason': 'RESTOCK'},
+        ], format='json')
+        self.client.patch(reverse('inventoryproduct-detail', args=[other.pk]), {'store': self.branch.pk, 'quantity': 12}, format='json')
+        upload = SimpleUploadedFile('products.csv', (
+            'barcode,name,description,category,supplier,store,quantity,price,reorder_level\n'
+            f"555,{main.name},,Beverages,Acme,Branch,9,2.50,\n777,{main.name},,Beverages,Acme,Main,3,2.50,\n"
+        ).encode(), content_type='text/csv')
+        self.client.post(reverse('inventoryproduct-import'), {'file': upload}, format='multipart')
+        self.client.delete(reverse('inventoryproduct-detail', args=[other.pk]))
+
+        maintained = self.availability_rows()
+        self.assertEqual(maintained, [
+            (self.user.pk, main.name, self.store.pk, 18, 2),
+            (self.user.pk, main.name, self.branch.pk, 9, 1),
+        ])
+        rebuild_availability()
+        self.assertEqual(maintained, self.availability_rows())
+
+    def test_availability_across_stores_in_one_query(self):
+        main = self.create_products(1, quantity=0)[0]
+        InventoryProduct.objects.create(
+            name=main.name, category=self.category, quantity=7, price=Decimal('2.50'), user=self.user,
+            supplier=self.supplier, store=self.branch, barcode='555',
+        )
+        url = reverse('inventoryproduct-availability')
+        response = self.assertEndpointQueries(1, url, data={'barcode': '555'})
+        self.assertEqual([(row['store_name'], row['quantity']) for row in response.data], [('Branch', 7), ('Main', 0)])
+        response = self.assertEndpointQueries(1, url, data={'name': main.name, 'in_stock': 'true'})
+        self.assertEqual([row['store'] for row in response.data], [self.branch.pk])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+# Transfers move stock between stores in one transaction with paired ledger entries
+class StockTransferTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.branch = Store.objects.create(name='Branch', email='branch@example.com', address='2 Side St', contact='0700000003')
+        self.url = reverse('stocktransfer-list')
+
+    def transfer(self, items, from_store=None, to_store=None):
+        return self.client.post(self.url, {
+            'from_store': (from_store or self.store).pk, 'to_store': (to_store or self.branch).pk, 'items': items,
+        }, format='json')
+
+    def test_transfer_moves_stock_with_paired_entries(self):
+        first, second = self.create_products(2, quantity=20)
+        stocked = InventoryProduct.objects.create(
+            name=first.name, category=self.category, quantity=5, price=Decimal('2.50'), user=self.user, supplier=self.supplier, store=self.branch,
+        )
+        response = self.transfer([{'product': first.pk, 'quantity': 8}, {'product': second.pk, 'quantity': 3}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(change['reason'], change['quantity_change'], change['quantity']) for change in response.data['changes']],
+            [('TRANSFER_OUT', -8, 12), ('TRANSFER_IN', 8, 13), ('TRANSFER_OUT', -3, 17), ('TRANSFER_IN', 3, 3)],
+        )
+        created = InventoryProduct.objects.get(store=self.branch, name=second.name)  # Copied from the source product
+        self.assertEqual((created.quantity, created.price, created.category), (3, second.price, self.category))
+        stocked.refresh_from_db()
+        self.assertEqual(stocked.quantity, 13)
+        self.assertEqual(InventoryChange.objects.filter(transfer_id=response.data['id']).aggregate(net=Sum('quantity_change'))['net'], 0)
+
+        summaries = sorted(InventorySummary.objects.filter(product_count__gt=0).values_list('store', 'product_count', 'total_value'))
+        availability = sorted(StockAvailability.objects.filter(product_count__gt=0).values_list('name', 'store', 'quantity'))
+        rebuild_summaries()
+        rebuild_availability()
+        self.assertEqual(summaries, sorted(InventorySummary.objects.filter(product_count__gt=0).values_list('store', 'product_count', 'total_value')))
+        self.assertEqual(availability, sorted(StockAvailability.objects.filter(product_count__gt=0).values_list('name', 'store', 'quantity')))
+        self.assertEqual(self.client.get(reverse('stocktransfer-detail', args=[response.data['id']])).data['changes'], response.data['changes'])
+
+    def test_transfer_is_all_or_nothing(self):
+        first, second = self.create_products(2, quantity=5)
+        response = self.transfer([{'product': first.pk, 'quantity': 2}, {'product': second.pk, 'quantity': 6}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['errors'], [{'index': 1, 'errors': {'quantity': ['Insufficient stock.']}}])
+        self.assertEqual(list(InventoryProduct.objects.order_by('id').values_list('quantity', flat=True)), [5, 5])
+        self.assertFalse(InventoryChange.objects.exists() or StockTransfer.objects.exists())
+        self.assertFalse(InventoryProduct.objects.filter(store=self.branch).exists())
+
+    def test_invalid_transfers(self):
+        product = self.create_products(1)[0]
+        self.assertEqual(self.transfer([{'product': product.pk, 'quantity': 1}], to_store=self.store).status_code, 400)
+        self.assertEqual(self.transfer([{'product': product.pk, 'quantity': 1}], from_store=self.branch, to_store=self.store).status_code, 400)
+        self.assertEqual(self.transfer([]).status_code, 400)
+        response = self.client.post(reverse('inventoryproduct-bulk-movements'), [{'product': product.pk, 'quantity_change': 5, 'reason': 'TRANSFER_IN'}], format='json')
+        self.assertEqual(response.status_code, 400)  # Transfer entries only come in pairs
+
+
+# Reorder suggestions come from the daily SALE rollups over a short and a long window
+class ReorderSuggestionTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def sell(self, product, quantity, days_ago):
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': quantity, 'reason': 'SALE'}, format='json')
+        change = InventoryChange.objects.filter(product=product).latest('id')
+        InventoryChange.objects.filter(pk=change.pk).update(timestamp=change.timestamp - timedelta(days=days_ago))
+
+    def test_suggestions_by_supplier(self):
+        spiking, steady, idle = self.create_products(3, quantity=50)
+        other = Supplier.objects.create(name='Other', contact='0700000009', email='other@example.com', address='9 Other Rd')
+        fresh = InventoryProduct.objects.create(
+            name='Fresh', category=self.category, quantity=50, price=Decimal('2.50'), user=self.user, supplier=other, store=self.store,
+        )
+        self.sell(spiking, 14, 3)  # 2 a day over the short window
+        self.sell(steady, 28, 20)  # 1 a day over the long window
+        self.sell(fresh, 10, 0)  # Today isn't a whole day yet
+        rebuild_rollups()  # Into the buckets of the backdated timestamps
+        self.assertEqual(compute_suggestions(batch_size=2), 4)
+
+        suggestion = ReorderSuggestion.objects.get(product=spiking)
+        self.assertEqual((suggestion.daily_sales, suggestion.days_of_cover, suggestion.suggested_quantity), (2, 18, 6))  # 36 left, 42 needed
+        suggestion = ReorderSuggestion.objects.get(product=steady)
+        self.assertEqual((suggestion.daily_sales, suggestion.days_of_cover, suggestion.suggested_quantity), (1, 22, 0))
+        self.assertEqual(ReorderSuggestion.objects.get(product=idle).days_of_cover, None)
+
+        url = reverse('inventoryproduct-reorder-suggestions')
+        response = self.assertEndpointQueries(1, url)
+        self.assertEqual([(group['supplier_name'], [row['product'] for row in group['suggestions']]) for group in response.data], [('Acme', [spiking.pk])])
+        response = self.client.get(url, {'all': 'true'})
+        self.assertEqual(
+            [(group['supplier_name'], [row['product'] for row in group['suggestions']]) for group in response.data],
+            [('Acme', [spiking.pk, steady.pk, idle.pk]), ('Other', [fresh.pk])],
+        )
+
+        self.sell(steady, 10, 1)  # A rerun picks up new sales
+        rebuild_rollups()
+        compute_suggestions()
+        self.assertEqual(ReorderSuggestion.objects.get(product=steady).sold_long, 38)
+
+
+# Draft purchase orders group the low-stock products by supplier; receiving one restocks them
+class PurchaseOrderTests(InventoryAPITestCase):
+    def test_generate_and_receive(self):
+        low, enough = self.create_products(2, quantity=4)
+        enough.reorder_level = 2
+        enough.save()
+        other = Supplier.objects.create(name='Other', contact='0700000009', email='other@example.com', address='9 Other Rd')
+        elsewhere = InventoryProduct.objects.create(
+            name='Elsewhere', category=self.category, quantity=0, price=Decimal('2.50'), user=self.user, supplier=other, store=self.store,
+        )
+        ReorderSuggestion.objects.create(
+            product=elsewhere, user=self.user, supplier=other, quantity=0, daily_sales=3, suggested_quantity=63, computed_at=timezone.now(),
+        )
+
+        url = reverse('purchaseorder-generate')
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(order['supplier_name'], [(line['product'], line['quantity']) for line in order['lines']]) for order in response.data],
+            [('Acme', [(low.pk, 16)]), ('Other', [(elsewhere.pk, 63)])],  # Up to twice the reorder level, or the suggestion
+        )
+        self.assertEqual(self.client.post(url).data, [])  # Already on draft orders
+
+        order, draft = response.data
+        response = self.client.post(reverse('purchaseorder-receive', args=[order['id']]))
+        self.assertEqual((response.status_code, response.data['status']), (200, 'RECEIVED'))
+        low.refresh_from_db()
+        self.assertEqual(low.quantity, 20)
+        change = InventoryChange.objects.get(product=low)
+        self.assertEqual((change.reason, change.quantity_change, change.quantity), ('RESTOCK', 16, 20))
+        self.assertEqual(self.client.post(reverse('purchaseorder-receive', args=[order['id']])).status_code, 409)
+        self.assertEqual(self.client.delete(reverse('purchaseorder-detail', args=[order['id']])).status_code, 409)
+        self.assertEqual(self.client.delete(reverse('purchaseorder-detail', args=[draft['id']])).status_code, 204)
+        self.assertEqual(self.client.get(reverse('purchaseorder-list'), {'status': 'RECEIVED'}).data['count'], 1)
+
+
+    def test_generating_twice_never_orders_a_product_twice(self):
+        self.create_products(3, quantity=4)
+        with CaptureQueriesContext(connection) as context:
+            first = generate_purchase_orders(self.user)
+        first_select = next(query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT'))
+        self.assertIn('customuser', first_select.lower())  # The user's lock comes before the product scan
+        self.assertEqual(generate_purchase_orders(self.user), [])
+        self.assertEqual(len(first), 1)
+        self.assertEqual(PurchaseOrderLine.objects.count(), 3)
+        self.assertEqual(PurchaseOrderLine.objects.values('product').distinct().count(), 3)
+
+# The low-stock flag is computed by the database on every write path
+class LowStockFlagTests(QueryCountAssertionsMixin, InventoryAPITestCase):
+    def test_flag_follows_quantity_and_reorder_level(self):
+        product, other = self.create_products(2, quantity=20)
+        self.assertFalse(product.is_low_stock or InventoryProduct.objects.get(pk=product.pk).is_low_stock)
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[product.pk]), {'quantity_change': 12, 'reason': 'SALE'}, format='json')  # F() update
+        response = self.assertEndpointQueries(1, reverse('inventoryproduct-low-stock'))
+        self.assertEqual([(row['id'], row['is_low_stock']) for row in response.data], [(product.pk, True)])
+
+        response = self.client.patch(reverse('inventoryproduct-detail', args=[product.pk]), {'reorder_level': 5}, format='json')
+        self.assertFalse(response.data['is_low_stock'])
+        response = self.client.patch(reverse('inventoryproduct-detail', args=[other.pk]), {'quantity': 10}, format='json')
+        self.assertTrue(response.data['is_low_stock'])
+        self.assertEqual(list(InventoryProduct.objects.filter(is_low_stock=True).values_list('id', flat=True)), [other.pk])
+
+
+# The SSE feed streams the owner's ledger and low-stock events as the outbox poller finds them
+class StockFeedTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_products(1, quantity=20, reorder_level=10)[0]
+        self.backend = OutboxPollingBackend()  # Polled by hand instead of from a thread
+        self.backend.broker = broker
+        self.backend.last = OutboxEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        broker.backend = self.backend
+        self.addCleanup(setattr, broker, 'backend', None)
+        self.addCleanup(broker.subscriptions.clear)
+        self.headers = {'Authorization': f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def sell(self, quantity):
+        self.client.post(reverse('inventoryproduct-adjust-stock', args=[self.product.pk]), {'quantity_change': quantity, 'reason': 'SALE'}, format='json')
+
+    async def next_frame(self, stream):
+        return (await asyncio.wait_for(anext(stream), 5)).decode()
+
+    def test_feed_events(self):
+        self.sell(15)
+        events = [feed_event for event in OutboxEvent.objects.order_by('id') for feed_event in feed_events(event)]
+        self.assertEqual([(event['type'], event['store']) for event in events], [('change', self.store.pk), ('low_stock', self.store.pk)])
+        self.assertEqual(events[0]['data']['quantity_change'], -15)
+
+    async def test_stream_delivers_polled_events(self):
+        response = await self.async_client.get(reverse('stock-feed'), {'type': 'change'}, headers=self.headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await self.next_frame(stream)).startswith('retry:'))
+
+        await sync_to_async(self.sell)(15)
+        self.assertEqual(await sync_to_async(self.backend.poll)(), 2)  # The change and the product update; low_stock is filtered out
+        frame = await self.next_frame(stream)
+        self.assertIn('event: change', frame)
+        self.assertEqual(json.loads(frame.split('data: ', 1)[1])['data']['quantity'], 5)
+
+    async def test_reconnect_replays_missed_events(self):
+        await sync_to_async(self.sell)(15)
+        first = await OutboxEvent.objects.filter(topic='change.created').afirst()
+        response = await self.async_client.get(reverse('stock-feed'), headers={**self.headers, 'Last-Event-ID': str(first.pk - 1)})
+        stream = response.streaming_content
+        self.assertIn(f"id: {first.pk}\nevent: change", await self.next_frame(stream))
+        self.assertIn('event: low_stock', await self.next_frame(stream))
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(reverse('stock-feed'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_poller_logs_failures_and_backs_off(self):
+        class Stop(Exception):
+            pass
+
+        delays = []
+
+        def sleep(seconds):
+            delays.append(seconds)
+            if len(delays) == 4:
+                raise Stop()
+
+        poll = mock.Mock(side_effect=[DatabaseError('gone'), DatabaseError('gone'), 0, 0])
+        with mock.patch.object(self.backend, 'poll', poll), mock.patch('inventory.feed.time.sleep', sleep):
+            with mock.patch('inventory.feed.logger') as logger, self.assertRaises(Stop):
+                self.backend.run()
+        self.assertEqual(delays, [1.0, 2.0, 0.5, 0.5])  # Doubled while failing, back to the interval after a success
+        self.assertEqual(logger.exception.call_count, 2)
+
+
+# Every query the endpoints issue is served by an index
+@override_settings(**TEST_SETTINGS)
+class QueryPlanTests(APITestCase):
+    def test_endpoints_do_not_scan_large_tables(self):
+        call_command('explain_queries', users=4, products=400, changes=2, stdout=StringIO())  # Raises CommandError on a full scan
@@ -13,11 +13,43 @@ urlpatterns = [
     # InventoryProduct URLs
     path('products/', InventoryProductViewSet.as_view({'get': 'list', 'post': 'create'}), name='inventoryproduct-list'),
     path('products/<int:pk>/', InventoryProductViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='inventoryproduct-detail'),
+    path('products/bulk_movements/', InventoryProductViewSet.as_view({'post': 'bulk_movements'}), name='inventoryproduct-bulk-movements'),
+    path('products/by-barcode/', InventoryProductViewSet.as_view({'get': 'by_barcodes'}), name='inventoryproduct-by-barcodes'),
+    path('products/by-barcode/<str:code>/', InventoryProductViewSet.as_view({'get': 'by_barcode'}), name='inventoryproduct-by-barcode'),
+    path('products/import/', InventoryProductViewSet.as_view({'post': 'import_products'}), name='inventoryproduct-import'),
+    path('products/export/', InventoryProductViewSet.as_view({'get': 'export'}), name='inventoryproduct-export'),
+    path('products/availability/', InventoryProductViewSet.as_view({'get': 'availability'}), name='inventoryproduct-availability'),
+    path('products/reorder_suggestions/', InventoryProductViewSet.as_view({'get': 'reorder_suggestions'}), name='inventoryproduct-reorder-suggestions'),
+    path('products/low_stock/', InventoryProductViewSet.as_view({'get': 'low_stock'}), name='inventoryproduct-low-stock'),
+    path('products/inventory_report/', InventoryProductViewSet.as_view({'get': 'inventory_report'}), name='inventoryproduct-inventory-report'),
+    path('products/<int:pk>/adjust_stock/', InventoryProductViewSet.as_view({'post': 'adjust_stock'}), name='inventoryproduct-adjust-stock'),
+    path('products/<int:pk>/change_history/', InventoryProductViewSet.as_view({'get': 'change_history'}), name='inventoryproduct-change-history'),
 
     # InventoryChange URLs
     path('changes/', InventoryChangeViewSet.as_view({'get': 'list', 'post': 'create'}), name='inventorychange-list'),
+    path('changes/export/', InventoryChangeViewSet.as_view({'get': 'export'}), name='inventorychange-export'),
+    path('changes/rollup/', InventoryChangeViewSet.as_view({'get': 'rollup'}), name='inventorychange-rollup'),
     path('changes/<int:pk>/', InventoryChangeViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='inventorychange-detail'),
 
+    # StockTransfer URLs
+    path('transfers/', StockTransferViewSet.as_view({'get': 'list', 'post': 'create'}), name='stocktransfer-list'),
+    path('transfers/<int:pk>/', StockTransferViewSet.as_view({'get': 'retrieve'}), name='stocktransfer-detail'),
+
+    # PurchaseOrder URLs
+    path('purchase_orders/', PurchaseOrderViewSet.as_view({'get': 'list'}), name='purchaseorder-list'),
+    path('purchase_orders/generate/', PurchaseOrderViewSet.as_view({'post': 'generate'}), name='purchaseorder-generate'),
+    path('purchase_orders/<int:pk>/', PurchaseOrderViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'}), name='purchaseorder-detail'),
+    path('purchase_orders/<int:pk>/receive/', PurchaseOrderViewSet.as_view({'post': 'receive'}), name='purchaseorder-receive'),
+
+    # Async (ASGI) versions of the hot product reads
+    path('async/products/', product_list_async, name='inventoryproduct-list-async'),
+    path('async/products/<int:pk>/', product_detail_async, name='inventoryproduct-detail-async'),
+    path('async/products/low_stock/', low_stock_async, name='inventoryproduct-low-stock-async'),
+    path('async/products/inventory_report/', inventory_report_async, name='inventoryproduct-inventory-report-async'),
+
+    # Live feed of stock changes (Server-Sent Events)
+    path('feed/stock/', stock_feed, name='stock-feed'),
+
     # Supplier URLs
     path('suppliers/', SupplierViewSet.as_view({'get': 'list', 'post': 'create'}), name='supplier-list'),
     path('suppliers/<int:pk>/', SupplierViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='supplier-detail'),
@@ -5,14 +5,40 @@ from rest_framework.decorators import action
 from .serializers import *
 from .models import *
 from .permissions import IsOwnerOrReadOnly
+from .alerts import enqueue_low_stock_alert
+from .archive import archive_horizon, archived_changes
+from .barcodes import lookup_barcode, lookup_barcodes
+from .caching import acache_response, cache_response, report_scope
+from .feed import FEED_TYPES, Subscription, stream_events
+from .exports import CHANGE_EXPORT_COLUMNS, EXPORT_CONTENT_TYPES, PRODUCT_EXPORT_COLUMNS, export_response
+from .history import stock_as_of, with_quantity_as_of
+from .imports import ImportFormatError, ProductImport
+from .pagination import KeysetPagination
+from .purchasing import PurchaseOrderRejected, generate_purchase_orders, receive_purchase_order
+from .reports import abuild_report, build_report, is_complete_report
+from .rollups import rollup_totals
+from .search import SEARCH_DOCUMENT_FIELDS, FullTextSearchFilter
+from .services import StockConflict, TransferRejected, apply_stock_movements, apply_transfer, save_product_versioned
 from django_filters.rest_framework import DjangoFilterBackend
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from asgiref.sync import sync_to_async
+from django import forms
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+import csv
+import functools
+import itertools
+import io
+from django.db import transaction
+from django.db.models import F, Subquery
 
 # ViewSet for Supplier model
 class SupplierViewSet(viewsets.ModelViewSet):
-    queryset = Supplier.objects.all()  # Get all suppliers from the database
+    queryset = Supplier.objects.all().order_by('id')  # Get all suppliers from the database
     serializer_class = SupplierSerializer  # Serializer for supplier data
     permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
 
@@ -24,37 +50,78 @@ class SupplierViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)  # Get success headers
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)  # Return response with created supplier data
 
+    # Cached per user and query string until a supplier is written
+    @cache_response('suppliers')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 # ViewSet for Store model
 class StoreViewSet(viewsets.ModelViewSet):
     serializer_class = StoreSerializer  # Serializer for store data
     permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
 
-    # Custom queryset to filter stores by the current user
+    # Stores are shared between users (Store.user was removed in migration 0003)
     def get_queryset(self):
-        user = self.request.user  # Get the current user
-        return Store.objects.filter(user=user)  # Filter stores owned by the current user
+        return Store.objects.all().order_by('id')
+
+    # Cached per user and query string until a store is written
+    @cache_response('stores')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
 # ViewSet for Category model
 class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()  # Get all categories from the database
+    queryset = Category.objects.all().order_by('id')  # Get all categories from the database
     serializer_class = CategorySerializer  # Serializer for category data
     permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
 
+    # Cached per user and query string until a category is written
+    @cache_response('categories')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 # ViewSet for InventoryProduct model
 class InventoryProductViewSet(viewsets.ModelViewSet):
     serializer_class = InventoryProductSerializer  # Serializer for inventory product data
     queryset = InventoryProduct.objects.all().order_by('id')  # Get all products ordered by name
     permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
+    pagination_class = KeysetPagination  # Numbered pages by default, keyset pages with ?cursor=
     
     # Set up filtering, ordering, and search capabilities
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['name', 'category', 'store', 'price']  # Fields to filter by
     ordering_fields = ['name', 'quantity', 'price', 'date_added']  # Fields to order by
-    search_fields = ['name', 'description', 'supplier__name', 'store__name']  # Fields to search in
+    search_fields = list(SEARCH_DOCUMENT_FIELDS)  # Fields in the full-text search document
+    max_movement_batch = 1000  # Largest batch accepted by bulk_movements
+    max_barcode_batch = 100  # Most barcodes accepted by one by_barcodes lookup
+
+    # Relations to join per action so serializing a page doesn't fire one query per row and field
+    select_related_by_action = {
+        'list': InventoryProductQuerySet.SERIALIZER_RELATIONS,
+        'retrieve': InventoryProductQuerySet.SERIALIZER_RELATIONS,
+        'update': InventoryProductQuerySet.SERIALIZER_RELATIONS,
+        'partial_update': InventoryProductQuerySet.SERIALIZER_RELATIONS,
+        'low_stock': InventoryProductQuerySet.SERIALIZER_RELATIONS,
+    }
 
     # Custom queryset to filter products by the current user
     def get_queryset(self):
-        return InventoryProduct.objects.filter(user=self.request.user)  # Filter products owned by the current user
+        queryset = InventoryProduct.objects.for_user(self.request.user).order_by('id')  # Filter products owned by the current user
+        related = self.select_related_by_action.get(self.action)
+        if related:
+            queryset = queryset.select_related(*related)  # Join the relations this action serializes
+        as_of = self.get_as_of() if self.action == 'list' else None
+        if as_of is not None:
+            queryset = with_quantity_as_of(queryset, as_of)  # Quantities at that moment, from snapshots and the ledger
+        return queryset
+
+    # Moment given with ?as_of=, or None for current stock
+    def get_as_of(self):
+        if 'as_of' not in self.request.query_params:
+            return None
+        serializer = AsOfQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['as_of']
 
     # Add request to serializer context
     def get_serializer_context(self):
@@ -66,8 +133,8 @@ class InventoryProductViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)  # Get and validate the data
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)  # Create the product instance
-        serializer.save()  # Save the new product
+        with transaction.atomic():  # The product and the events its signals record commit together
+            self.perform_create(serializer)  # Create the product instance
         headers = self.get_success_headers(serializer.data)  # Get success headers
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)  # Return response with created product data
 
@@ -75,92 +142,463 @@ class InventoryProductViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  # Save the product with the current user as the owner
 
+    # Delete the product together with the events its signals record
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
     # Custom update method to handle quantity changes and low stock alerts
     def update(self, request, *args, **kwargs):
         instance = self.get_object()  # Get the current product instance
-        old_quantity = instance.quantity  # Store the old quantity
         serializer = self.get_serializer(instance, data=request.data, partial=True)  # Get and validate the data
         serializer.is_valid(raise_exception=True)
-        
+
+        # Clients send back the version they read; default to the version loaded above
+        try:
+            expected_version = int(request.data.get('version', instance.version))
+        except (TypeError, ValueError):
+            return Response({'version': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
         # Clear pre-fetched objects cache for accurate updates
         if getattr(instance, '_prefetched_objects_cache', None):
             instance._prefetched_objects_cache = {}
 
-        new_quantity = serializer.validated_data.get('quantity', old_quantity)  # Get the new quantity
-        if new_quantity != old_quantity:  # Check if the quantity has changed
-            change = new_quantity - old_quantity  # Calculate the change
-            InventoryChange.objects.create(  # Record the change
-                item=instance,
-                quantity_change=change,
-                user=request.user,  # Associate with the current user
-                reason='ADJUSTMENT'
-            )
+        try:
+            change = save_product_versioned(serializer, expected_version, request.user)  # Save and record the change
+        except StockConflict:
+            return Response({'detail': 'Product was modified concurrently; reload it and retry.'}, status=status.HTTP_409_CONFLICT)
 
-            # Check for low stock alert
-            if new_quantity <= instance.reorder_level:
-                self.send_low_stock_alert(instance)  # Send alert if low stock
+        # Check for low stock alert
+        if change and instance.quantity <= instance.reorder_level:
+            self.send_low_stock_alert(instance)  # Send alert if low stock
 
         return Response(serializer.data)  # Return response with updated product data
 
+    # Custom action to move stock of one product with a conditional UPDATE ... WHERE quantity >= n
+    @action(detail=True, methods=['post'])
+    def adjust_stock(self, request, pk=None):
+        instance = self.get_object()  # Ensures the product exists and belongs to the current user
+        data = request.data.copy()
+        data['product'] = instance.pk
+        serializer = StockMovementSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        applied, errors, products = apply_stock_movements(request.user, [serializer.validated_data])
+        if errors:
+            return Response(errors[0]['errors'], status=status.HTTP_409_CONFLICT)  # Not enough stock left to apply it
+
+        product = products[instance.pk]
+        if product.quantity <= product.reorder_level:
+            self.send_low_stock_alert(product)  # Send alert if low stock
+        return Response(applied[0])
+
+    # Custom action to apply a batch of stock movements (e.g. POS sales) in one transaction
+    @action(detail=False, methods=['post'])
+    def bulk_movements(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'detail': 'Expected a non-empty list of movements.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_movement_batch:
+            return Response({'detail': f"At most {self.max_movement_batch} movements per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Validate every entry, keeping track of its position in the batch
+        movements, errors = [], []
+        for index, entry in enumerate(request.data):
+            serializer = StockMovementSerializer(data=entry)
+            if serializer.is_valid():
+                movements.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        applied, apply_errors, products = apply_stock_movements(request.user, [movement for _, movement in movements])
+        positions = [index for index, _ in movements]  # Map positions in the valid subset back to the request
+        for result in applied + apply_errors:
+            result['index'] = positions[result['index']]
+        errors = sorted(errors + apply_errors, key=lambda result: result['index'])
+
+        # Check for low stock alerts on the products this batch touched
+        for product in products.values():
+            if product.quantity <= product.reorder_level:
+                self.send_low_stock_alert(product)
+
+        if not errors:
+            response_status = status.HTTP_200_OK
+        elif applied:
+            response_status = status.HTTP_207_MULTI_STATUS  # Some movements applied, some rejected
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'applied': applied, 'errors': errors}, status=response_status)
+
+    # Custom action for scanners: look a product up by barcode through the barcode cache, so warm
+    # lookups are served without touching the database
+    @action(detail=False, methods=['get'], url_path=r'by-barcode/(?P<code>[^/]+)')
+    def by_barcode(self, request, code=None):
+        owner, data = lookup_barcode(code, self.serialize_for_cache)
+        if owner != request.user.pk:
+            return Response({'detail': 'No product with this barcode.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+    # Custom action to look up several barcodes at once (?code=...&code=...)
+    @action(detail=False, methods=['get'], url_path='by-barcode')
+    def by_barcodes(self, request):
+        codes = list(dict.fromkeys(request.query_params.getlist('code')))  # Drop duplicates, keep the order
+        if not codes:
+            return Response({'code': ['At least one barcode is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        if len(codes) > self.max_barcode_batch:
+            return Response({'code': [f"At most {self.max_barcode_batch} barcodes per request."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = lookup_barcodes(codes, self.serialize_for_cache)
+        results = {code: data for code, (owner, data) in entries.items() if owner == request.user.pk}
+        return Response({'results': results, 'missing': [code for code in codes if code not in results]})
+
+    # Representation stored in the barcode cache
+    def serialize_for_cache(self, product):
+        return InventoryProductSerializer(product).data
+
+    # Custom action to import a CSV upload (multipart field "file"), upserting products by barcode
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_products(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['A CSV file is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = ProductImport(request.user).run(io.TextIOWrapper(upload.file, encoding='utf-8-sig'))  # Decoded line by line
+        except (ImportFormatError, UnicodeDecodeError, csv.Error) as exc:
+            return Response({'file': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not report['errors']:
+            response_status = status.HTTP_200_OK
+        elif report['created'] or report['updated']:
+            response_status = status.HTTP_207_MULTI_STATUS  # Some rows imported, some rejected
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
+
+    # Custom action to stream every product matching the list filters (?export_format=csv|ndjson)
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response({'export_format': [f"Choose one of: {', '.join(EXPORT_CONTENT_TYPES)}."]}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())  # Same filtering, search and ordering as list
+        return export_response(queryset, PRODUCT_EXPORT_COLUMNS, export_format, 'products')
+
     # Custom action to get low stock items
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
-        queryset = self.get_queryset().filter(quantity__lte=F('reorder_level'))  # Get low stock products
+        queryset = self.get_queryset().filter(is_low_stock=True)  # Get low stock products
         serializer = self.get_serializer(queryset, many=True)  # Serialize the low stock products
         return Response(serializer.data)  # Return response with low stock products data
 
-    # Custom action to get change history for a specific item
+    # Custom action answering where an item is in stock: its quantity at every store, by name or by
+    # the barcode of one of its products, from the maintained StockAvailability rows in one query
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        serializer = AvailabilityQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        name = params.get('name')
+        if name is None:  # The barcode's product name, resolved inside the same query
+            name = Subquery(InventoryProduct.objects.for_user(request.user).filter(barcode=params['barcode']).values('name')[:1])
+        rows = StockAvailability.objects.filter(user=request.user, name=name, product_count__gt=0).select_related('store')
+        if params['in_stock']:
+            rows = rows.filter(quantity__gt=0)
+        return Response(StockAvailabilitySerializer(rows.order_by('-quantity', 'store_id'), many=True).data)
+
+    # Custom action serving the reorder suggestions computed by compute_reorder_suggestions (see
+    # reorder.py), grouped by supplier, the products running out soonest first
+    @action(detail=False, methods=['get'])
+    def reorder_suggestions(self, request):
+        serializer = ReorderQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        rows = ReorderSuggestion.objects.filter(user=request.user).select_related('supplier', 'product__store')
+        if not serializer.validated_data['all']:
+            rows = rows.filter(suggested_quantity__gt=0)
+        rows = rows.order_by('supplier_id', F('days_of_cover').asc(nulls_last=True), 'product_id')
+        groups = [
+            {'supplier': supplier.pk, 'supplier_name': supplier.name, 'suggestions': ReorderSuggestionSerializer(items, many=True).data}
+            for supplier, items in itertools.groupby(rows, key=lambda row: row.supplier)
+        ]
+        return Response(groups)
+
+    # Custom action to get change history for a specific item. With ?as_of= it returns the stock
+    # at that moment, the snapshot it starts from and the changes applied on top of it
     @action(detail=True, methods=['get'])
     def change_history(self, request, pk=None):
         item = self.get_object()  # Get the current product instance
-        changes = InventoryChange.objects.filter(item=item).order_by('-timestamp')  # Get change history for the item
+        as_of = self.get_as_of()
+        if as_of is not None:
+            snapshot, changes, quantity = stock_as_of(item, as_of)
+            return Response({
+                'as_of': as_of,
+                'quantity': quantity,
+                'snapshot': {'taken_at': snapshot.taken_at, 'quantity': snapshot.quantity} if snapshot is not None else None,
+                'changes': InventoryChangeSerializer(changes, many=True).data,
+            })
+        changes = InventoryChange.objects.filter(product=item).order_by('-timestamp')  # Get change history for the item
+        archived = archived_changes(product_id=item.pk)  # Changes moved to the archive, oldest first
+        if archived:
+            changes = list(changes) + archived[::-1]
         serializer = InventoryChangeSerializer(changes, many=True)  # Serialize the change history
         return Response(serializer.data)  # Return response with change history data
 
-    # Custom action to generate an inventory report
+    # Custom action to generate an inventory report, cached until the user's products or changes
+    # are written; the timeout bounds how far the rolling 30-day window can lag. Its sections run
+    # concurrently, and a report with stale sections (see reports.py) isn't cached.
     @action(detail=False, methods=['get'])
+    @cache_response(lambda request: report_scope(request.user.pk), timeout=60, cacheable=is_complete_report)
     def inventory_report(self, request):
-        # Calculate total inventory value
-        total_value = self.get_queryset().aggregate(
-            total_value=Sum(ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField()))
-        )['total_value'] or 0  # Total inventory value
-
-        # Count low stock items
-        low_stock_items = self.get_queryset().filter(quantity__lte=F('reorder_level')).count()  # Count low stock products
-
-        # Calculate recent changes (last 30 days)
-        thirty_days_ago = timezone.now() - timedelta(days=30)  # Date 30 days ago
-        recent_changes = InventoryChange.objects.filter(
-            item__in=self.get_queryset(),
-            timestamp__gte=thirty_days_ago
-        ).aggregate(
-            sales=Sum('quantity_change', filter=models.Q(reason='SALE')),  # Total sales in the last 30 days
-            restocks=Sum('quantity_change', filter=models.Q(reason='RESTOCK'))  # Total restocks in the last 30 days
-        )
-
-        # Compile report data
-        report = {
-            'total_inventory_value': total_value,
-            'low_stock_items_count': low_stock_items,
-            'sales_last_30_days': abs(recent_changes['sales'] or 0),
-            'restocks_last_30_days': recent_changes['restocks'] or 0,
-        }
-
+        report = build_report(request.user.pk)  # Total value, low stock count and 30-day changes
         return Response(report)  # Return response with the inventory report
 
-    # Method to send low stock alert (currently just prints to console)
+    # Method to send a low stock alert: queued for the process_alerts worker, which coalesces
+    # repeats and delivers them, so the request never waits on notification I/O
     def send_low_stock_alert(self, item):
-        print(f"Low stock alert for {item.name} at {item.store.name}. Current quantity: {item.quantity}")
+        enqueue_low_stock_alert(item)
 
 # ViewSet for InventoryChange model
 class InventoryChangeViewSet(viewsets.ModelViewSet):    
     serializer_class = InventoryChangeSerializer  # Serializer for inventory change data
     permissions_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
+    pagination_class = KeysetPagination  # Numbered pages by default, keyset pages with ?cursor=
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {'product': ['exact'], 'reason': ['exact'], 'timestamp': ['gte', 'lt']}  # Fields to filter by
+    ordering_fields = ['timestamp']  # Fields to order by
 
     # Custom queryset to filter changes by the current user
     def get_queryset(self):
-        return InventoryChange.objects.filter(user=self.request.user)  # Filter changes by the current user
+        return InventoryChange.objects.filter(user=self.request.user).order_by('id')  # Filter changes by the current user
     
+    # Lists whose timestamp__gte reaches back before archive_horizon() merge in the archived
+    # changes of that range (see archive.py); only the requested page is read from the table
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())  # Validates the filters first
+        archived = self.get_archived_changes(request)
+        if not archived:
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginator.paginate_merged(queryset, archived, request, self)
+        if page is None:
+            field, descending = self.paginator.get_ordering(queryset)
+            rows = sorted(list(queryset) + archived, key=self.paginator.row_key(field), reverse=descending)
+            return Response(self.get_serializer(rows, many=True).data)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    # Archived changes matching the list filters, or None when the range stays clear of the archive
+    def get_archived_changes(self, request):
+        params = request.query_params
+        horizon = archive_horizon()
+        if horizon is None or not params.get('timestamp__gte'):
+            return None
+        start = forms.DateTimeField().clean(params['timestamp__gte'])  # Parsed as the filter parsed it
+        if start >= horizon:
+            return None
+        end = forms.DateTimeField(required=False).clean(params.get('timestamp__lt'))
+        product = int(params['product']) if params.get('product') else None
+        return archived_changes(product_id=product, user_id=request.user.pk, start=start, end=end, reason=params.get('reason') or None)
+
     # Associate the created change with the current user
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  # Save the change with the current user as the owner
+
+    # Writes commit together with the events their signals record
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    # Custom action to stream the ledger entries matching the list filters (?export_format=csv|ndjson)
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response({'export_format': [f"Choose one of: {', '.join(EXPORT_CONTENT_TYPES)}."]}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())  # Same filtering and ordering as list
+        return export_response(queryset, CHANGE_EXPORT_COLUMNS, export_format, 'changes')
+
+    # Custom action to total changes per reason over an arbitrary date range from the rollups,
+    # with the net movement of stock over the range
+    @action(detail=False, methods=['get'])
+    def rollup(self, request):
+        serializer = ChangeRollupQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        totals = rollup_totals(request.user, params['start'], params['end'], params.get('product'), params.get('store'))
+        net = sum(total['quantity'] for total in totals.values())  # Deltas are signed, so the reasons just add up
+        return Response({'start': params['start'], 'end': params['end'], 'totals': totals, 'net': net})
+
+# ViewSet for StockTransfer model
+class StockTransferViewSet(viewsets.ModelViewSet):
+    serializer_class = StockTransferSerializer  # Serializer for stock transfer data
+    permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
+    max_transfer_items = 1000  # Most items accepted by one transfer
+
+    # Transfers made by the current user, with their ledger entries
+    def get_queryset(self):
+        return StockTransfer.objects.filter(user=self.request.user).prefetch_related('changes').order_by('id')
+
+    # Move the items' stock between the two stores in one transaction; nothing moves unless every item can
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if len(params['items']) > self.max_transfer_items:
+            return Response({'items': [f"At most {self.max_transfer_items} items per transfer."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            transfer, products = apply_transfer(request.user, params['from_store'], params['to_store'], params['items'])
+        except TransferRejected as exc:
+            return Response({'errors': exc.errors}, status=status.HTTP_409_CONFLICT if exc.conflict else status.HTTP_400_BAD_REQUEST)
+
+        # Check for low stock alerts on the products the transfer drew from
+        for product in products.values():
+            if product.store_id == transfer.from_store_id and product.quantity <= product.reorder_level:
+                enqueue_low_stock_alert(product)
+        return Response(self.get_serializer(transfer).data, status=status.HTTP_201_CREATED)
+
+# ViewSet for PurchaseOrder model
+class PurchaseOrderViewSet(viewsets.ModelViewSet):
+    serializer_class = PurchaseOrderSerializer  # Serializer for purchase order data
+    permission_classes = [permissions.IsAuthenticated]  # Only authenticated users can access this view
+    filterset_fields = ['status', 'supplier']  # Fields to filter by
+
+    # Orders of the current user, with their supplier and lines
+    def get_queryset(self):
+        return PurchaseOrder.objects.filter(user=self.request.user).select_related('supplier').prefetch_related('lines__product').order_by('id')
+
+    # Custom action to generate draft orders, one per supplier, for the low-stock products not on a draft yet
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        orders = generate_purchase_orders(request.user)
+        orders = self.get_queryset().filter(pk__in=[order.pk for order in orders])
+        return Response(self.get_serializer(orders, many=True).data, status=status.HTTP_201_CREATED if orders else status.HTTP_200_OK)
+
+    # Custom action to receive a draft order, restocking every line in one transaction
+    @action(detail=True, methods=['post'])
+    def receive(self, request, pk=None):
+        order = self.get_object()
+        try:
+            receive_purchase_order(request.user, order)
+        except PurchaseOrderRejected as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(self.get_queryset().get(pk=order.pk)).data)
+
+    # Only drafts can be discarded; received orders stay as the record of the restock
+    def destroy(self, request, *args, **kwargs):
+        if self.get_object().status != PurchaseOrder.DRAFT:
+            return Response({'detail': 'Only draft orders can be deleted.'}, status=status.HTTP_409_CONFLICT)
+        return super().destroy(request, *args, **kwargs)
+
+
+# Authenticate a plain Django request with the API's authentication classes (JWT); returns the
+# DRF request, or None when it carries no valid credentials
+def authenticate_request(request):
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = request.user
+    except AuthenticationFailed:
+        return None
+    return request if user.is_authenticated else None
+
+
+# JSON response rendered like the API's, for the async views that run outside DRF
+class RenderedResponse(HttpResponse):
+    def __init__(self, data=None, status=status.HTTP_200_OK):
+        super().__init__(b'' if data is None else JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+# Async read views run as coroutines under ASGI instead of holding a worker thread each. The
+# decorator handles what DRF does for the viewsets: only GET, JWT authentication (the view gets
+# the DRF request, so query_params and the pagination helpers work) and API exceptions.
+def async_api_view(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = await sync_to_async(authenticate_request)(request)
+        if request is None:
+            return RenderedResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            return RenderedResponse({'detail': exc.detail}, status=exc.status_code)
+    return require_GET(wrapper)
+
+
+# Products of the current user with the relations the serializer renders
+def product_queryset(request):
+    return InventoryProduct.objects.for_user(request.user).select_related(*InventoryProductQuerySet.SERIALIZER_RELATIONS).order_by('id')
+
+
+# queryset narrowed by InventoryProductViewSet's own filterset and ordering, so the async list
+# accepts and rejects exactly what /products/ does; returns (queryset, None) or (None, errors)
+def filter_products(request, queryset):
+    view = InventoryProductViewSet(request=request, format_kwarg=None)
+    filterset = DjangoFilterBackend().get_filterset(request, queryset, view)
+    if not filterset.is_valid():  # Validating the foreign key filters queries their tables
+        return None, translate_validation(filterset.errors).detail
+    return filters.OrderingFilter().filter_queryset(request, filterset.qs, view), None
+
+
+# Async GET /products/: same filters (except search and as_of), ordering and pages as the viewset's list
+@async_api_view
+async def product_list_async(request):
+    for name in ('search', 'as_of'):
+        if name in request.query_params:
+            return RenderedResponse({name: [f"{name} is served by /products/."]}, status=status.HTTP_400_BAD_REQUEST)
+    queryset, errors = await sync_to_async(filter_products)(request, product_queryset(request))
+    if errors:
+        return RenderedResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    data = InventoryProductSerializer(page, many=True, context={'request': request}).data
+    return RenderedResponse(paginator.get_paginated_response(data).data)
+
+
+# Async GET /products/<pk>/
+@async_api_view
+async def product_detail_async(request, pk):
+    try:
+        product = await product_queryset(request).aget(pk=pk)
+    except InventoryProduct.DoesNotExist:
+        return RenderedResponse({'detail': 'No InventoryProduct matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+    return RenderedResponse(InventoryProductSerializer(product, context={'request': request}).data)
+
+
+# Async GET /products/low_stock/, streaming the rows from the cursor in chunks
+@async_api_view
+async def low_stock_async(request):
+    products = [product async for product in product_queryset(request).filter(is_low_stock=True).aiterator(chunk_size=500)]
+    return RenderedResponse(InventoryProductSerializer(products, many=True, context={'request': request}).data)
+
+
+# Async GET /products/inventory_report/, cached like the viewset's report (separately, by path)
+@async_api_view
+@acache_response(lambda request: report_scope(request.user.pk), RenderedResponse, timeout=60, cacheable=is_complete_report)
+async def inventory_report_async(request):
+    return await abuild_report(request.user.pk)
+
+
+# Server-Sent Events stream of the user's stock changes and low-stock events, narrowed with
+# ?store=, ?product= (ids) and ?type= (change, low_stock), each comma separated. A client that
+# reconnects with Last-Event-ID first receives the events it missed.
+@async_api_view
+async def stock_feed(request):
+    try:
+        stores = [int(value) for value in request.query_params.get('store', '').split(',') if value]
+        products = [int(value) for value in request.query_params.get('product', '').split(',') if value]
+        last_id = request.headers.get('Last-Event-ID')
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return RenderedResponse({'detail': 'store, product and Last-Event-ID must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    types = [value for value in request.query_params.get('type', '').split(',') if value] or FEED_TYPES
+    if set(types) - set(FEED_TYPES):
+        return RenderedResponse({'type': [f"Choose from: {', '.join(FEED_TYPES)}."]}, status=status.HTTP_400_BAD_REQUEST)
+
+    subscription = Subscription(request.user.pk, stores, products, types)
+    response = StreamingHttpResponse(stream_events(subscription, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx buffering the stream
+    return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,9 +86,33 @@ DATABASES = {
         'PASSWORD': 'password',
         'HOST':'root',
         'PORT':'3306',
-
+    }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Redis when REDIS_URL is set (needs the redis package), the database otherwise. Writes invalidate
+# cached responses through the cache, so every worker process must share it: run
+# "python manage.py createcachetable" once for the database cache. With a per-process backend
+# (LocMemCache) the inventory response cache stays off unless INVENTORY_RESPONSE_CACHE = True.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'inventory',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'inventory_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 